@@ -39,6 +39,18 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     
+    # Request latency / SQL query metrics, served at /api/metrics
+    from app.utils.metrics import metrics
+    metrics.init_app(app)
+    
+    # gzip / brotli response compression (registered after metrics, so its time is measured)
+    from app.utils.compression import compression
+    compression.init_app(app)
+    
+    # Rate limits and load shedding for the expensive endpoints (after metrics, so refusals are measured)
+    from app.utils.rate_limit import rate_limiter
+    rate_limiter.init_app(app)
+    
     # Enable CORS
     CORS(app)
     
@@ -48,15 +60,93 @@ def create_app():
     from app.routes.quiz import quiz_bp
     from app.routes.payment import payment_bp
     from app.routes.admin import admin_bp
+    from app.routes.ai import ai_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(quiz_bp)
     app.register_blueprint(payment_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(ai_bp)
+    
+    # Drop cached users behind the Flask-Login user loader when they change
+    from app.utils.identity_cache import identity_cache
+    identity_cache.install()
+    
+    # Background AI quiz generation (worker threads start on the first job)
+    from app.utils.generation_queue import generation_queue
+    generation_queue.init_app(app)
+    
+    # Build the quiz storage's in-memory indexes (the quiz directory catalog for QUIZ_STORAGE=file)
+    from app.utils.quiz_storage import quiz_storage
+    quiz_storage.warm()
+    
+    # Create database tables - with AUTO_CREATE_SCHEMA=false the schema is managed
+    # separately (flask init-schema) and workers boot without touching the database
+    from app import models  # Make sure every model is registered first
+    if os.environ.get('AUTO_CREATE_SCHEMA', 'true').lower() == 'true':
+        with app.app_context():
+            db.create_all()
+    
+    # Deliver queued emails in the background over a reused SMTP connection (connected on first send)
+    from app.utils.email import email_sender
+    email_sender.init_app(app)
+    
+    # Runtime settings (token packages) from the database, cached in-process
+    from app.utils.settings_store import settings_store
+    settings_store.init_app(app)
     
-    # Create database tables
+    # Expose the in-process caches and workers' counters as metrics
+    from app.utils.password_hasher import password_hasher
+    from app.utils.generation_cache import generation_cache
+    from app.utils.review_cache import review_cache
+    metrics.register_stats('identity_cache', identity_cache.stats)
+    metrics.register_stats('generation_cache', generation_cache.stats)
+    metrics.register_stats('review_cache', review_cache.stats)
+    metrics.register_stats('quiz_storage', quiz_storage.stats)
+    metrics.register_stats('password_hasher', password_hasher.stats)
+    metrics.register_stats('email_sender', email_sender.stats)
+    metrics.register_stats('compression', compression.stats)
+    metrics.register_stats('rate_limit', rate_limiter.stats)
+    metrics.register_stats('settings', settings_store.stats)
+    
+    # Schema management and maintenance commands (flask --app run <command>)
+    from app.commands import register_commands
+    register_commands(app)
+    
+    # Under gunicorn --preload the app is created in the master process, and every
+    # worker starts its own background threads after forking (see gunicorn.conf.py)
+    if os.environ.get('DEFER_BACKGROUND_WORKERS', 'false').lower() != 'true':
+        start_background_workers(app)
+    
+    return app
+
+def start_background_workers(app):
+    """
+    Start the parts of the app that belong to one process: the password
+    hashing pool, the log writer thread, the email sender and the attempt
+    sweeper. Call it in every process that serves requests - none of
+    them survive a fork. Does nothing if they already run in this process.
+    """
+    if app.extensions.get('background_workers_pid') == os.getpid():
+        return
+    app.extensions['background_workers_pid'] = os.getpid()
+    
+    # Fork the password hashing workers while this process has no other threads yet
+    from app.utils.password_hasher import password_hasher
+    password_hasher.start()
+    
+    # Structured logs, written by a background thread
+    from app.utils.log import configure_logging
+    configure_logging()
+    
+    # Pooled connections inherited from the parent process must not be shared with it
     with app.app_context():
-        db.create_all()
+        db.engine.dispose(close=False)
+    
+    from app.utils.email import email_sender
+    email_sender.start()
     
-    return app 
+    # Periodically mark stale started quiz attempts as abandoned
+    from app.utils.attempt_sweeper import start_attempt_sweeper
+    app.extensions['attempt_sweeper'] = start_attempt_sweeper(app) 
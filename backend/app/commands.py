@@ -0,0 +1,26 @@
+import click
+
+from app import db
+
+
+def register_commands(app):
+    """Add the schema management commands to the app's `flask` CLI"""
+
+    @app.cli.command('init-schema')
+    def init_schema():
+        """Create missing tables and apply pending migrations"""
+        from migrations.runner import run_migrations
+
+        # create_all only adds missing tables; the migrations add columns and indexes to existing ones
+        db.create_all()
+        run_migrations(db.engine)
+
+    @app.cli.command('schema-status')
+    def schema_status():
+        """List applied and pending migrations"""
+        from migrations.runner import print_status
+
+        print_status(db.engine)
+        missing = sorted(set(db.metadata.tables) - set(db.inspect(db.engine).get_table_names()))
+        if missing:
+            click.echo(f"Missing tables (run flask init-schema): {', '.join(missing)}")
@@ -1,5 +1,10 @@
 from app.models.user import User
 from app.models.transaction import Transaction
 from app.models.quiz_attempt import QuizAttempt
+from app.models.generation_job import GenerationJob
+from app.models.question_bank import BankQuiz, BankQuestion
+from app.models.quiz_stats import QuizStats, QuizScoreBucket, QuizQuestionStats, UserStats
+from app.models.outbox_email import OutboxEmail
+from app.models.setting import Setting
 
 # Import any additional models here 
\ No newline at end of file
@@ -0,0 +1,64 @@
+from datetime import datetime
+import uuid
+from app import db
+
+class GenerationJob(db.Model):
+    __tablename__ = 'generation_jobs'
+    __table_args__ = (
+        # Per-user rate limits count recent and active jobs
+        db.Index('ix_generation_jobs_user_created', 'user_id', 'created_at'),
+        # Recovery of queued / interrupted jobs
+        db.Index('ix_generation_jobs_status_updated', 'status', 'updated_at'),
+        # Coalescing identical requests onto an in-flight job
+        db.Index('ix_generation_jobs_fingerprint_status', 'fingerprint', 'status'),
+    )
+    
+    # Job states
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=QUEUED)
+    subject = db.Column(db.String(255), nullable=False)
+    topic = db.Column(db.String(255), nullable=False)
+    difficulty = db.Column(db.String(50), nullable=False, default='medium')
+    num_questions = db.Column(db.Integer, nullable=False)
+    fingerprint = db.Column(db.String(40), nullable=True)  # Normalized (subject, topic, difficulty) hash
+    # Set when the job was served by another job's questions instead of its own LLM call
+    source_job_id = db.Column(db.String(36), db.ForeignKey('generation_jobs.id'), nullable=True, index=True)
+    reused = db.Column(db.Boolean, nullable=False, default=False)
+    tokens_charged = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    file_path = db.Column(db.String(512), nullable=True)  # <subject_dir>/<quiz_file> once saved
+    num_generated = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def is_finished(self):
+        return self.status in (self.COMPLETED, self.FAILED)
+    
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'subject': self.subject,
+            'topic': self.topic,
+            'difficulty': self.difficulty,
+            'num_questions': self.num_questions,
+            'attempts': self.attempts,
+            'file_path': self.file_path,
+            'num_generated': self.num_generated,
+            'reused': bool(self.reused),
+            'source_job_id': self.source_job_id,
+            'tokens_used': self.tokens_charged if self.status != self.FAILED else 0,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f'<GenerationJob {self.id} - User {self.user_id} - {self.status}>'
@@ -0,0 +1,30 @@
+from datetime import datetime
+from app import db
+
+class OutboxEmail(db.Model):
+    """An email waiting to be (or already) sent by the background email sender"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        # The sender picks due emails in order
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    # Email states; a SENDING email whose lease (next_attempt_at) ran out is picked up again
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    to_address = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<OutboxEmail {self.id} to {self.to_address} ({self.status})>'
@@ -0,0 +1,48 @@
+from datetime import datetime
+from app import db
+import json
+
+class BankQuiz(db.Model):
+    """A quiz stored in the question bank (QUIZ_STORAGE=sql)"""
+    __tablename__ = 'bank_quizzes'
+    __table_args__ = (
+        # One quiz per name in a subject; also serves the subject / quiz listings
+        db.Index('ix_bank_quizzes_subject_name', 'subject', 'name', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    name = db.Column(db.String(255), nullable=False)
+    difficulty = db.Column(db.String(50), nullable=True)  # Most common question difficulty
+    question_count = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.String(16), nullable=False)  # Content hash, changes whenever the questions do
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    questions = db.relationship('BankQuestion', backref='quiz', lazy='dynamic',
+                                cascade='all, delete-orphan', passive_deletes=True)
+
+    def __repr__(self):
+        return f'<BankQuiz {self.subject}/{self.name} - {self.question_count} questions>'
+
+class BankQuestion(db.Model):
+    """One question of a BankQuiz, addressed by its position in the quiz"""
+    __tablename__ = 'bank_questions'
+    __table_args__ = (
+        # Loading a quiz in order, or just the sampled positions of it
+        db.Index('ix_bank_questions_quiz_position', 'quiz_id', 'position', unique=True),
+        # Queries across quizzes (e.g. every hard question)
+        db.Index('ix_bank_questions_difficulty', 'difficulty'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('bank_quizzes.id', ondelete='CASCADE'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    difficulty = db.Column(db.String(50), nullable=True)
+    data = db.Column(db.Text, nullable=False)  # The question object as JSON, exactly as in a quiz file
+
+    def get_data(self):
+        return json.loads(self.data)
+
+    def __repr__(self):
+        return f'<BankQuestion {self.quiz_id}#{self.position}>'
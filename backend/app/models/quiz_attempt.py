@@ -1,9 +1,28 @@
 from datetime import datetime
 from app import db
+from app.utils.answer_codec import pack_answers, unpack_answers, unpack_indexes, answer_indexes, OptionsChanged
 import json
+import logging
 
 class QuizAttempt(db.Model):
     __tablename__ = 'quiz_attempts'
+    __table_args__ = (
+        # Attempt lookups for one quiz, most recent first (get_quiz / submit_quiz)
+        db.Index('ix_quiz_attempts_user_quiz_date', 'user_id', 'subject', 'quiz_name', 'attempt_date'),
+        # Most recent started attempt at a quiz (get_quiz resumes it)
+        db.Index('ix_quiz_attempts_user_quiz_status', 'user_id', 'subject', 'quiz_name', 'status', 'attempt_date'),
+        # Attempt history of a user, keyset-paginated on (attempt_date, id) (/api/quizzes/attempts)
+        db.Index('ix_quiz_attempts_user_date_id', 'user_id', 'attempt_date', 'id'),
+        # Stale started attempts (attempt sweeper)
+        db.Index('ix_quiz_attempts_status_date', 'status', 'attempt_date'),
+        # One attempt per client-chosen idempotency key (bulk submission retries)
+        db.Index('ix_quiz_attempts_user_idempotency_key', 'user_id', 'idempotency_key', unique=True),
+    )
+    
+    # Attempt states
+    STARTED = 'started'      # Quiz opened (token deducted), not submitted yet
+    SUBMITTED = 'submitted'  # Answers graded
+    ABANDONED = 'abandoned'  # Started but never submitted, marked by the sweeper
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -12,23 +31,109 @@ class QuizAttempt(db.Model):
     score = db.Column(db.Integer, nullable=False)
     total_questions = db.Column(db.Integer, nullable=False)
     attempt_date = db.Column(db.DateTime, default=datetime.utcnow)
-    user_answers = db.Column(db.Text, nullable=True)  # JSON string of user answers
-    
-    def set_user_answers(self, answers):
-        """Store user answers as a JSON string"""
-        if answers:
-            self.user_answers = json.dumps(answers)
-        else:
-            self.user_answers = None
-    
-    def get_user_answers(self):
-        """Retrieve user answers as a list"""
-        if self.user_answers:
-            try:
-                return json.loads(self.user_answers)
-            except:
-                return []
-        return []
+    # User answers - deferred (loaded together), so listing attempts doesn't load them. Answers are
+    # packed as option indexes (app/utils/answer_codec.py); user_answers keeps the JSON text of answers
+    # that aren't options of their questions, and of attempts stored before the packed format
+    user_answers = db.deferred(db.Column(db.Text, nullable=True), group='answers')
+    answers_packed = db.deferred(db.Column(db.LargeBinary, nullable=True), group='answers')
+    status = db.Column(db.String(20), nullable=False, default=STARTED)
+    question_positions = db.Column(db.Text, nullable=True)  # JSON list of sampled question positions, NULL = whole quiz
+    idempotency_key = db.Column(db.String(64), nullable=True)  # Set by bulk submissions, unique per user
+    
+    @staticmethod
+    def encode_answers(answers, quiz=None):
+        """
+        Column values (answers_packed, user_answers) storing user answers: packed
+        as option indexes of `quiz` (the CompiledQuiz with the questions the
+        attempt was given) when every answer is one of its question's options,
+        as a JSON string otherwise. Packed answers carry a digest of the options,
+        so they are never decoded against different ones.
+        """
+        packed = pack_answers(answers, quiz.options, quiz.options_digest) if answers and quiz is not None else None
+        if packed is not None:
+            return packed, None
+        return None, json.dumps(answers) if answers else None
+    
+    def set_user_answers(self, answers, quiz=None):
+        """Store user answers, see encode_answers"""
+        self.answers_packed, self.user_answers = self.encode_answers(answers, quiz)
+    
+    def get_user_answers(self, quiz=None):
+        """Retrieve user answers as a list, see decode_answers"""
+        return decode_answers(self.user_answers, self.answers_packed, quiz, self.id)
+    
+    def get_answer_indexes(self, quiz=None):
+        """Retrieve the chosen option index of every answer, see decode_answer_indexes"""
+        return decode_answer_indexes(self.user_answers, self.answers_packed, quiz, self.id)
+    
+    def set_question_positions(self, positions):
+        """Store the positions of the questions sampled for this attempt"""
+        self.question_positions = json.dumps(positions) if positions is not None else None
+    
+    def get_question_positions(self):
+        """Retrieve the sampled question positions, or None if the attempt covers the whole quiz"""
+        return decode_question_positions(self.question_positions)
     
     def __repr__(self):
-        return f'<QuizAttempt {self.id} - User {self.user_id} - Score {self.score}/{self.total_questions}>' 
\ No newline at end of file
+        return f'<QuizAttempt {self.id} - User {self.user_id} - Score {self.score}/{self.total_questions}>'
+
+
+# Decoders of the stored column values, for queries that select the columns without loading attempts
+
+def decode_answers(user_answers, answers_packed, quiz=None, attempt_id=None):
+    """
+    Decode stored user answers to a list. Packed answers are decoded against
+    `quiz`, the same questions they were stored with (required for them);
+    raises OptionsChanged if the quiz's options changed since.
+    """
+    if answers_packed is not None:
+        if quiz is None:
+            raise ValueError('Packed answers can only be decoded with their quiz')
+        try:
+            return unpack_answers(answers_packed, quiz.options, quiz.options_digest)
+        except OptionsChanged:
+            raise
+        except ValueError as e:
+            logging.warning(f"Could not decode answers of attempt {attempt_id}: {str(e)}")
+            return []
+    if user_answers:
+        try:
+            return json.loads(user_answers)
+        except ValueError as e:
+            logging.warning(f"Could not decode answers of attempt {attempt_id}: {str(e)}")
+            return []
+    return []
+
+
+def decode_answer_indexes(user_answers, answers_packed, quiz=None, attempt_id=None):
+    """
+    Decode the chosen option index of every stored answer (None for no answer
+    or one that isn't an option). Answers stored as JSON need their `quiz`;
+    packed ones are checked against it when given (raises OptionsChanged).
+    """
+    if answers_packed is not None:
+        try:
+            if quiz is None:
+                return unpack_indexes(answers_packed)
+            return unpack_indexes(answers_packed, quiz.options, quiz.options_digest)
+        except OptionsChanged:
+            raise
+        except ValueError as e:
+            logging.warning(f"Could not decode answers of attempt {attempt_id}: {str(e)}")
+            return []
+    answers = decode_answers(user_answers, None, attempt_id=attempt_id)
+    if not answers:
+        return []
+    if quiz is None:
+        raise ValueError('JSON answers can only be mapped to option indexes with their quiz')
+    return answer_indexes(answers, quiz.options)
+
+
+def decode_question_positions(question_positions):
+    """Decode stored question positions, None if the attempt covers the whole quiz"""
+    if question_positions:
+        try:
+            return json.loads(question_positions)
+        except ValueError:
+            return None
+    return None
@@ -0,0 +1,83 @@
+from datetime import datetime
+from app import db
+
+class QuizStats(db.Model):
+    """Running totals of submitted attempts at one quiz"""
+    __tablename__ = 'quiz_stats'
+    __table_args__ = (
+        db.Index('ix_quiz_stats_quiz', 'subject', 'quiz_name', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    quiz_name = db.Column(db.String(255), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    passes = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    question_sum = db.Column(db.Integer, nullable=False, default=0)  # Sum of total_questions, for average percentages
+
+    def to_dict(self):
+        return {
+            'subject': self.subject,
+            'quiz_name': self.quiz_name,
+            'attempts': self.attempts,
+            'average_score': self.score_sum / self.attempts if self.attempts else 0,
+            'average_percentage': (self.score_sum / self.question_sum) * 100 if self.question_sum else 0,
+            'pass_rate': (self.passes / self.attempts) * 100 if self.attempts else 0
+        }
+
+class QuizScoreBucket(db.Model):
+    """Score histogram of a quiz: bucket N counts attempts that scored N*10% up to (N+1)*10% (10 = full marks)"""
+    __tablename__ = 'quiz_score_buckets'
+    __table_args__ = (
+        db.Index('ix_quiz_score_buckets_quiz_bucket', 'subject', 'quiz_name', 'bucket', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    quiz_name = db.Column(db.String(255), nullable=False)
+    bucket = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class QuizQuestionStats(db.Model):
+    """How often one question of a quiz (by position) was answered and answered correctly"""
+    __tablename__ = 'quiz_question_stats'
+    __table_args__ = (
+        db.Index('ix_quiz_question_stats_quiz_position', 'subject', 'quiz_name', 'position', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    quiz_name = db.Column(db.String(255), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    answered = db.Column(db.Integer, nullable=False, default=0)
+    correct = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'position': self.position,
+            'answered': self.answered,
+            'correct': self.correct,
+            'correct_rate': (self.correct / self.answered) * 100 if self.answered else 0
+        }
+
+class UserStats(db.Model):
+    """Running totals of one user's submitted attempts"""
+    __tablename__ = 'user_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    passes = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    question_sum = db.Column(db.Integer, nullable=False, default=0)
+    last_submitted_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'attempts': self.attempts,
+            'average_score': self.score_sum / self.attempts if self.attempts else 0,
+            'average_percentage': (self.score_sum / self.question_sum) * 100 if self.question_sum else 0,
+            'pass_rate': (self.passes / self.attempts) * 100 if self.attempts else 0,
+            'last_submitted_at': self.last_submitted_at.isoformat() if self.last_submitted_at else None
+        }
@@ -0,0 +1,15 @@
+from datetime import datetime
+from app import db
+
+class Setting(db.Model):
+    """An application setting changed at runtime (e.g. token packages), as JSON, read through app/utils/settings_store.py"""
+    __tablename__ = 'settings'
+
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Text, nullable=False)
+    # Bumped on every write, so workers can tell their cached copy is stale
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Setting {self.key} v{self.version}>'
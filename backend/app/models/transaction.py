@@ -3,6 +3,10 @@ from app import db
 
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Transaction history of a user (/api/payment/transactions)
+        db.Index('ix_transactions_user_date', 'user_id', 'transaction_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -10,7 +14,7 @@ class Transaction(db.Model):
     tokens_purchased = db.Column(db.Integer, nullable=False)
     payment_status = db.Column(db.String(50), nullable=False)
     transaction_date = db.Column(db.DateTime, default=datetime.utcnow)
-    razorpay_order_id = db.Column(db.String(255), nullable=True)
+    razorpay_order_id = db.Column(db.String(255), nullable=True, index=True)
     razorpay_payment_id = db.Column(db.String(255), nullable=True)
     razorpay_signature = db.Column(db.String(255), nullable=True)
     
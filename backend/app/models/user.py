@@ -1,11 +1,16 @@
 from datetime import datetime, timedelta
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login_manager
+from app.utils.password_hasher import password_hasher
 import secrets
 
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Admin user directory: filtering by role with id as the keyset tie-breaker
+        # (the expression indexes are defined below the class)
+        db.Index('ix_users_role_id', 'role', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(255), unique=True, nullable=False)
@@ -16,27 +21,39 @@ class User(db.Model, UserMixin):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     reset_token = db.Column(db.String(100), unique=True, nullable=True)
     reset_token_expiry = db.Column(db.DateTime, nullable=True)
+    # Part of the session cookie's user id; bumping it logs the user out everywhere
+    session_version = db.Column(db.Integer, nullable=False, default=0)
     
     # Relationships
     quiz_attempts = db.relationship('QuizAttempt', backref='user', lazy=True)
     transactions = db.relationship('Transaction', backref='user', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Verify a password; a hash made with outdated parameters is replaced (the caller commits)"""
+        matches, new_hash = password_hasher.verify(password, self.password_hash)
+        if new_hash:
+            self.password_hash = new_hash
+        return matches
     
     def add_tokens(self, amount):
-        self.tokens += amount
-        db.session.commit()
+        """Atomically credit tokens; the caller commits"""
+        from app.utils.token_ledger import credit_tokens
+        return credit_tokens(self.id, amount)
+    
+    def use_token(self, amount=1):
+        """Atomically debit tokens if the balance allows it; the caller commits"""
+        from app.utils.token_ledger import debit_tokens
+        return debit_tokens(self.id, amount) is not None
     
-    def use_token(self):
-        if self.tokens > 0:
-            self.tokens -= 1
-            db.session.commit()
-            return True
-        return False
+    def get_id(self):
+        return f'{self.id}:{self.session_version or 0}'
+    
+    def revoke_sessions(self):
+        """Invalidate every existing login of this user; the caller commits"""
+        self.session_version = (self.session_version or 0) + 1
     
     def is_admin(self):
         return self.role == 'admin'
@@ -67,4 +84,32 @@ class User(db.Model, UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id)) 
\ No newline at end of file
+    from app.utils.identity_cache import identity_cache
+
+    # Session ids are "<id>:<session_version>"; ones from before versioning have no version
+    user_id, _, version = user_id.partition(':')
+    try:
+        user_id, version = int(user_id), int(version or 0)
+    except ValueError:
+        return None
+
+    user = identity_cache.get_user(user_id)
+    if user is not None and (user.session_version or 0) != version:
+        identity_cache.record_rejection()
+        return None
+    return user
+
+
+# Sort keys of the nullable columns of the admin user directory: a keyset cursor can't
+# compare NULLs, so they sort as 0 tokens / the epoch. The fallbacks are literals so the
+# queries match the expression indexes (a bound parameter wouldn't); the epoch is written
+# the way SQLite stores datetimes, so it compares equal to a cursor holding it
+USER_TOKENS_KEY = db.func.coalesce(User.tokens, db.literal_column('0'))
+USER_CREATED_AT_KEY = db.func.coalesce(User.created_at, db.literal_column("'1970-01-01 00:00:00.000000'"))
+
+# Admin user directory: sorting / range filters with id as the keyset tie-breaker,
+# and case-insensitive prefix search of usernames and emails
+db.Index('ix_users_created_at_id', USER_CREATED_AT_KEY, User.id)
+db.Index('ix_users_tokens_id', USER_TOKENS_KEY, User.id)
+db.Index('ix_users_username_lower', db.func.lower(User.username))
+db.Index('ix_users_email_lower', db.func.lower(User.email))
@@ -1,13 +1,47 @@
-from flask import Blueprint, request, jsonify
+import io
+import csv
+import json
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_login import login_required, current_user
 from app import db
-from app.models.user import User
+from app.models.user import User, USER_TOKENS_KEY, USER_CREATED_AT_KEY
 from app.models.transaction import Transaction
-from app.routes.payment import TOKEN_PACKAGES
+from app.routes.payment import token_packages, DEFAULT_TOKEN_PACKAGES
+from app.utils.settings_store import settings_store, SettingChanged
+from app.utils.pagination import parse_page_args, stream_page
+from app.utils.quiz_stats import quiz_stats, user_stats
+from app.utils.identity_cache import identity_cache
+from app.utils.generation_cache import generation_cache
+from app.utils.token_ledger import set_tokens, BalanceChanged
 from functools import wraps
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
+# User directory page size (?limit=) default and upper bound
+USERS_PAGE_SIZE = 50
+MAX_USERS_PAGE_SIZE = 200
+
+# Rows fetched per round trip by /users/export
+EXPORT_CHUNK_SIZE = 1000
+
+# Times a token packages update is re-applied on top of a concurrent one before answering 409
+UPDATE_PACKAGES_ATTEMPTS = 5
+
+# Columns the user directory can be sorted by (?sort=), always with id as the tie-breaker;
+# nullable ones sort by their coalesced key
+USER_SORT_COLUMNS = {
+    'id': User.id,
+    'username': User.username,
+    'email': User.email,
+    'tokens': USER_TOKENS_KEY,
+    'created_at': USER_CREATED_AT_KEY
+}
+
+# Fields of a user in listings and exports (never the password hash or reset token)
+USER_FIELDS = ('id', 'username', 'email', 'tokens', 'role', 'created_at')
+_USER_COLUMNS = [getattr(User, field) for field in USER_FIELDS]
+
 # Admin decorator
 def admin_required(f):
     @wraps(f)
@@ -17,22 +51,157 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Get all users
+def _user_row(row):
+    user = dict(zip(USER_FIELDS, row))
+    user['created_at'] = user['created_at'].isoformat() if user['created_at'] else None
+    return user
+
+def _prefix_match(column, prefix):
+    """Prefix search as a range (prefix <= column < next prefix) so the column's index is used"""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return db.and_(column >= prefix, column < upper)
+
+def _user_filters():
+    """
+    Build the WHERE conditions of the user directory from the query string:
+    role, min_tokens / max_tokens, created_after / created_before (ISO dates)
+    and q (case-insensitive prefix of the username or email).
+    Raises ValueError for malformed values.
+    """
+    filters = []
+    
+    role = request.args.get('role')
+    if role:
+        if role not in ['user', 'admin']:
+            raise ValueError('Invalid role. Must be "user" or "admin"')
+        filters.append(User.role == role)
+    
+    if request.args.get('min_tokens'):
+        filters.append(USER_TOKENS_KEY >= int(request.args['min_tokens']))
+    if request.args.get('max_tokens'):
+        filters.append(USER_TOKENS_KEY <= int(request.args['max_tokens']))
+    
+    if request.args.get('created_after'):
+        filters.append(USER_CREATED_AT_KEY >= datetime.fromisoformat(request.args['created_after']))
+    if request.args.get('created_before'):
+        filters.append(USER_CREATED_AT_KEY < datetime.fromisoformat(request.args['created_before']))
+    
+    q = request.args.get('q', '').strip().lower()
+    if q:
+        filters.append(db.or_(
+            _prefix_match(db.func.lower(User.username), q),
+            _prefix_match(db.func.lower(User.email), q)
+        ))
+    
+    return filters
+
+# Get users - keyset paginated, filtered and sorted on the server
 @admin_bp.route('/users', methods=['GET'])
 @login_required
 @admin_required
 def get_users():
-    users = User.query.all()
-    return jsonify({
-        'users': [{
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'tokens': user.tokens,
-            'role': user.role,
-            'created_at': user.created_at.isoformat()
-        } for user in users]
-    }), 200
+    sort = request.args.get('sort', 'id')
+    column = USER_SORT_COLUMNS.get(sort)
+    if column is None:
+        return jsonify({'error': f'sort must be one of {", ".join(USER_SORT_COLUMNS)}'}), 400
+    descending = request.args.get('order', 'asc') == 'desc'
+    
+    try:
+        filters = _user_filters()
+        cursor, limit = parse_page_args(USERS_PAGE_SIZE, MAX_USERS_PAGE_SIZE)
+        
+        # The cursor is (sort, value of the sort column, id) of the last user on the previous page
+        if cursor is not None:
+            if len(cursor) != 3 or cursor[0] != sort:
+                raise ValueError('Cursor does not match the sort order')
+            value, last_id = cursor[1], int(cursor[2])
+            if sort == 'created_at':
+                value = datetime.fromisoformat(value)
+            
+            if sort == 'id':
+                after = User.id < last_id if descending else User.id > last_id
+            elif descending:
+                after = db.or_(column < value, db.and_(column == value, User.id < last_id))
+            else:
+                after = db.or_(column > value, db.and_(column == value, User.id > last_id))
+            filters.append(after)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    order = [column.desc(), User.id.desc()] if descending else [column.asc(), User.id.asc()]
+    if sort == 'id':
+        order = order[:1]
+    
+    # The sort key is selected too, the cursor holds its (coalesced) value
+    query = db.select(*_USER_COLUMNS, column.label('sort_key')).where(*filters).order_by(*order).limit(limit + 1)
+    rows = db.session.execute(query)
+    
+    def cursor_of(row):
+        value = row.sort_key
+        return sort, value.isoformat() if isinstance(value, datetime) else value, row.id
+    
+    return stream_page('users', rows, limit, _user_row, cursor_of)
+
+# Export users as CSV or NDJSON (?format=csv|ndjson), with the same filters as the listing
+@admin_bp.route('/users/export', methods=['GET'])
+@login_required
+@admin_required
+def export_users():
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ['csv', 'ndjson']:
+        return jsonify({'error': 'format must be "csv" or "ndjson"'}), 400
+    
+    try:
+        filters = _user_filters()
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # yield_per streams the rows in chunks (a server-side cursor on PostgreSQL),
+    # so memory use doesn't grow with the size of the users table
+    query = (
+        db.select(*_USER_COLUMNS).where(*filters).order_by(User.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == 'csv':
+            writer.writerow(USER_FIELDS)
+        
+        for chunk in db.session.execute(query).partitions():
+            for row in chunk:
+                if export_format == 'csv':
+                    writer.writerow(_user_row(row).values())
+                else:
+                    buffer.write(json.dumps(_user_row(row)) + '\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        # Header of an empty CSV export
+        if buffer.tell():
+            yield buffer.getvalue()
+    
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=users.{export_format}'
+    return response
+
+# Statistics of a quiz, read from the incrementally maintained stats tables
+@admin_bp.route('/stats/quizzes/<subject>/<quiz_name>', methods=['GET'])
+@login_required
+@admin_required
+def get_quiz_stats(subject, quiz_name):
+    return jsonify({'stats': quiz_stats(subject, quiz_name)}), 200
+
+# Statistics of a user
+@admin_bp.route('/stats/users/<int:user_id>', methods=['GET'])
+@login_required
+@admin_required
+def get_user_stats(user_id):
+    User.query.get_or_404(user_id)
+    return jsonify({'stats': user_stats(user_id)}), 200
 
 # Get user by ID
 @admin_bp.route('/users/<int:user_id>', methods=['GET'])
@@ -64,35 +233,40 @@ def update_user_tokens(user_id):
     
     try:
         tokens = int(data['tokens'])
-        if tokens < 0:
-            return jsonify({'error': 'Tokens cannot be negative'}), 400
-        
-        # Record the transaction
-        transaction = Transaction(
-            user_id=user.id,
-            amount=0,  # Admin adjustment, no cost
-            tokens_purchased=tokens - user.tokens,  # Can be negative if reducing tokens
-            payment_status='completed',
-            razorpay_order_id=f"admin_adjustment_{current_user.id}"
-        )
-        
-        # Update user tokens
-        user.tokens = tokens
-        
-        db.session.add(transaction)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'User tokens updated successfully',
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'tokens': user.tokens
-            }
-        }), 200
-    except ValueError:
+    except (TypeError, ValueError):
         return jsonify({'error': 'Invalid token value'}), 400
+    if tokens < 0:
+        return jsonify({'error': 'Tokens cannot be negative'}), 400
+
+    # Conditional on the balance it replaces, so a concurrent debit isn't lost and the delta is exact
+    try:
+        old_tokens = set_tokens(user.id, tokens)
+    except BalanceChanged:
+        db.session.rollback()
+        return jsonify({'error': 'The balance changed during the update, try again'}), 409
+    if old_tokens is None:
+        return jsonify({'error': 'User not found'}), 404
+
+    # Record the transaction
+    transaction = Transaction(
+        user_id=user.id,
+        amount=0,  # Admin adjustment, no cost
+        tokens_purchased=tokens - old_tokens,  # Can be negative if reducing tokens
+        payment_status='completed',
+        razorpay_order_id=f"admin_adjustment_{current_user.id}"
+    )
+    db.session.add(transaction)
+    db.session.commit()
+
+    return jsonify({
+        'message': 'User tokens updated successfully',
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'tokens': tokens
+        }
+    }), 200
 
 # Update user role
 @admin_bp.route('/users/<int:user_id>/role', methods=['PUT'])
@@ -109,7 +283,10 @@ def update_user_role(user_id):
     if role not in ['user', 'admin']:
         return jsonify({'error': 'Invalid role. Must be "user" or "admin"'}), 400
     
-    user.role = role
+    if user.role != role:
+        user.role = role
+        # Logins made with the old role stop working; the user signs in again
+        user.revoke_sessions()
     db.session.commit()
     
     return jsonify({
@@ -122,13 +299,38 @@ def update_user_role(user_id):
         }
     }), 200
 
+# Log a user out of every session
+@admin_bp.route('/users/<int:user_id>/revoke-sessions', methods=['POST'])
+@login_required
+@admin_required
+def revoke_user_sessions(user_id):
+    user = User.query.get_or_404(user_id)
+    user.revoke_sessions()
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'User sessions revoked successfully',
+        'revoke_within_seconds': identity_cache.ttl
+    }), 200
+
+# Hit/miss counters of the in-process caches
+@admin_bp.route('/cache-stats', methods=['GET'])
+@login_required
+@admin_required
+def get_cache_stats():
+    return jsonify({
+        'identity': identity_cache.stats(),
+        'generation': generation_cache.stats(),
+        'settings': settings_store.stats()
+    }), 200
+
 # Get token packages
 @admin_bp.route('/token-packages', methods=['GET'])
 @login_required
 @admin_required
 def get_token_packages():
     return jsonify({
-        'packages': TOKEN_PACKAGES
+        'packages': token_packages()
     }), 200
 
 # Update token packages
@@ -141,8 +343,8 @@ def update_token_packages():
     if not data or not isinstance(data, dict):
         return jsonify({'error': 'Invalid data format'}), 400
     
-    # Update the global TOKEN_PACKAGES variable
-    global TOKEN_PACKAGES
+    # Packages are validated first, then stored all at once (shared by every worker)
+    updates = {}
     
     for package_name, package_data in data.items():
         if not isinstance(package_data, dict) or 'amount' not in package_data or 'tokens' not in package_data:
@@ -155,16 +357,25 @@ def update_token_packages():
             if amount < 0 or tokens < 0:
                 return jsonify({'error': 'Amount and tokens cannot be negative'}), 400
             
-            # Update the package
-            if package_name in TOKEN_PACKAGES:
-                TOKEN_PACKAGES[package_name] = {'amount': amount, 'tokens': tokens}
-            else:
-                TOKEN_PACKAGES[package_name] = {'amount': amount, 'tokens': tokens}
+            updates[package_name] = {'amount': amount, 'tokens': tokens}
                 
-        except ValueError:
+        except (TypeError, ValueError):
             return jsonify({'error': 'Amount and tokens must be integers'}), 400
     
+    # Merged into the packages as last read, and written only if nobody changed them since;
+    # a concurrent update is re-read and merged again
+    for _ in range(UPDATE_PACKAGES_ATTEMPTS):
+        version, current = settings_store.get_versioned('token_packages', DEFAULT_TOKEN_PACKAGES, fresh=True)
+        packages = dict(current, **updates)
+        try:
+            settings_store.set('token_packages', packages, expected_version=version)
+            break
+        except SettingChanged:
+            continue
+    else:
+        return jsonify({'error': 'Token packages were changed concurrently, please try again'}), 409
+    
     return jsonify({
         'message': 'Token packages updated successfully',
-        'packages': TOKEN_PACKAGES
-    }), 200 
\ No newline at end of file
+        'packages': packages
+    }), 200 
@@ -1,15 +1,18 @@
-import os
-import json
-import requests
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, url_for
 from flask_login import login_required, current_user
 from app import db
+from app.models.generation_job import GenerationJob
+from app.utils.quiz_catalog import catalog_response
+from app.utils.quiz_generator import QuizExistsError, sanitize_name
+from app.utils.quiz_storage import quiz_storage
+from app.utils.generation_cache import generation_fingerprint
+from app.utils.generation_queue import generation_queue, QueueFullError
+from app.utils.token_ledger import debit_tokens
 
 ai_bp = Blueprint('ai', __name__, url_prefix='/api/ai')
 
-# Helper function to get quiz directory path
-def get_quiz_dir():
-    return os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'quizzes')
+# Upper bound on questions per generated quiz
+MAX_QUESTIONS = 50
 
 @ai_bp.route('/generate-quiz', methods=['POST'])
 @login_required
@@ -20,8 +23,14 @@ def generate_quiz():
     if not data or not data.get('subject') or not data.get('topic') or not data.get('num_questions'):
         return jsonify({'error': 'Missing required fields (subject, topic, num_questions)'}), 400
     
+    try:
+        num_questions = int(data.get('num_questions', 10))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'num_questions must be a number'}), 400
+    if not 1 <= num_questions <= MAX_QUESTIONS:
+        return jsonify({'error': f'num_questions must be between 1 and {MAX_QUESTIONS}'}), 400
+    
     # Check if user has enough tokens
-    num_questions = int(data.get('num_questions', 10))
     required_tokens = max(1, num_questions // 5)  # 1 token per 5 questions, minimum 1
     
     if current_user.tokens < required_tokens and not current_user.is_admin():
@@ -31,105 +40,113 @@ def generate_quiz():
     topic = data.get('topic')
     difficulty = data.get('difficulty', 'medium')  # Default to medium difficulty
     
-    # Sanitize subject and topic for filename
-    subject_dir_name = ''.join(c if c.isalnum() else '_' for c in subject.lower())
-    quiz_file_name = ''.join(c if c.isalnum() else '_' for c in topic.lower())
+    job = GenerationJob(
+        user_id=current_user.id,
+        subject=subject,
+        topic=topic,
+        difficulty=difficulty,
+        num_questions=num_questions,
+        fingerprint=generation_fingerprint(subject, topic, difficulty)
+    )
     
-    # Create subject directory if it doesn't exist
-    quiz_dir = get_quiz_dir()
-    subject_dir = os.path.join(quiz_dir, subject_dir_name)
+    # Per-user limits on concurrent and hourly generations, checked before a quiz is reused too
+    rate_limit_error = generation_queue.check_rate_limit(current_user.id)
+    if rate_limit_error:
+        return jsonify({'error': rate_limit_error}), 429
     
-    if not os.path.exists(subject_dir):
-        os.makedirs(subject_dir)
+    # Every path charges the tokens with a conditional debit in the same transaction as the job;
+    # they are refunded if the job fails
+    tokens_remaining = _charge(job, required_tokens)
+    if tokens_remaining is None:
+        db.session.rollback()
+        return jsonify({'error': f'Not enough tokens. You need {required_tokens} tokens to generate this quiz.'}), 403
+    
+    # Serve an equivalent quiz that was already generated - no LLM call
+    pool = generation_queue.find_pool(job)
+    if pool is not None:
+        questions, source_job_id = pool
+        try:
+            generation_queue.complete_from_pool(job, questions, source_job_id)
+        except QuizExistsError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 409
+        db.session.add(job)
+        db.session.commit()
+        return _job_response(job, 'Quiz already generated', tokens_remaining, 200)
     
     # Check if quiz already exists
-    quiz_file_path = os.path.join(subject_dir, f'{quiz_file_name}.json')
-    if os.path.exists(quiz_file_path):
+    if quiz_storage.exists(sanitize_name(subject), sanitize_name(topic)):
+        db.session.rollback()
         return jsonify({'error': 'A quiz with this topic already exists in this subject'}), 409
     
+    # Wait for an identical request that is already being generated
+    leader = generation_queue.find_in_flight(job)
+    if leader is not None:
+        job.source_job_id = leader.id
+        job.reused = True
+        db.session.add(job)
+        db.session.commit()
+        # The leader may have finished before this job was visible to it
+        db.session.refresh(leader)
+        if leader.is_finished():
+            generation_queue.resolve_followers(leader)
+        return _job_response(job, 'Quiz generation already in progress', tokens_remaining, 202)
+    
+    if generation_queue.is_full():
+        db.session.rollback()
+        return jsonify({'error': 'Quiz generation is busy, please try again shortly'}), 503
+    
+    db.session.add(job)
+    db.session.flush()
+    job_id = job.id
+    db.session.commit()
+    
     try:
-        # Generate quiz using DeepSeek R1 through OpenRouter
-        prompt = f"""
-        Create a quiz on the topic of "{topic}" in the subject area of "{subject}" with {num_questions} multiple-choice questions.
-        The difficulty level should be {difficulty}.
-        
-        Each question should have:
-        1. A clear question
-        2. Four possible options
-        3. One correct answer
-        4. A brief explanation of why the answer is correct
-        
-        Format the response as a JSON array where each question is an object with the following structure:
-        {{
-            "id": 1,
-            "question": "What is the capital of France?",
-            "options": ["Paris", "London", "Rome", "Berlin"],
-            "correct_answer": "Paris",
-            "explanation": "Paris is the capital of France."
-        }}
-        
-        Only return the JSON array, nothing else.
-        """
-        
-        # Using DeepSeek R1 through OpenRouter API
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {os.environ.get('OPENROUTER_API_KEY', 'DEMO')}"
-        }
-        
-        payload = {
-            "model": "deepseek/deepseek-r1:free",
-            "messages": [
-                {"role": "system", "content": "You are a helpful assistant that generates quiz questions in JSON format."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 2048
-        }
-        
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        
-        response_data = response.json()
-        
-        # Parse the response
-        quiz_data_text = response_data['choices'][0]['message']['content'].strip()
-        
-        # Extract JSON from the response (in case there's any extra text)
-        quiz_data_text = quiz_data_text.replace("```json", "").replace("```", "").strip()
-        quiz_data = json.loads(quiz_data_text)
-        
-        # Save the quiz to a file
-        with open(quiz_file_path, 'w') as f:
-            json.dump(quiz_data, f, indent=2)
-        
-        # Deduct tokens from user if not admin
-        if not current_user.is_admin():
-            current_user.use_token()
-        
-        return jsonify({
-            'message': 'Quiz generated successfully',
-            'subject': subject,
-            'topic': topic,
-            'file_path': f'{subject_dir_name}/{quiz_file_name}',
-            'num_questions': len(quiz_data),
-            'tokens_used': required_tokens,
-            'tokens_remaining': current_user.tokens
-        }), 201
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        generation_queue.submit(job_id)
+    except QueueFullError as e:
+        job = db.session.get(GenerationJob, job_id)
+        generation_queue.fail_job(job, str(e))
+        return jsonify({'error': str(e)}), 503
+    
+    return _job_response(job, 'Quiz generation started', tokens_remaining, 202)
+
+def _charge(job, required_tokens):
+    """Debit the job's tokens without committing; returns the balance left, or None if it can't be paid"""
+    if current_user.is_admin():
+        return current_user.tokens
+    tokens_remaining = debit_tokens(current_user.id, required_tokens)
+    if tokens_remaining is not None:
+        job.tokens_charged = required_tokens
+    return tokens_remaining
+
+def _job_response(job, message, tokens_remaining, status):
+    response = jsonify({
+        'message': message,
+        'job_id': job.id,
+        'status': job.status,
+        'reused': bool(job.reused),
+        'file_path': job.file_path,
+        'status_url': url_for('ai.get_job', job_id=job.id),
+        'tokens_remaining': tokens_remaining
+    })
+    response.headers['Location'] = url_for('ai.get_job', job_id=job.id)
+    return response, status
+
+@ai_bp.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    job = db.session.get(GenerationJob, job_id)
+    
+    # Only the owner (or an admin) may see a job
+    if job is None or (job.user_id != current_user.id and not current_user.is_admin()):
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({'job': job.to_dict()}), 200
 
 @ai_bp.route('/subjects', methods=['GET'])
 def get_ai_subjects():
-    quiz_dir = get_quiz_dir()
-    
-    # Get all subject directories
+    # Served from the quiz storage's index instead of scanning the quiz directory
     try:
-        subjects = [d for d in os.listdir(quiz_dir) if os.path.isdir(os.path.join(quiz_dir, d))]
-        return jsonify({'subjects': subjects}), 200
+        return catalog_response(('ai_subjects',), lambda: {'subjects': quiz_storage.subjects()}, quiz_storage)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
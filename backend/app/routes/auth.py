@@ -4,13 +4,25 @@ from app import db
 from app.models.user import User
 from werkzeug.security import generate_password_hash, check_password_hash
 import re
+import logging
 from app.utils.email import send_email
+from app.utils.log import log_event
+from app.utils.password_hasher import PasswordHasherBusy
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+logger = logging.getLogger(__name__)
+
 # Email validation regex
 EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
 
+@auth_bp.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    # Every password hashing worker is taken - ask the client to retry shortly
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -71,6 +83,10 @@ def login():
     if not user or not user.check_password(data.get('password')):
         return jsonify({'error': 'Invalid email or password'}), 401
     
+    # Save the upgraded hash if check_password rehashed the password
+    if db.session.is_modified(user):
+        db.session.commit()
+    
     # Log in the user
     login_user(user)
     
@@ -125,7 +141,7 @@ def forgot_password():
     # Create reset link
     reset_link = f"{request.host_url}reset-password?token={token}&email={email}"
     
-    # Send email
+    # Queue the email; the background sender delivers it
     try:
         send_email(
             to=email,
@@ -140,7 +156,7 @@ This link will expire in 1 hour.
         )
         return jsonify({'message': 'If an account exists with this email, you will receive a password reset link'}), 200
     except Exception as e:
-        print(f"Error sending email: {e}")
+        log_event(logger, logging.ERROR, 'reset_email_failed', user_id=user.id, error=str(e))
         return jsonify({'error': 'Failed to send reset email'}), 500
 
 @auth_bp.route('/reset-password', methods=['POST'])
@@ -160,6 +176,8 @@ def reset_password():
     
     # Set new password
     user.set_password(data.get('new_password'))
+    # Sign out every session that used the old password
+    user.revoke_sessions()
     user.clear_reset_token()
     db.session.commit()
     
@@ -1,5 +1,8 @@
-from flask import Blueprint, jsonify
+import os
+import hmac
+from flask import Blueprint, Response, jsonify, request
 from flask_login import login_required
+from app.utils.metrics import metrics
 
 main_bp = Blueprint('main', __name__, url_prefix='/api')
 
@@ -23,4 +26,13 @@ def health_check():
 def protected():
     return jsonify({
         'message': 'This is a protected route, you are authenticated!'
-    }), 200 
\ No newline at end of file
+    }), 200
+
+@main_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Optionally restricted to scrapers that send METRICS_TOKEN as a bearer token
+    token = os.environ.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
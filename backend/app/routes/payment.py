@@ -1,32 +1,58 @@
 import os
-import razorpay
+import logging
+import threading
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models.transaction import Transaction
+from app.utils.settings_store import settings_store
 
 payment_bp = Blueprint('payment', __name__, url_prefix='/api/payment')
 
-# Initialize Razorpay client with error handling
-try:
-    razorpay_client = razorpay.Client(
-        auth=(os.environ.get('RAZORPAY_KEY_ID'), os.environ.get('RAZORPAY_KEY_SECRET'))
-    )
-except Exception as e:
-    print(f"Warning: Failed to initialize Razorpay client: {e}")
-    razorpay_client = None
+_razorpay_client = None
+_razorpay_loaded = False
+_razorpay_lock = threading.Lock()
 
-# Token package options
-TOKEN_PACKAGES = {
+
+def get_razorpay_client():
+    """
+    Return the Razorpay client, created on first use (the razorpay package
+    is slow to import), or None if it could not be initialized.
+    """
+    global _razorpay_client, _razorpay_loaded
+    if not _razorpay_loaded:
+        with _razorpay_lock:
+            if not _razorpay_loaded:
+                # Initialize Razorpay client with error handling
+                try:
+                    import razorpay
+                    _razorpay_client = razorpay.Client(
+                        auth=(os.environ.get('RAZORPAY_KEY_ID'), os.environ.get('RAZORPAY_KEY_SECRET'))
+                    )
+                except Exception as e:
+                    logging.warning(f"Failed to initialize Razorpay client: {e}")
+                    _razorpay_client = None
+                _razorpay_loaded = True
+    return _razorpay_client
+
+
+# Token package options, until an admin changes them
+DEFAULT_TOKEN_PACKAGES = {
     'basic': {'amount': 99, 'tokens': 10},
     'standard': {'amount': 199, 'tokens': 25},
     'premium': {'amount': 499, 'tokens': 75}
 }
 
+
+def token_packages(fresh=False):
+    """The current token packages (the same in every worker), see SettingsStore.get"""
+    return settings_store.get('token_packages', DEFAULT_TOKEN_PACKAGES, fresh=fresh)
+
+
 @payment_bp.route('/packages', methods=['GET'])
 def get_packages():
     return jsonify({
-        'packages': TOKEN_PACKAGES
+        'packages': token_packages()
     }), 200
 
 @payment_bp.route('/create-order', methods=['POST'])
@@ -42,12 +68,14 @@ def create_order():
     package_name = data.get('package')
     
     # Check if package exists
-    if package_name not in TOKEN_PACKAGES:
+    packages = token_packages()
+    if package_name not in packages:
         return jsonify({'error': 'Invalid package selected'}), 400
     
-    package = TOKEN_PACKAGES[package_name]
+    package = packages[package_name]
     
     # Check if Razorpay client is initialized
+    razorpay_client = get_razorpay_client()
     if razorpay_client is None:
         # For development/testing, simulate a successful order creation
         try:
@@ -61,15 +89,15 @@ def create_order():
             )
             
             db.session.add(transaction)
-            db.session.commit()
             
-            # Add tokens to user account
-            current_user.add_tokens(package['tokens'])
+            # Add tokens to user account (same transaction as the record)
+            current_tokens = current_user.add_tokens(package['tokens'])
+            db.session.commit()
             
             return jsonify({
                 'message': 'Test mode: Tokens added successfully',
                 'tokens_added': package['tokens'],
-                'current_tokens': current_user.tokens
+                'current_tokens': current_tokens
             }), 200
         except Exception as e:
             return jsonify({'error': f'Test mode error: {str(e)}'}), 500
@@ -118,6 +146,7 @@ def create_order():
 @login_required
 def verify_payment():
     # Check if Razorpay client is initialized
+    razorpay_client = get_razorpay_client()
     if razorpay_client is None:
         # For development/testing, simulate a successful payment verification
         return jsonify({
@@ -154,15 +183,17 @@ def verify_payment():
         transaction.razorpay_signature = data.get('razorpay_signature')
         
         # Add tokens to user account
-        current_user.add_tokens(transaction.tokens_purchased)
+        current_tokens = current_user.add_tokens(transaction.tokens_purchased)
+        transaction_id = transaction.id
+        tokens_added = transaction.tokens_purchased
         
         db.session.commit()
         
         return jsonify({
             'message': 'Payment verified successfully',
-            'transaction_id': transaction.id,
-            'tokens_added': transaction.tokens_purchased,
-            'current_tokens': current_user.tokens
+            'transaction_id': transaction_id,
+            'tokens_added': tokens_added,
+            'current_tokens': current_tokens
         }), 200
         
     except Exception as e:
@@ -1,40 +1,92 @@
 import os
-import json
-from flask import Blueprint, request, jsonify, current_app
+from datetime import datetime
+import logging
+from flask import Blueprint, Response, request, jsonify, current_app, url_for
 from flask_login import login_required, current_user
 from app import db
-from app.models.quiz_attempt import QuizAttempt
+from app.models.quiz_attempt import QuizAttempt, decode_answers, decode_answer_indexes, decode_question_positions
+from app.utils.answer_codec import OptionsChanged
+from app.utils.quiz_compiler import json_body, json_response
+from app.utils.quiz_storage import quiz_storage, sample_positions
+from app.utils.token_ledger import debit_tokens
+from app.utils.quiz_stats import record_submission, user_stats
+from app.utils.quiz_catalog import parse_listing_args, paginate, catalog_response
+from app.utils.pagination import parse_page_args, stream_page
+from app.utils.metrics import QUIZ_LOAD_SECONDS
+from app.utils.log import log_event
+from app.utils.compression import compression, if_none_match
+from app.utils.review_cache import review_cache
+from app.utils.bulk_submit import submit_attempts, BulkSubmitConflict, MAX_BULK_ATTEMPTS
 
 quiz_bp = Blueprint('quiz', __name__, url_prefix='/api/quizzes')
 
-# Helper function to get quiz directory path
-def get_quiz_dir():
-    return os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'quizzes')
+logger = logging.getLogger(__name__)
+
+# Attempt history page size (?limit=) default and upper bound
+ATTEMPTS_PAGE_SIZE = 50
+MAX_ATTEMPTS_PAGE_SIZE = 200
+
+# Cache-Control of a quiz's questions; the URL names a content version, so they never change
+QUIZ_QUESTIONS_CACHE_CONTROL = os.environ.get('QUIZ_QUESTIONS_CACHE_CONTROL', 'public, max-age=31536000, immutable')
+
+def review_body(attempt, user_answers, results_json):
+    """JSON body of the graded review of a submitted attempt (served by get_quiz_results)"""
+    return json_body({
+        'subject': attempt.subject,
+        'quiz_name': attempt.quiz_name,
+        'attempt_id': attempt.id,
+        'attempt_date': attempt.attempt_date.isoformat() if attempt.attempt_date else None,
+        'score': attempt.score,
+        'total_questions': attempt.total_questions,
+        'percentage': (attempt.score / attempt.total_questions) * 100 if attempt.total_questions > 0 else 0,
+        'user_answers': user_answers
+    }, {'results': results_json})
 
 @quiz_bp.route('/', methods=['GET'])
 def get_subjects():
-    quiz_dir = get_quiz_dir()
+    # Optional pagination and prefix filtering (?prefix=&offset=&limit=)
+    try:
+        prefix, offset, limit = parse_listing_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def render():
+        subjects, total, next_offset = paginate(quiz_storage.subjects(), prefix, offset, limit)
+        return {'subjects': subjects, 'total': total, 'next_offset': next_offset}
     
-    # Get all subject directories
+    # Served from the quiz storage's index (this is also the load balancer health check)
     try:
-        subjects = [d for d in os.listdir(quiz_dir) if os.path.isdir(os.path.join(quiz_dir, d))]
-        return jsonify({'subjects': subjects}), 200
+        return catalog_response(('subjects', prefix, offset, limit), render, quiz_storage)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @quiz_bp.route('/<subject>', methods=['GET'])
 def get_quizzes(subject):
-    quiz_dir = get_quiz_dir()
-    subject_dir = os.path.join(quiz_dir, subject)
+    try:
+        prefix, offset, limit = parse_listing_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Check if subject directory exists
-    if not os.path.exists(subject_dir) or not os.path.isdir(subject_dir):
+    # Check if subject exists
+    try:
+        quizzes = quiz_storage.quizzes(subject)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if quizzes is None:
         return jsonify({'error': 'Subject not found'}), 404
     
-    # Get all quiz files in the subject directory
+    def render():
+        names, total, next_offset = paginate(sorted(quizzes), prefix, offset, limit)
+        return {
+            'subject': subject,
+            'quizzes': names,
+            'details': [dict(quizzes[name], name=name) for name in names],
+            'total': total,
+            'next_offset': next_offset
+        }
+    
     try:
-        quizzes = [f.replace('.json', '') for f in os.listdir(subject_dir) if f.endswith('.json')]
-        return jsonify({'subject': subject, 'quizzes': quizzes}), 200
+        return catalog_response(('quizzes', subject, prefix, offset, limit), render, quiz_storage)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -49,11 +101,23 @@ def get_quiz(subject, quiz_name):
             'needs_tokens': True
         }), 403
     
-    quiz_dir = get_quiz_dir()
-    quiz_file = os.path.join(quiz_dir, subject, f'{quiz_name}.json')
+    # Optional number of questions to sample for a new attempt (?questions=N)
+    sample_size = request.args.get('questions')
+    if sample_size is not None:
+        try:
+            sample_size = int(sample_size)
+        except ValueError:
+            sample_size = 0
+        if sample_size < 1:
+            return jsonify({'error': 'questions must be a positive number'}), 400
     
-    # Check if quiz file exists
-    if not os.path.exists(quiz_file) or not os.path.isfile(quiz_file):
+    try:
+        question_count = quiz_storage.question_count(subject, quiz_name)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    # Check if quiz exists
+    if question_count is None:
         return jsonify({'error': 'Quiz not found'}), 404
     
     # Check if this is a new attempt request
@@ -73,39 +137,54 @@ def get_quiz(subject, quiz_name):
             id=attempt_id
         ).first()
     elif not force_new_attempt:
-        # Otherwise, check if there's any incomplete attempt for this quiz
-        existing_attempts = QuizAttempt.query.filter_by(
+        # Otherwise, resume the most recent started (not yet submitted) attempt
+        existing_attempt = QuizAttempt.query.filter_by(
             user_id=current_user.id,
             subject=subject,
-            quiz_name=quiz_name
-        ).all()
-        
-        # Consider an attempt as "incomplete" if it has a score = 0 and total_questions = 0
-        incomplete_attempts = [a for a in existing_attempts if a.score == 0 and a.total_questions == 0]
-        
-        if incomplete_attempts:
-            # Use the most recent incomplete attempt
-            existing_attempt = incomplete_attempts[0]
+            quiz_name=quiz_name,
+            status=QuizAttempt.STARTED
+        ).order_by(QuizAttempt.attempt_date.desc()).first()
+    
+    log_event(
+        logger, logging.DEBUG, 'quiz_requested',
+        user_id=current_user.id, subject=subject, quiz_name=quiz_name, tokens=current_user.tokens,
+        force_new_attempt=force_new_attempt, existing_attempt_id=existing_attempt.id if existing_attempt else None
+    )
     
-    # Debug information
-    print(f"User: {current_user.username}, Tokens: {current_user.tokens}, Is Admin: {current_user.is_admin()}")
-    print(f"Force new attempt: {force_new_attempt}")
-    print(f"Existing attempt: {existing_attempt}")
+    is_new_attempt = force_new_attempt or not existing_attempt
+    
+    # A resumed attempt keeps the questions it was given; a new one may sample a subset
+    if is_new_attempt:
+        positions = sample_positions(question_count, sample_size) if sample_size and sample_size < question_count else None
+    else:
+        positions = existing_attempt.get_question_positions()
+    
+    # Load the compiled quiz (only the sampled questions are read from the question bank)
+    try:
+        with QUIZ_LOAD_SECONDS.time(storage=quiz_storage.kind):
+            quiz = quiz_storage.get(subject, quiz_name, positions)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if quiz is None:
+        return jsonify({'error': 'Quiz not found'}), 404
     
     # Deduct token if this is a new attempt and user is not admin
     token_deducted = False
     new_attempt_id = None
+    user_tokens = current_user.tokens
     
-    if (force_new_attempt or not existing_attempt) and not current_user.is_admin():
-        print(f"Attempting to deduct token from user {current_user.username} for a new attempt")
-        token_deducted = current_user.use_token()
-        print(f"Token deducted: {token_deducted}, New token balance: {current_user.tokens}")
+    if is_new_attempt and not current_user.is_admin():
+        # Conditional debit - the balance check and the update are one statement
+        balance = debit_tokens(current_user.id, 1)
+        token_deducted = balance is not None
         if not token_deducted:
+            db.session.rollback()
             return jsonify({
                 'error': 'Failed to deduct token. You need at least 1 token to take this quiz.',
-                'tokens': current_user.tokens,
+                'tokens': user_tokens,
                 'needs_tokens': True
             }), 403
+        user_tokens = balance
         
         # Create a quiz attempt record to mark that the user has started this quiz
         quiz_attempt = QuizAttempt(
@@ -113,41 +192,84 @@ def get_quiz(subject, quiz_name):
             subject=subject,
             quiz_name=quiz_name,
             score=0,  # Initial score is 0
-            total_questions=0  # Will be updated when quiz is submitted
+            total_questions=0,  # Will be updated when quiz is submitted
+            status=QuizAttempt.STARTED
         )
+        quiz_attempt.set_question_positions(positions)
         db.session.add(quiz_attempt)
-        db.session.commit()
         
-        # Get the ID of the new attempt
+        # Flush to get the ID of the new attempt, then commit the debit and the attempt together
+        db.session.flush()
         new_attempt_id = quiz_attempt.id
+        db.session.commit()
         existing_attempt = quiz_attempt
         
-        print(f"Created new quiz attempt with ID: {new_attempt_id}")
+        log_event(
+            logger, logging.INFO, 'quiz_attempt_started',
+            user_id=current_user.id, attempt_id=new_attempt_id, subject=subject, quiz_name=quiz_name, tokens=balance
+        )
+    
+    # The questions are the same for everyone taking this version of the quiz, so they can also be
+    # fetched separately from questions_url (precompressed and cacheable, without the answers);
+    # ?inline=false leaves them out
+    questions_url = url_for(
+        'quiz.get_quiz_questions', subject=subject, quiz_name=quiz_name, v=quiz.version,
+        positions=','.join(str(p) for p in quiz.positions) if positions is not None else None
+    )
+    inline = request.args.get('inline') != 'false'
     
-    # Read quiz file
+    # The question list is precompiled (answers already replaced by
+    # correct_answer_index), so it is spliced into the response as-is
+    return json_response({
+        'subject': subject, 
+        'quiz_name': quiz_name, 
+        'token_required': True,
+        'user_tokens': user_tokens,
+        'has_attempted': existing_attempt is not None,
+        'token_deducted': token_deducted,
+        'attempt_id': new_attempt_id or (existing_attempt.id if existing_attempt else None),
+        'is_new_attempt': is_new_attempt,
+        'total_questions': quiz.total_questions,
+        'quiz_question_count': question_count,
+        'questions_version': quiz.version,
+        'questions_url': questions_url
+    }, {'questions': quiz.client_json} if inline else {})
+
+@quiz_bp.route('/<subject>/<quiz_name>/questions', methods=['GET'])
+@login_required
+def get_quiz_questions(subject, quiz_name):
+    # Only versioned URLs (handed out by get_quiz as questions_url) are served
+    version = request.args.get('v')
+    if not version:
+        return jsonify({'error': 'Missing quiz version'}), 400
     try:
-        with open(quiz_file, 'r') as f:
-            quiz_data = json.load(f)
-            
-            # Remove correct answers for client-side rendering
-            for question in quiz_data:
-                if 'correct_answer' in question:
-                    question['correct_answer_index'] = question['options'].index(question['correct_answer'])
-                    del question['correct_answer']
-            
-            return jsonify({
-                'subject': subject, 
-                'quiz_name': quiz_name, 
-                'questions': quiz_data,
-                'token_required': True,
-                'user_tokens': current_user.tokens,
-                'has_attempted': existing_attempt is not None,
-                'token_deducted': token_deducted,
-                'attempt_id': new_attempt_id or (existing_attempt.id if existing_attempt else None),
-                'is_new_attempt': force_new_attempt or not existing_attempt
-            }), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        positions = [int(p) for p in request.args['positions'].split(',')] if request.args.get('positions') else None
+    except ValueError:
+        return jsonify({'error': 'positions must be a comma-separated list of numbers'}), 400
+    
+    # A version always names the same questions, so a cached body is served without loading the quiz
+    key = ('quiz_questions', subject, quiz_name, version)
+    entry = compression.cached(key)
+    if entry is None:
+        try:
+            with QUIZ_LOAD_SECONDS.time(storage=quiz_storage.kind):
+                quiz = quiz_storage.get(subject, quiz_name, positions)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        # The quiz changed since the URL was handed out
+        if quiz is None or quiz.version != version:
+            return jsonify({'error': 'Quiz version not found'}), 404
+        
+        # Serialized and compressed once per quiz version; the body is shared by everyone (and by
+        # caches), so it leaves out the answers - they are only in the graded results
+        entry = compression.precompressed(key, lambda: json_body({
+            'subject': subject,
+            'quiz_name': quiz_name,
+            'version': quiz.version,
+            'total_questions': quiz.total_questions
+        }, {'questions': quiz.public_json}))
+    
+    return compression.send(entry, cache_control=QUIZ_QUESTIONS_CACHE_CONTROL)
 
 @quiz_bp.route('/<subject>/<quiz_name>/submit', methods=['POST'])
 @login_required
@@ -158,17 +280,18 @@ def submit_quiz(subject, quiz_name):
     if not data or not data.get('answers'):
         return jsonify({'error': 'Missing answers'}), 400
     
-    quiz_dir = get_quiz_dir()
-    quiz_file = os.path.join(quiz_dir, subject, f'{quiz_name}.json')
-    
-    # Check if quiz file exists
-    if not os.path.exists(quiz_file) or not os.path.isfile(quiz_file):
-        return jsonify({'error': 'Quiz not found'}), 404
+    # Check if quiz exists
+    try:
+        if not quiz_storage.exists(subject, quiz_name):
+            return jsonify({'error': 'Quiz not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     
     # Get the attempt ID if provided
     attempt_id = data.get('attempt_id')
     
-    # Check if we should preserve the existing score (used by QuizResults to get details without changing score)
+    # Check if we should preserve the existing score (regrades without changing it; the results page uses
+    # the read-only GET /results instead)
     preserve_score = data.get('preserve_score', False)
     
     # Get the user's answers
@@ -195,92 +318,102 @@ def submit_quiz(subject, quiz_name):
     # If no attempt exists, create one now (this handles cases where the session expired or page was refreshed)
     # But DO NOT deduct tokens here - tokens should only be deducted when starting a quiz
     if not existing_attempt:
-        print(f"No existing attempt found for user {current_user.username} on quiz {subject}/{quiz_name}. Creating one now.")
-        
         # Create a new quiz attempt without deducting tokens
         existing_attempt = QuizAttempt(
             user_id=current_user.id,
             subject=subject,
             quiz_name=quiz_name,
             score=0,
-            total_questions=0
+            total_questions=0,
+            status=QuizAttempt.STARTED
         )
         db.session.add(existing_attempt)
         db.session.commit()
         
-        print(f"Created new quiz attempt for user {current_user.username}")
+        log_event(
+            logger, logging.INFO, 'quiz_attempt_created_on_submit',
+            user_id=current_user.id, attempt_id=existing_attempt.id, subject=subject, quiz_name=quiz_name
+        )
     
     # Store the original score and total questions if we need to preserve them
     original_score = existing_attempt.score
     original_total_questions = existing_attempt.total_questions
     
-    # Always store the user's answers in the attempt record
-    existing_attempt.set_user_answers(user_answers)
-    db.session.commit()
-    print(f"Stored user answers for attempt {existing_attempt.id}")
-    
-    # Read quiz file to check answers
     try:
-        with open(quiz_file, 'r') as f:
-            quiz_data = json.load(f)
-            
-            # Calculate score
-            score = 0
-            total_questions = len(quiz_data)
-            
-            results = []
-            
-            for i, question in enumerate(quiz_data):
-                # Ensure we have a valid question with all required fields
-                if not isinstance(question, dict) or 'question' not in question or 'options' not in question or 'correct_answer' not in question:
-                    print(f"Warning: Invalid question format at index {i}")
-                    continue
-                    
-                user_answer = ''
-                if i < len(user_answers):
-                    user_answer = user_answers[i]
-                
-                is_correct = user_answer == question['correct_answer']
-                
-                if is_correct:
-                    score += 1
-                
-                # Create a result object with all required fields
-                result = {
-                    'question': question['question'],
-                    'options': question['options'],
-                    'user_answer': user_answer,
-                    'correct_answer': question['correct_answer'],
-                    'is_correct': is_correct,
-                    'explanation': question.get('explanation', 'No explanation provided.')
-                }
-                
-                results.append(result)
-            
-            # Update the quiz attempt with the score, unless we're preserving the original score
-            if not preserve_score:
+        # The questions the attempt was given - answers are stored as indexes of their options
+        with QUIZ_LOAD_SECONDS.time(storage=quiz_storage.kind):
+            quiz = quiz_storage.get(subject, quiz_name, existing_attempt.get_question_positions())
+        if quiz is None:
+            return jsonify({'error': 'Quiz not found'}), 404
+        
+        # A regraded attempt's old result is taken out of the statistics again
+        previous_result = None
+        if existing_attempt.status == QuizAttempt.SUBMITTED:
+            try:
+                previous_answers = existing_attempt.get_user_answers(quiz)
+            except OptionsChanged:
+                # Answered against other questions - only the totals can be taken out
+                previous_answers = None
+            previous_result = (original_score, original_total_questions, previous_answers)
+        
+        # Grade the answers against the precompiled answer key of the questions the attempt was given
+        score, results_json = quiz.grade(user_answers)
+        total_questions = quiz.total_questions
+        message = 'Quiz submitted successfully'
+        
+        # Update the quiz attempt with the score, unless we're preserving the original score
+        if not preserve_score:
+            # Statistics are updated in the same transaction as the attempt, which is only written
+            # if no concurrent submit of it got there first
+            if not record_submission(existing_attempt, quiz, score, total_questions, user_answers, previous_result):
+                db.session.rollback()
+                # Report the result that request stored instead of overwriting it
+                try:
+                    user_answers = existing_attempt.get_user_answers(quiz)
+                except OptionsChanged:
+                    user_answers = []
+                _, results_json = quiz.grade(user_answers)
+                score = existing_attempt.score
+                total_questions = existing_attempt.total_questions
+                message = 'Quiz was already submitted'
+                log_event(
+                    logger, logging.INFO, 'quiz_submit_lost_race',
+                    user_id=current_user.id, attempt_id=existing_attempt.id, subject=subject, quiz_name=quiz_name
+                )
+            else:
+                existing_attempt.set_user_answers(user_answers, quiz)
                 existing_attempt.score = score
                 existing_attempt.total_questions = total_questions
+                existing_attempt.status = QuizAttempt.SUBMITTED
                 db.session.commit()
-                print(f"Updated quiz attempt {existing_attempt.id} with score {score}/{total_questions}")
-            else:
-                print(f"Preserving original score {original_score}/{original_total_questions} for attempt {existing_attempt.id}")
-                # Use the original score for the response
-                score = original_score
-                total_questions = original_total_questions
-            
-            return jsonify({
-                'message': 'Quiz submitted successfully',
-                'score': score,
-                'total_questions': total_questions,
-                'percentage': (score / total_questions) * 100 if total_questions > 0 else 0,
-                'results': results,
-                'tokens_remaining': current_user.tokens,
-                'attempt_id': existing_attempt.id,
-                'user_answers': user_answers  # Include user answers in the response
-            }), 200
+                # The results page is served from the cache without regrading
+                review_cache.put(existing_attempt, quiz.version, review_body(existing_attempt, user_answers, results_json))
+                log_event(
+                    logger, logging.INFO, 'quiz_submitted',
+                    user_id=current_user.id, attempt_id=existing_attempt.id, subject=subject, quiz_name=quiz_name,
+                    score=score, total_questions=total_questions
+                )
+        else:
+            # Only the answers are stored; use the original score for the response
+            existing_attempt.set_user_answers(user_answers, quiz)
+            db.session.commit()
+            score = original_score
+            total_questions = original_total_questions
+        
+        return json_response({
+            'message': message,
+            'score': score,
+            'total_questions': total_questions,
+            'percentage': (score / total_questions) * 100 if total_questions > 0 else 0,
+            'tokens_remaining': current_user.tokens,
+            'attempt_id': existing_attempt.id,
+            'user_answers': user_answers  # Include user answers in the response
+        }, {'results': results_json})
     except Exception as e:
-        print(f"Error submitting quiz: {str(e)}")
+        log_event(
+            logger, logging.ERROR, 'quiz_submit_failed',
+            user_id=current_user.id, subject=subject, quiz_name=quiz_name, error=str(e)
+        )
         # Return a minimal response with empty results array
         return jsonify({
             'error': str(e),
@@ -290,20 +423,153 @@ def submit_quiz(subject, quiz_name):
             'results': []
         }), 500
 
+@quiz_bp.route('/attempts/bulk', methods=['POST'])
+@login_required
+def bulk_submit():
+    # Many attempts across quizzes (e.g. synced from offline kiosks), graded and stored in one transaction
+    data = request.get_json(silent=True)
+    items = data.get('attempts') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Missing attempts'}), 400
+    if len(items) > MAX_BULK_ATTEMPTS:
+        return jsonify({'error': f'At most {MAX_BULK_ATTEMPTS} attempts can be submitted at once'}), 413
+    
+    try:
+        results = submit_attempts(current_user.id, items, quiz_storage)
+    except BulkSubmitConflict as e:
+        return jsonify({'error': str(e)}), 409
+    
+    counts = {status: 0 for status in ('created', 'updated', 'duplicate', 'error')}
+    for result in results:
+        counts[result['status']] += 1
+    log_event(logger, logging.INFO, 'quiz_bulk_submitted', user_id=current_user.id, attempts=len(items), **counts)
+    
+    return jsonify({'results': results, **counts})
+
+@quiz_bp.route('/<subject>/<quiz_name>/results', methods=['GET'])
+@login_required
+def get_quiz_results(subject, quiz_name):
+    # Read-only graded review of a submitted attempt (?attempt_id=, the most recent one by default)
+    query = QuizAttempt.query.options(db.undefer_group('answers')).filter_by(
+        user_id=current_user.id,
+        subject=subject,
+        quiz_name=quiz_name,
+        status=QuizAttempt.SUBMITTED
+    )
+    attempt_id = request.args.get('attempt_id')
+    if attempt_id:
+        try:
+            attempt = query.filter_by(id=int(attempt_id)).first()
+        except ValueError:
+            return jsonify({'error': 'attempt_id must be a number'}), 400
+    else:
+        attempt = query.order_by(QuizAttempt.attempt_date.desc()).first()
+    if attempt is None:
+        return jsonify({'error': 'No submitted attempt found'}), 404
+    
+    try:
+        with QUIZ_LOAD_SECONDS.time(storage=quiz_storage.kind):
+            quiz = quiz_storage.get(subject, quiz_name, attempt.get_question_positions())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if quiz is None:
+        return jsonify({'error': 'Quiz not found'}), 404
+    
+    # Cached per attempt and quiz version; a changed quiz or a resubmitted attempt is regraded once
+    entry = review_cache.get(attempt, quiz.version)
+    if entry is None:
+        try:
+            user_answers = attempt.get_user_answers(quiz)
+        except OptionsChanged:
+            # The stored indexes would name other options now
+            return jsonify({'error': 'The quiz has changed since this attempt was submitted, '
+                                     'so its answers can no longer be shown'}), 409
+        _, results_json = quiz.grade(user_answers)
+        entry = review_cache.put(attempt, quiz.version, review_body(attempt, user_answers, results_json))
+    
+    # Nothing is written - the stored score is reported, the results are regraded only for display
+    if if_none_match(entry.etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @quiz_bp.route('/attempts', methods=['GET'])
 @login_required
 def get_attempts():
-    attempts = QuizAttempt.query.filter_by(user_id=current_user.id).order_by(QuizAttempt.attempt_date.desc()).all()
+    # Keyset pagination on (attempt_date, id), newest first (?cursor=&limit=)
+    try:
+        cursor, limit = parse_page_args(ATTEMPTS_PAGE_SIZE, MAX_ATTEMPTS_PAGE_SIZE)
+        if cursor is not None:
+            cursor_date, cursor_id = datetime.fromisoformat(cursor[0]), int(cursor[1])
+    except (ValueError, IndexError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # The answers columns are only read (and decoded) when the client asks for them:
+    # ?include_answers=true for the answer texts, =indexes for the chosen option indexes
+    answers_format = request.args.get('include_answers')
+    include_answers = answers_format in ('true', 'indexes')
+    
+    columns = [
+        QuizAttempt.id, QuizAttempt.subject, QuizAttempt.quiz_name, QuizAttempt.score,
+        QuizAttempt.total_questions, QuizAttempt.attempt_date
+    ]
+    if include_answers:
+        columns.extend([QuizAttempt.user_answers, QuizAttempt.answers_packed, QuizAttempt.question_positions])
+    
+    query = db.select(*columns).where(QuizAttempt.user_id == current_user.id)
+    if cursor is not None:
+        query = query.where(db.or_(
+            QuizAttempt.attempt_date < cursor_date,
+            db.and_(QuizAttempt.attempt_date == cursor_date, QuizAttempt.id < cursor_id)
+        ))
+    query = query.order_by(QuizAttempt.attempt_date.desc(), QuizAttempt.id.desc()).limit(limit + 1)
     
-    return jsonify({
-        'attempts': [{
+    # Quizzes needed to decode answers, loaded once per page
+    quizzes = {}
+    
+    def attempt_quiz(a):
+        key = (a.subject, a.quiz_name, a.question_positions)
+        if key not in quizzes:
+            try:
+                positions = decode_question_positions(a.question_positions)
+                quizzes[key] = quiz_storage.get(a.subject, a.quiz_name, positions)
+            except Exception:
+                quizzes[key] = None
+        return quizzes[key]
+    
+    def render(a):
+        attempt = {
             'id': a.id,
             'subject': a.subject,
             'quiz_name': a.quiz_name,
             'score': a.score,
             'total_questions': a.total_questions,
             'percentage': (a.score / a.total_questions) * 100 if a.total_questions > 0 else 0,
-            'attempt_date': a.attempt_date.isoformat(),
-            'user_answers': a.get_user_answers()
-        } for a in attempts]
-    }), 200 
\ No newline at end of file
+            'attempt_date': a.attempt_date.isoformat()
+        }
+        if include_answers:
+            # The quiz decodes (and checks) packed answers, and maps JSON answers to indexes
+            quiz = attempt_quiz(a) if a.answers_packed is not None or answers_format == 'indexes' else None
+            key = 'answer_indexes' if answers_format == 'indexes' else 'user_answers'
+            try:
+                decode = decode_answer_indexes if key == 'answer_indexes' else decode_answers
+                attempt[key] = decode(a.user_answers, a.answers_packed, quiz, a.id)
+            except OptionsChanged:
+                # Stored for options the quiz no longer has
+                attempt[key] = None
+            except ValueError:
+                # The quiz no longer exists
+                attempt[key] = []
+        return attempt
+    
+    rows = db.session.execute(query)
+    return stream_page('attempts', rows, limit, render, lambda a: (a.attempt_date.isoformat(), a.id))
+
+@quiz_bp.route('/attempts/summary', methods=['GET'])
+@login_required
+def get_attempts_summary():
+    # Totals over every submitted attempt, from the running statistics (the history is paginated)
+    return jsonify({'stats': user_stats(current_user.id)}), 200
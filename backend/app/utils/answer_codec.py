@@ -0,0 +1,103 @@
+import json
+import hashlib
+from array import array
+
+# Layout of a packed answer list: one format byte, OPTIONS_DIGEST_SIZE bytes of
+# options_digest() of the option lists it was packed with, then one signed byte
+# per answer - the index of the chosen option in its question's option list, or
+# one of the markers below.
+FORMAT_VERSION = 1
+OPTIONS_DIGEST_SIZE = 4
+NO_ANSWER = -1     # ''
+NULL_ANSWER = -2   # None / null
+MAX_OPTION_INDEX = 127
+
+
+class OptionsChanged(ValueError):
+    """Raised when packed answers are decoded against option lists other than the ones they were packed with"""
+
+
+def options_digest(option_lists):
+    """Short hash of the option lists of a quiz's questions, stored with the answers packed against them"""
+    data = json.dumps(option_lists, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha1(data).digest()[:OPTIONS_DIGEST_SIZE]
+
+
+def pack_answers(answers, option_lists, digest=None):
+    """
+    Encode answers (option texts) as the indexes of the options in
+    `option_lists` (the options of each question, in order; None for a
+    question without a valid option list). `digest` is options_digest() of
+    them, if the caller has it already.
+
+    Returns None when an answer can't be encoded - it isn't one of its
+    question's options, or there are more answers than questions - so the
+    caller can store the answers another way.
+    """
+    if len(answers) > len(option_lists):
+        return None
+
+    packed = array('b')
+    for answer, options in zip(answers, option_lists):
+        if answer is None:
+            packed.append(NULL_ANSWER)
+        elif answer == '':
+            packed.append(NO_ANSWER)
+        elif isinstance(answer, str) and options and answer in options:
+            index = options.index(answer)
+            if index > MAX_OPTION_INDEX:
+                return None
+            packed.append(index)
+        else:
+            return None
+    return bytes([FORMAT_VERSION]) + (digest or options_digest(option_lists)) + packed.tobytes()
+
+
+def _unpack(blob, option_lists, digest=None):
+    # The raw indexes, after checking the options they were packed with are `option_lists` (when given)
+    blob = bytes(blob)
+    if blob[:1] != bytes([FORMAT_VERSION]):
+        raise ValueError(f'Unknown packed answers format: {blob[0] if blob else None}')
+    if option_lists is not None and blob[1:1 + OPTIONS_DIGEST_SIZE] != (digest or options_digest(option_lists)):
+        raise OptionsChanged('The questions changed since these answers were stored')
+    packed = array('b')
+    packed.frombytes(blob[1 + OPTIONS_DIGEST_SIZE:])
+    return packed
+
+
+def unpack_indexes(blob, option_lists=None, digest=None):
+    """
+    Decode a packed answer list to option indexes (None where there is no answer).
+
+    Raises OptionsChanged if `option_lists` are given and aren't the ones the
+    answers were packed with, ValueError for data in an unknown format.
+    """
+    return [index if index >= 0 else None for index in _unpack(blob, option_lists, digest)]
+
+
+def unpack_answers(blob, option_lists, digest=None):
+    """
+    Decode a packed answer list back to option texts, using the same option
+    lists it was packed with (`digest` is their options_digest(), if known).
+
+    Raises OptionsChanged if the option lists changed since the answers were
+    packed (their indexes would name other options), ValueError for data in
+    an unknown format.
+    """
+    answers = []
+    for i, index in enumerate(_unpack(blob, option_lists, digest)):
+        if index == NULL_ANSWER:
+            answers.append(None)
+            continue
+        options = option_lists[i] if i < len(option_lists) else None
+        answers.append(options[index] if index >= 0 and options and index < len(options) else '')
+    return answers
+
+
+def answer_indexes(answers, option_lists):
+    """Option index of every answer text, None where it isn't one of its question's options"""
+    indexes = []
+    for i, answer in enumerate(answers):
+        options = option_lists[i] if i < len(option_lists) else None
+        indexes.append(options.index(answer) if isinstance(answer, str) and options and answer in options else None)
+    return indexes
@@ -0,0 +1,75 @@
+import os
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.quiz_attempt import QuizAttempt
+
+
+def sweep_stale_attempts(max_age_hours):
+    """
+    Mark started attempts older than `max_age_hours` as abandoned.
+
+    Runs as a single indexed UPDATE and returns the number of attempts
+    marked. Must be called inside an app context.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    result = db.session.execute(
+        db.update(QuizAttempt)
+        .where(QuizAttempt.status == QuizAttempt.STARTED, QuizAttempt.attempt_date < cutoff)
+        .values(status=QuizAttempt.ABANDONED)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+class AttemptSweeper:
+    """Background thread that periodically abandons stale started attempts"""
+
+    def __init__(self, app, interval, max_age_hours):
+        self.app = app
+        self.interval = interval
+        self.max_age_hours = max_age_hours
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='attempt-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # Sleep first so app startup isn't slowed down by the sweep
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    swept = sweep_stale_attempts(self.max_age_hours)
+                    if swept:
+                        logging.info(f"Marked {swept} stale quiz attempt(s) as abandoned")
+                except Exception as e:
+                    db.session.rollback()
+                    logging.error(f"Attempt sweep failed: {str(e)}")
+                finally:
+                    db.session.remove()
+
+
+def start_attempt_sweeper(app):
+    """
+    Start the sweeper for an app, configured from the environment.
+
+    ATTEMPT_SWEEP_INTERVAL (seconds, 0 disables) and ATTEMPT_STALE_HOURS.
+    """
+    interval = float(os.environ.get('ATTEMPT_SWEEP_INTERVAL', '600'))
+    if interval <= 0:
+        return None
+
+    sweeper = AttemptSweeper(app, interval, float(os.environ.get('ATTEMPT_STALE_HOURS', '24')))
+    sweeper.start()
+    return sweeper
@@ -0,0 +1,248 @@
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.quiz_attempt import QuizAttempt
+from app.utils.answer_codec import OptionsChanged
+from app.utils.quiz_stats import SubmissionStats, claim_submissions, regrade_submission
+
+# Most attempts accepted by one bulk submission
+MAX_BULK_ATTEMPTS = int(os.environ.get('BULK_SUBMIT_MAX_ATTEMPTS', '500'))
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 64
+
+
+class BulkSubmitConflict(Exception):
+    """Raised when a concurrent request stored one of the idempotency keys first"""
+
+
+def _error(index, key, message):
+    return {'index': index, 'key': key, 'status': 'error', 'error': message}
+
+
+def _result(index, key, status, attempt_id, score, total_questions):
+    return {
+        'index': index,
+        'key': key,
+        'status': status,
+        'attempt_id': attempt_id,
+        'score': score,
+        'total_questions': total_questions,
+        'percentage': (score / total_questions) * 100 if total_questions > 0 else 0
+    }
+
+
+def _parse_item(item):
+    """Validate one submitted attempt; raises ValueError with a message for the client"""
+    if not isinstance(item, dict):
+        raise ValueError('Each attempt must be an object')
+
+    key = item.get('key')
+    if not isinstance(key, str) or not 0 < len(key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise ValueError(f'key must be a string of 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters')
+    subject, quiz_name = item.get('subject'), item.get('quiz_name')
+    if not isinstance(subject, str) or not subject or not isinstance(quiz_name, str) or not quiz_name:
+        raise ValueError('subject and quiz_name are required')
+    answers = item.get('answers')
+    if not isinstance(answers, list) or not answers:
+        raise ValueError('Missing answers')
+
+    attempt_id = item.get('attempt_id')
+    if attempt_id is not None and (isinstance(attempt_id, bool) or not isinstance(attempt_id, int)):
+        raise ValueError('attempt_id must be a number')
+
+    # When the attempt was taken (offline), stored as naive UTC like attempt_date; never in the future
+    attempt_date = item.get('attempt_date')
+    if attempt_date is not None:
+        try:
+            attempt_date = datetime.fromisoformat(attempt_date)
+        except (TypeError, ValueError):
+            raise ValueError('attempt_date must be an ISO 8601 date and time')
+        if attempt_date.tzinfo is not None:
+            attempt_date = attempt_date.astimezone(timezone.utc).replace(tzinfo=None)
+        attempt_date = min(attempt_date, datetime.utcnow())
+
+    return {
+        'key': key,
+        'subject': subject,
+        'quiz_name': quiz_name,
+        'answers': answers,
+        'attempt_id': attempt_id,
+        'attempt_date': attempt_date
+    }
+
+
+def submit_attempts(user_id, items, storage):
+    """
+    Grade and store a batch of quiz attempts of one user in a single transaction.
+
+    Every item has an idempotency `key` (unique per user), `subject`,
+    `quiz_name`, `answers`, and optionally the `attempt_id` of a started
+    attempt and the `attempt_date` it was taken. An item whose key was
+    stored before is reported as a duplicate with its stored result and not
+    graded again, so retrying a request is safe. New attempts are written
+    with one bulk INSERT, started ones with one bulk UPDATE, regrades of
+    submitted ones with a conditional UPDATE each, and the statistics with
+    one upsert per table. An update never replaces the idempotency key an
+    attempt was stored with.
+
+    Returns one result dict per item, in order. Raises BulkSubmitConflict
+    (after rolling back) if a concurrent request stored one of the keys first.
+    """
+    results = [None] * len(items)
+    entries = []
+    seen_keys, seen_attempts = set(), set()
+
+    for index, item in enumerate(items):
+        try:
+            entry = _parse_item(item)
+        except ValueError as e:
+            results[index] = _error(index, item.get('key') if isinstance(item, dict) else None, str(e))
+            continue
+        if entry['key'] in seen_keys:
+            results[index] = _error(index, entry['key'], 'Idempotency key repeated in this request')
+            continue
+        if entry['attempt_id'] is not None and entry['attempt_id'] in seen_attempts:
+            results[index] = _error(index, entry['key'], 'Attempt repeated in this request')
+            continue
+        seen_keys.add(entry['key'])
+        seen_attempts.add(entry['attempt_id'])
+        entries.append((index, entry))
+
+    if not entries:
+        return results
+
+    # Results stored by an earlier try of the same items
+    stored = {
+        row.idempotency_key: row for row in db.session.execute(
+            db.select(QuizAttempt.id, QuizAttempt.idempotency_key, QuizAttempt.score, QuizAttempt.total_questions)
+            .where(QuizAttempt.user_id == user_id, QuizAttempt.idempotency_key.in_(seen_keys))
+        )
+    }
+
+    # Started (or earlier submitted) attempts the items refer to, with their answers for regrading
+    attempt_ids = [entry['attempt_id'] for _, entry in entries
+                   if entry['attempt_id'] is not None and entry['key'] not in stored]
+    attempts = {}
+    if attempt_ids:
+        attempts = {
+            attempt.id: attempt for attempt in QuizAttempt.query.options(db.undefer_group('answers'))
+            .filter(QuizAttempt.user_id == user_id, QuizAttempt.id.in_(attempt_ids))
+        }
+
+    # Answer keys, loaded once per quiz (and question sample) in the batch
+    quizzes = {}
+
+    def load_quiz(subject, quiz_name, positions):
+        cache_key = (subject, quiz_name, tuple(positions) if positions is not None else None)
+        if cache_key not in quizzes:
+            try:
+                quizzes[cache_key] = storage.get(subject, quiz_name, positions)
+            except Exception:
+                quizzes[cache_key] = None
+        return quizzes[cache_key]
+
+    now = datetime.utcnow()
+    inserts, updates, regrades, graded = [], {}, {}, []
+    for index, entry in entries:
+        key = entry['key']
+        if key in stored:
+            row = stored[key]
+            results[index] = _result(index, key, 'duplicate', row.id, row.score, row.total_questions)
+            continue
+
+        attempt = None
+        if entry['attempt_id'] is not None:
+            attempt = attempts.get(entry['attempt_id'])
+            if attempt is None or (attempt.subject, attempt.quiz_name) != (entry['subject'], entry['quiz_name']):
+                results[index] = _error(index, key, 'Attempt not found')
+                continue
+
+        quiz = load_quiz(entry['subject'], entry['quiz_name'], attempt.get_question_positions() if attempt else None)
+        if quiz is None:
+            results[index] = _error(index, key, 'Quiz not found')
+            continue
+
+        answers = entry['answers']
+        score = sum(is_correct for _, is_correct in quiz.question_results(answers))
+        answers_packed, user_answers = QuizAttempt.encode_answers(answers, quiz)
+        row = {
+            'score': score,
+            'total_questions': quiz.total_questions,
+            'status': QuizAttempt.SUBMITTED,
+            'answers_packed': answers_packed,
+            'user_answers': user_answers
+        }
+        # The key identifies the request that stored the attempt; a later regrade keeps it, so a
+        # retry of that request is still recognized as a duplicate
+        if attempt is None or attempt.idempotency_key is None:
+            row['idempotency_key'] = key
+        if attempt is None:
+            row.update(
+                user_id=user_id,
+                subject=entry['subject'],
+                quiz_name=entry['quiz_name'],
+                attempt_date=entry['attempt_date'] or now
+            )
+            inserts.append(row)
+        elif attempt.status == QuizAttempt.SUBMITTED:
+            regrades[attempt.id] = row
+        else:
+            row['id'] = attempt.id
+            updates[attempt.id] = row
+        graded.append((index, entry, attempt, quiz, score))
+
+    try:
+        # Started attempts are claimed first, so one submitted concurrently since it was read isn't counted twice
+        claimed = claim_submissions(list(updates))
+        # Submitted ones are only regraded if their result is still the one read above
+        regraded = {attempt_id for attempt_id, row in regrades.items() if regrade_submission(attempts[attempt_id], row)}
+
+        stats = SubmissionStats()
+        written = []
+        for index, entry, attempt, quiz, score in graded:
+            key = entry['key']
+            if attempt is not None and attempt.id not in claimed and attempt.id not in regraded:
+                results[index] = _error(index, key, 'Attempt was submitted by another request')
+                updates.pop(attempt.id, None)
+                continue
+
+            stats.add(user_id, entry['subject'], entry['quiz_name'], quiz, score, quiz.total_questions,
+                      entry['answers'], first=attempt is None or attempt.id in claimed)
+            if attempt is not None and attempt.status == QuizAttempt.SUBMITTED:
+                # A regraded attempt's old result is taken out of the statistics again
+                try:
+                    previous_answers = attempt.get_user_answers(quiz)
+                except OptionsChanged:
+                    previous_answers = None
+                stats.add(user_id, entry['subject'], entry['quiz_name'], quiz, attempt.score,
+                          attempt.total_questions, previous_answers, first=False, sign=-1)
+            written.append((index, key, attempt.id if attempt is not None else None, score, quiz.total_questions))
+
+        if inserts:
+            db.session.execute(db.insert(QuizAttempt), inserts)
+        if updates:
+            db.session.execute(db.update(QuizAttempt), list(updates.values()))
+        stats.write()
+
+        # Ids of the inserted attempts, by their keys
+        created = {}
+        if inserts:
+            created = dict(db.session.execute(
+                db.select(QuizAttempt.idempotency_key, QuizAttempt.id)
+                .where(QuizAttempt.user_id == user_id,
+                       QuizAttempt.idempotency_key.in_([row['idempotency_key'] for row in inserts]))
+            ).all())
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise BulkSubmitConflict('Some of these attempts are being submitted by another request; retry the request')
+
+    for index, key, attempt_id, score, total_questions in written:
+        if attempt_id is None:
+            results[index] = _result(index, key, 'created', created[key], score, total_questions)
+        else:
+            results[index] = _result(index, key, 'updated', attempt_id, score, total_questions)
+    return results
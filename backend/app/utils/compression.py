@@ -0,0 +1,198 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+# brotli is optional - without it responses are only gzip-compressed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types worth compressing
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/plain', 'text/html', 'text/css', 'application/javascript'}
+
+
+def if_none_match(etag):
+    """
+    True if the request's If-None-Match matches `etag` in any encoding.
+
+    Compressed responses carry the ETag with an `-<encoding>` suffix, so
+    caches revalidating a compressed copy send the suffixed tag back.
+    """
+    tags = request.if_none_match
+    return tags.contains(etag) or any(tags.contains(f'{etag}-{encoding}') for encoding in ('gzip', 'br'))
+
+
+class PrecompressedBody:
+    """A response body compressed ahead of time, in every encoding the server supports"""
+
+    __slots__ = ('etag', 'encodings')
+
+    def __init__(self, body, etag, encodings):
+        self.etag = etag
+        # encoding -> bytes; None is the uncompressed body
+        self.encodings = {None: body}
+        self.encodings.update(encodings)
+
+
+class Compression:
+    """
+    Response compression with Accept-Encoding negotiation (brotli, then gzip).
+
+    Responses are compressed in an after_request hook. Bodies that are sent
+    many times over (a quiz's questions) are compressed once with `precompress`
+    and served with `send`, which skips the per-request compression.
+    """
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=4, precompress_brotli_quality=11, max_entries=512):
+        self.enabled = True
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.precompress_brotli_quality = precompress_brotli_quality
+        self.max_entries = max_entries
+        self._precompressed = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._compressed = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+
+    def init_app(self, app):
+        self.enabled = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+        self.min_size = int(os.environ.get('COMPRESSION_MIN_SIZE', self.min_size))
+        self.gzip_level = int(os.environ.get('COMPRESSION_GZIP_LEVEL', self.gzip_level))
+        self.brotli_quality = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', self.brotli_quality))
+        self.max_entries = int(os.environ.get('PRECOMPRESSED_MAX_ENTRIES', self.max_entries))
+        app.after_request(self._after_request)
+
+    def encodings(self):
+        """Supported encodings, most preferred first"""
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def negotiate(self):
+        """The best encoding the client accepts, or None for an uncompressed response"""
+        if not self.enabled:
+            return None
+        best, best_quality = None, 0
+        for encoding in self.encodings():
+            quality = request.accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, data, encoding, precompress=False):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.precompress_brotli_quality if precompress else self.brotli_quality)
+        # mtime=0 keeps the output identical across workers and restarts
+        return gzip.compress(data, compresslevel=9 if precompress else self.gzip_level, mtime=0)
+
+    def precompressed(self, key, build):
+        """
+        Return the PrecompressedBody for `key`, building it at most once while it stays cached.
+
+        `build` is called with no arguments and returns the body as a str or
+        bytes; the ETag is a hash of the body so it is identical across workers.
+        """
+        with self._lock:
+            entry = self._precompressed.get(key)
+            if entry is not None:
+                self._precompressed.move_to_end(key)
+                self._hits += 1
+                return entry
+            self._misses += 1
+
+        body = build()
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        entry = PrecompressedBody(
+            body,
+            hashlib.sha1(body).hexdigest()[:20],
+            {encoding: self.compress(body, encoding, precompress=True) for encoding in self.encodings()}
+        )
+
+        with self._lock:
+            self._precompressed[key] = entry
+            self._precompressed.move_to_end(key)
+            while len(self._precompressed) > self.max_entries:
+                self._precompressed.popitem(last=False)
+        return entry
+
+    def cached(self, key):
+        """The PrecompressedBody for `key` if it is cached, without building it"""
+        with self._lock:
+            entry = self._precompressed.get(key)
+            if entry is not None:
+                self._precompressed.move_to_end(key)
+                self._hits += 1
+            return entry
+
+    def send(self, entry, mimetype='application/json', cache_control='no-cache'):
+        """Serve a PrecompressedBody in the negotiated encoding, answering 304 when the client's ETag matches"""
+        encoding = self.negotiate()
+        if if_none_match(entry.etag):
+            response = Response(status=304)
+        else:
+            response = Response(entry.encodings[encoding], mimetype=mimetype)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(f'{entry.etag}-{encoding}' if encoding else entry.etag)
+        response.headers['Cache-Control'] = cache_control
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._precompressed.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'brotli': brotli is not None,
+                'precompressed_entries': len(self._precompressed),
+                'precompressed_hits': self._hits,
+                'precompressed_misses': self._misses,
+                'compressed_responses': self._compressed,
+                'compressed_bytes_in': self._bytes_in,
+                'compressed_bytes_out': self._bytes_out
+            }
+
+    def _after_request(self, response):
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers):
+            return response
+        # Caches must keep compressed and uncompressed copies apart
+        response.vary.add('Accept-Encoding')
+
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        compressed = self.compress(data, encoding)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        # A strong ETag names one exact byte sequence, so each encoding gets its own
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak)
+
+        with self._lock:
+            self._compressed += 1
+            self._bytes_in += len(data)
+            self._bytes_out += len(compressed)
+        return response
+
+
+compression = Compression()
@@ -1,72 +1,287 @@
 import os
+import time
+import random
 import smtplib
+import logging
+import threading
+from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import logging
+
+from app import db
+from app.models.outbox_email import OutboxEmail
+
 
 def send_email(to, subject, body):
     """
-    Send an email using SMTP
-    
+    Queue an email for the background sender and commit it.
+
+    The request doesn't wait for SMTP; the email is delivered (and retried)
+    by the email sender thread.
+
     Args:
         to (str): Recipient email address
         subject (str): Email subject
         body (str): Email body content
     """
-    # Get email configuration from environment variables
-    smtp_server = os.environ.get('SMTP_SERVER', 'smtp.mailtrap.io')
-    smtp_port = int(os.environ.get('SMTP_PORT', '2525'))
-    smtp_username = os.environ.get('SMTP_USERNAME')
-    smtp_password = os.environ.get('SMTP_PASSWORD')
-    
-    # Check if we're in development mode
-    is_development = os.environ.get('FLASK_ENV') == 'development'
-    
-    # If credentials are not set and we're in development, log the email instead of sending
-    if not all([smtp_username, smtp_password]):
-        if is_development:
-            logging.info(f"Development mode: Email would be sent to {to}")
-            logging.info(f"Subject: {subject}")
-            logging.info(f"Body: {body}")
-            print(f"\n----- EMAIL WOULD BE SENT -----")
-            print(f"To: {to}")
-            print(f"Subject: {subject}")
-            print(f"Body: {body}")
-            print(f"----- END OF EMAIL -----\n")
+    # For production, we still want to raise an error if SMTP is not configured
+    if not email_sender.configured and not email_sender.is_development:
+        raise ValueError("SMTP credentials not configured")
+
+    db.session.add(OutboxEmail(to_address=to, subject=subject, body=body))
+    db.session.commit()
+    email_sender.wake()
+
+
+def _is_permanent(error):
+    """Whether the server rejected an email for good (5xx), so retrying won't help"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class SMTPConnection:
+    """One (optionally STARTTLS + authenticated) SMTP connection, opened on first use and reused"""
+
+    def __init__(self, server, port, username=None, password=None, use_tls=True, timeout=30):
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.last_used = None
+        self.opened = 0
+        self._smtp = None
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self.opened += 1
+
+    def send(self, msg):
+        if self._smtp is None:
+            self._connect()
+        try:
+            self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # The server closed the idle connection - reconnect once
+            self._smtp = None
+            self._connect()
+            self._smtp.send_message(msg)
+        self.last_used = time.monotonic()
+
+    def is_open(self):
+        return self._smtp is not None
+
+    def close(self):
+        if self._smtp is None:
             return
-        else:
-            # For production, we still want to raise an error if credentials are missing
-            raise ValueError("SMTP credentials not configured")
-    
-    # Create message
-    msg = MIMEMultipart()
-    msg['From'] = smtp_username
-    msg['To'] = to
-    msg['Subject'] = subject
-    
-    # Add body
-    msg.attach(MIMEText(body, 'plain'))
-    
-    try:
-        # Create SMTP session
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        
-        # Send email
-        server.send_message(msg)
-        server.quit()
-        
-        if is_development:
-            print(f"Email sent to {to} successfully")
-    except Exception as e:
-        if is_development:
-            # In development, log the error but don't crash
-            logging.error(f"Failed to send email: {str(e)}")
-            print(f"Failed to send email: {str(e)}")
-            print(f"Email would have been sent to: {to}")
-            print(f"Subject: {subject}")
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+
+
+class EmailSender:
+    """
+    Background thread that delivers the email outbox.
+
+    Due emails are claimed in batches with conditional UPDATEs (so several
+    worker processes can run a sender) and sent over one long-lived SMTP
+    connection, which is closed after it has been idle for a while. Failed
+    emails are retried with exponential backoff up to `max_attempts`; a
+    claim is a lease, so emails of a process that died are picked up again.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        smtp_username = os.environ.get('SMTP_USERNAME')
+        smtp_password = os.environ.get('SMTP_PASSWORD')
+        # A server without credentials (e.g. a local relay) counts as configured when set explicitly
+        self.configured = bool((smtp_username and smtp_password) or os.environ.get('SMTP_SERVER'))
+        self.is_development = os.environ.get('FLASK_ENV') == 'development'
+        self.from_address = os.environ.get('SMTP_FROM') or smtp_username or 'noreply@localhost'
+        self.connection = SMTPConnection(
+            os.environ.get('SMTP_SERVER', 'smtp.mailtrap.io'),
+            int(os.environ.get('SMTP_PORT', '2525')),
+            smtp_username,
+            smtp_password,
+            use_tls=os.environ.get('SMTP_USE_TLS', 'true').lower() == 'true',
+            timeout=float(os.environ.get('SMTP_TIMEOUT', '30'))
+        )
+        self.poll_interval = float(os.environ.get('EMAIL_POLL_INTERVAL', '10'))
+        self.batch_size = int(os.environ.get('EMAIL_BATCH_SIZE', '20'))
+        self.max_attempts = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '5'))
+        self.retry_backoff = float(os.environ.get('EMAIL_RETRY_BACKOFF', '30'))
+        self.max_backoff = float(os.environ.get('EMAIL_MAX_BACKOFF', '3600'))
+        self.lease = float(os.environ.get('EMAIL_SEND_LEASE', '300'))
+        self.idle_timeout = float(os.environ.get('SMTP_IDLE_TIMEOUT', '60'))
+        app.extensions['email_sender'] = self
+
+    def start(self):
+        """Start the sender thread (EMAIL_POLL_INTERVAL = 0 disables it)"""
+        if self.poll_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='email-sender', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Deliver newly queued emails now instead of at the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            with self.app.app_context():
+                try:
+                    # Keep going while full batches come back
+                    while self.run_once() == self.batch_size:
+                        pass
+                except Exception as e:
+                    db.session.rollback()
+                    logging.error(f"Email sender failed: {str(e)}")
+                finally:
+                    db.session.remove()
+
+            if self.connection.is_open() and time.monotonic() - self.connection.last_used > self.idle_timeout:
+                self.connection.close()
+        self.connection.close()
+
+    def _claim_batch(self):
+        """Lease up to batch_size due emails to this sender; returns them"""
+        now = datetime.utcnow()
+        due = (
+            OutboxEmail.status.in_([OutboxEmail.PENDING, OutboxEmail.SENDING]),
+            OutboxEmail.next_attempt_at <= now
+        )
+        ids = db.session.execute(
+            db.select(OutboxEmail.id).where(*due)
+            .order_by(OutboxEmail.next_attempt_at, OutboxEmail.id)
+            .limit(self.batch_size)
+        ).scalars().all()
+
+        claimed = []
+        for email_id in ids:
+            result = db.session.execute(
+                db.update(OutboxEmail)
+                .where(OutboxEmail.id == email_id, *due)
+                .values(
+                    status=OutboxEmail.SENDING,
+                    attempts=OutboxEmail.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=self.lease)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed.append(email_id)
+        db.session.commit()
+
+        if not claimed:
+            return []
+        return OutboxEmail.query.filter(OutboxEmail.id.in_(claimed)).order_by(OutboxEmail.id).all()
+
+    def _message(self, email):
+        msg = MIMEMultipart()
+        msg['From'] = self.from_address
+        msg['To'] = email.to_address
+        msg['Subject'] = email.subject
+        msg.attach(MIMEText(email.body, 'plain'))
+        return msg
+
+    def _deliver(self, email):
+        if self.configured:
+            self.connection.send(self._message(email))
             return
-        else:
-            # In production, raise the exception
-            raise Exception(f"Failed to send email: {str(e)}") 
\ No newline at end of file
+
+        if not self.is_development:
+            raise smtplib.SMTPException("SMTP credentials not configured")
+
+        # Development mode without SMTP: log the email instead of sending it
+        logging.info(f"Development mode: Email would be sent to {email.to_address}")
+        print(f"\n----- EMAIL WOULD BE SENT -----")
+        print(f"To: {email.to_address}")
+        print(f"Subject: {email.subject}")
+        print(f"Body: {email.body}")
+        print(f"----- END OF EMAIL -----\n")
+
+    def _retry(self, email, error, permanent=False):
+        email.last_error = str(error)
+        if permanent or email.attempts >= self.max_attempts:
+            email.status = OutboxEmail.FAILED
+            self.failed += 1
+            logging.error(f"Giving up on email {email.id} to {email.to_address}: {error}")
+            return
+
+        # Exponential backoff with some jitter, so a recovering server isn't hit all at once
+        delay = min(self.max_backoff, self.retry_backoff * 2 ** (email.attempts - 1))
+        email.status = OutboxEmail.PENDING
+        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(1, 1.25))
+        self.retried += 1
+
+    def run_once(self):
+        """Send one batch of due emails; returns how many were claimed. Needs an app context."""
+        batch = self._claim_batch()
+
+        for i, email in enumerate(batch):
+            try:
+                self._deliver(email)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                # Problem with this email only
+                self._retry(email, e, permanent=_is_permanent(e))
+            except Exception as e:
+                # Connection, TLS or login problem - the rest of the batch would fail the same way
+                logging.warning(f"SMTP delivery failed: {str(e)}")
+                self.connection.close()
+                for pending in batch[i:]:
+                    self._retry(pending, e)
+                db.session.commit()
+                break
+            else:
+                email.status = OutboxEmail.SENT
+                email.sent_at = datetime.utcnow()
+                email.last_error = None
+                self.sent += 1
+            # Record each outcome right away, so a crash can't resend delivered emails
+            db.session.commit()
+
+        return len(batch)
+
+    def stats(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'smtp_connections_opened': self.connection.opened if self.app is not None else 0
+        }
+
+
+email_sender = EmailSender()
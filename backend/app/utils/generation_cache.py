@@ -0,0 +1,114 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalize_prompt_text(value):
+    """Lower-case, trim and collapse whitespace so trivially different prompts match"""
+    return re.sub(r'\s+', ' ', (value or '').strip().lower())
+
+
+def generation_fingerprint(subject, topic, difficulty):
+    """
+    Return the content fingerprint of a generation request.
+
+    The number of questions is deliberately left out: a pool generated for
+    a larger request can be sliced to serve a smaller one.
+    """
+    key = '\x1f'.join(normalize_prompt_text(v) for v in (subject, topic, difficulty))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def pool_matches(questions, difficulty, num_questions):
+    """True if a saved quiz can serve a request for `num_questions` at `difficulty`"""
+    if not isinstance(questions, list) or len(questions) < num_questions:
+        return False
+    difficulty = normalize_prompt_text(difficulty)
+    # Only generated quizzes record their difficulty; hand-written ones never match
+    return all(
+        isinstance(q, dict) and normalize_prompt_text(q.get('difficulty')) == difficulty
+        for q in questions
+    )
+
+
+class _Entry:
+    __slots__ = ('questions', 'job_id', 'created_at')
+
+    def __init__(self, questions, job_id):
+        self.questions = questions
+        self.job_id = job_id
+        self.created_at = time.monotonic()
+
+
+class GenerationCache:
+    """
+    In-memory cache of generated question pools keyed by prompt fingerprint.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once there are more than `max_entries`. A lookup only hits if
+    the pool has at least as many questions as requested; callers slice it.
+    """
+
+    def __init__(self, ttl=86400, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fingerprint, num_questions):
+        """Return (questions, job_id) for a big enough pool, or None"""
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl:
+                del self._entries[fingerprint]
+                entry = None
+
+            if entry is None or len(entry.questions) < num_questions:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(fingerprint)
+            self.hits += 1
+            return entry.questions, entry.job_id
+
+    def put(self, fingerprint, questions, job_id=None):
+        """Remember a pool, keeping the bigger one if the fingerprint is already cached"""
+        with self._lock:
+            current = self._entries.get(fingerprint)
+            if current is not None and len(current.questions) > len(questions):
+                self._entries.move_to_end(fingerprint)
+                return
+
+            self._entries[fingerprint] = _Entry(list(questions), job_id)
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, fingerprint=None):
+        """Drop one pool, or every pool if no fingerprint is given"""
+        with self._lock:
+            if fingerprint is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(fingerprint, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+generation_cache = GenerationCache(
+    ttl=float(os.environ.get('AI_CACHE_TTL', '86400')),
+    max_entries=int(os.environ.get('AI_CACHE_MAX_ENTRIES', '256'))
+)
@@ -0,0 +1,356 @@
+import os
+import time
+import queue
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.generation_job import GenerationJob
+from app.utils.generation_cache import generation_cache, pool_matches
+from app.utils.llm_client import LLMError, get_llm_client
+from app.utils.quiz_generator import (
+    QuizExistsError, QuestionStreamParser, build_messages, parse_quiz, save_quiz, sanitize_name, validate_question
+)
+from app.utils.quiz_storage import quiz_storage
+from app.utils.token_ledger import credit_tokens
+
+# Minimum seconds between progress updates written while a quiz streams in
+PROGRESS_INTERVAL = 1.0
+
+
+class QueueFullError(Exception):
+    """Raised when the generation queue can't take more jobs"""
+
+
+class GenerationQueue:
+    """
+    Bounded in-process queue of AI quiz generation jobs.
+
+    Jobs are persisted in the generation_jobs table, so any worker process
+    can report their status; the queue itself only carries job ids. A job is
+    claimed with a conditional UPDATE before it runs, so a job re-queued by
+    recovery in another process never runs twice. Worker threads are
+    started on the first submit.
+
+    Requests with the same prompt fingerprint share work: a finished pool
+    is sliced for smaller requests, and a request arriving while an
+    equivalent job is in flight follows that job instead of calling the LLM.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._threads = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.num_workers = int(os.environ.get('AI_WORKERS', '2'))
+        self.max_attempts = int(os.environ.get('AI_MAX_ATTEMPTS', '3'))
+        self.retry_backoff = float(os.environ.get('AI_RETRY_BACKOFF', '2'))
+        self.job_timeout = float(os.environ.get('AI_JOB_TIMEOUT', '900'))
+        self.max_active_per_user = int(os.environ.get('AI_MAX_ACTIVE_JOBS_PER_USER', '2'))
+        self.max_per_user_per_hour = int(os.environ.get('AI_MAX_JOBS_PER_HOUR', '10'))
+        self._queue = queue.Queue(maxsize=int(os.environ.get('AI_QUEUE_SIZE', '50')))
+        app.extensions['generation_queue'] = self
+
+    def is_full(self):
+        return self._queue.full()
+
+    def check_rate_limit(self, user_id):
+        """Return an error message if the user may not start another job right now, else None"""
+        # Reused quizzes cost no LLM call, so they don't count
+        active = GenerationJob.query.filter(
+            GenerationJob.user_id == user_id,
+            GenerationJob.reused.is_(False),
+            GenerationJob.status.in_([GenerationJob.QUEUED, GenerationJob.RUNNING])
+        ).count()
+        if active >= self.max_active_per_user:
+            return f'You already have {active} quiz generation(s) in progress'
+
+        recent = GenerationJob.query.filter(
+            GenerationJob.user_id == user_id,
+            GenerationJob.reused.is_(False),
+            GenerationJob.created_at >= datetime.utcnow() - timedelta(hours=1)
+        ).count()
+        if recent >= self.max_per_user_per_hour:
+            return f'You can generate at most {self.max_per_user_per_hour} quizzes per hour'
+
+        return None
+
+    def find_pool(self, job):
+        """
+        Return (questions, source_job_id) of an existing pool that can serve
+        the job without an LLM call, or None.
+
+        If the job's quiz already exists it is the only candidate; otherwise
+        the in-memory generation cache is consulted.
+        """
+        subject_dir_name = sanitize_name(job.subject)
+        quiz_file_name = sanitize_name(job.topic)
+        if quiz_storage.exists(subject_dir_name, quiz_file_name):
+            questions = quiz_storage.load_questions(subject_dir_name, quiz_file_name)
+            if pool_matches(questions, job.difficulty, job.num_questions):
+                return questions, None
+            return None
+
+        return generation_cache.get(job.fingerprint, job.num_questions)
+
+    def find_in_flight(self, job):
+        """Return a queued or running job generating an equivalent, big enough quiz"""
+        return GenerationJob.query.filter(
+            GenerationJob.fingerprint == job.fingerprint,
+            GenerationJob.status.in_([GenerationJob.QUEUED, GenerationJob.RUNNING]),
+            GenerationJob.source_job_id.is_(None),
+            GenerationJob.num_questions >= job.num_questions
+        ).order_by(GenerationJob.created_at).first()
+
+    def complete_from_pool(self, job, questions, source_job_id=None):
+        """
+        Finish a job with questions generated earlier. The pool is sliced to
+        the requested size and saved under the job's own subject / topic if
+        that quiz doesn't exist yet. Raises QuizExistsError on a lost race.
+        Does not commit.
+        """
+        subject_dir_name = sanitize_name(job.subject)
+        quiz_file_name = sanitize_name(job.topic)
+        num_generated = len(questions)
+        if not quiz_storage.exists(subject_dir_name, quiz_file_name):
+            save_quiz(subject_dir_name, quiz_file_name, questions[:job.num_questions], job.difficulty)
+            num_generated = min(len(questions), job.num_questions)
+
+        job.status = GenerationJob.COMPLETED
+        job.reused = True
+        job.source_job_id = source_job_id
+        job.file_path = f'{subject_dir_name}/{quiz_file_name}'
+        job.num_generated = num_generated
+        job.error = None
+
+    def resolve_followers(self, leader):
+        """Complete (or fail) the jobs that were waiting on a finished leader job"""
+        follower_ids = [job_id for (job_id,) in db.session.query(GenerationJob.id).filter(
+            GenerationJob.source_job_id == leader.id,
+            GenerationJob.status == GenerationJob.QUEUED
+        )]
+        if not follower_ids:
+            return
+
+        questions = None
+        if leader.status == GenerationJob.COMPLETED and leader.file_path:
+            questions = quiz_storage.load_questions(*leader.file_path.split('/', 1))
+
+        for job_id in follower_ids:
+            # The leader's worker and the request that added a follower may both get here
+            if not self._claim(job_id):
+                continue
+            job = db.session.get(GenerationJob, job_id)
+            if not questions:
+                self.fail_job(job, leader.error or 'Generation failed')
+                continue
+            try:
+                self.complete_from_pool(job, questions, leader.id)
+                db.session.commit()
+            except QuizExistsError as e:
+                db.session.rollback()
+                self.fail_job(job, str(e))
+
+    def submit(self, job_id):
+        """Queue a committed job; raises QueueFullError if the queue is at capacity"""
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            raise QueueFullError('Quiz generation is busy, please try again shortly')
+
+    def recover(self):
+        """
+        Fail jobs that have been running for longer than AI_JOB_TIMEOUT (their
+        worker died), re-queue jobs that are still waiting and resolve
+        followers whose leader has already finished.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.job_timeout)
+        stale = GenerationJob.query.filter(
+            GenerationJob.status == GenerationJob.RUNNING,
+            GenerationJob.updated_at < cutoff
+        ).all()
+        for job in stale:
+            self.fail_job(job, 'Generation was interrupted')
+
+        queued = [job_id for (job_id,) in db.session.query(GenerationJob.id).filter(
+            GenerationJob.status == GenerationJob.QUEUED,
+            GenerationJob.source_job_id.is_(None)
+        ).order_by(GenerationJob.created_at)]
+        for job_id in queued:
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                break
+
+        leader_ids = {source_id for (source_id,) in db.session.query(GenerationJob.source_job_id).filter(
+            GenerationJob.status == GenerationJob.QUEUED,
+            GenerationJob.source_job_id.isnot(None)
+        )}
+        for leader_id in leader_ids:
+            leader = db.session.get(GenerationJob, leader_id)
+            if leader is not None and leader.is_finished():
+                self.resolve_followers(leader)
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.num_workers):
+                thread = threading.Thread(target=self._work, name=f'ai-generation-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+            # Pick up jobs left behind by a previous process
+            threading.Thread(target=self._recover_in_background, name='ai-generation-recovery', daemon=True).start()
+
+    def _recover_in_background(self):
+        with self.app.app_context():
+            try:
+                self.recover()
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Generation job recovery failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            with self.app.app_context():
+                try:
+                    self._run(job_id)
+                except Exception as e:
+                    db.session.rollback()
+                    logging.exception(f"Generation job {job_id} crashed: {str(e)}")
+                    job = db.session.get(GenerationJob, job_id)
+                    if job is not None and not job.is_finished():
+                        self.fail_job(job, str(e))
+                finally:
+                    db.session.remove()
+                    self._queue.task_done()
+
+    def _claim(self, job_id):
+        result = db.session.execute(
+            db.update(GenerationJob)
+            .where(GenerationJob.id == job_id, GenerationJob.status == GenerationJob.QUEUED)
+            .values(status=GenerationJob.RUNNING, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _run(self, job_id):
+        if not self._claim(job_id):
+            return
+
+        job = db.session.get(GenerationJob, job_id)
+        messages = build_messages(job.subject, job.topic, job.num_questions, job.difficulty)
+        client = get_llm_client()
+
+        quiz_data = None
+        partial = []
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            if attempt > 1:
+                # Exponential backoff with jitter
+                time.sleep(self.retry_backoff * (2 ** (attempt - 2)) * (0.5 + random.random()))
+            job.attempts = attempt
+            job.num_generated = 0
+            db.session.commit()
+
+            questions = []
+            try:
+                self._stream_questions(job, client, messages, questions)
+                if not questions:
+                    raise ValueError('no valid questions in the response')
+                quiz_data = questions
+                break
+            except LLMError as e:
+                error = str(e)
+                if len(questions) > len(partial):
+                    partial = questions
+                if not e.retryable:
+                    break
+            except ValueError as e:
+                # Malformed output - asking again usually helps
+                error = f'Could not parse generated quiz: {str(e)}'
+
+        # Out of attempts - a stream that broke off halfway still produced usable questions
+        if quiz_data is None and partial:
+            quiz_data = partial
+
+        if quiz_data is None:
+            self.fail_job(job, error)
+            return
+
+        subject_dir_name = sanitize_name(job.subject)
+        quiz_file_name = sanitize_name(job.topic)
+        try:
+            save_quiz(subject_dir_name, quiz_file_name, quiz_data, job.difficulty)
+        except QuizExistsError as e:
+            # An equivalent job got there first - serve its quiz if it's big enough
+            existing = quiz_storage.load_questions(subject_dir_name, quiz_file_name)
+            if not pool_matches(existing, job.difficulty, job.num_questions):
+                self.fail_job(job, str(e))
+                return
+            self.complete_from_pool(job, existing)
+            db.session.commit()
+            self.resolve_followers(job)
+            return
+
+        job.status = GenerationJob.COMPLETED
+        job.file_path = f'{subject_dir_name}/{quiz_file_name}'
+        job.num_generated = len(quiz_data)
+        job.error = None
+        db.session.commit()
+
+        if job.fingerprint:
+            generation_cache.put(job.fingerprint, quiz_data, job.id)
+        self.resolve_followers(job)
+
+    def _stream_questions(self, job, client, messages, questions):
+        """
+        Collect validated questions into `questions` as the LLM streams them,
+        recording progress on the job so pollers see questions arrive.
+        """
+        parser = QuestionStreamParser()
+        chunks = client.stream(messages) if hasattr(client, 'stream') else [client.complete(messages)]
+        last_progress = 0.0
+
+        for chunk in chunks:
+            for question in parser.feed(chunk):
+                if validate_question(question):
+                    questions.append(question)
+                else:
+                    logging.warning(f"Dropping malformed generated question for job {job.id}")
+
+            if questions and job.num_generated != len(questions) and time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                job.num_generated = len(questions)
+                db.session.commit()
+                last_progress = time.monotonic()
+
+        # The model didn't answer with a bare array (e.g. wrapped it in an object)
+        if not questions and not parser.done:
+            questions.extend(q for q in parse_quiz(parser.text) if validate_question(q))
+
+    def fail_job(self, job, message):
+        """Mark a job failed and refund its tokens in the same transaction; its followers fail too"""
+        job.status = GenerationJob.FAILED
+        job.error = message
+        if job.tokens_charged:
+            credit_tokens(job.user_id, job.tokens_charged)
+        db.session.commit()
+        self.resolve_followers(job)
+
+
+generation_queue = GenerationQueue()
@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app import db
+from app.models.user import User
+
+# Session.info key of the user ids to drop from the cache once the transaction commits
+_PENDING_KEY = 'identity_cache_pending'
+
+
+class IdentityCache:
+    """
+    Per-process cache of the users behind Flask-Login's user loader.
+
+    Holds a snapshot of each user's columns for `ttl` seconds (least recently
+    used entries are evicted past `max_entries`), so an authenticated request
+    doesn't need a users query. A hit is attached to the request's session
+    without loading it, so it can still be modified and committed normally.
+
+    Users written through the ORM, and balances changed through the token
+    ledger, are dropped from the cache when their transaction commits. Other
+    worker processes only notice a change when their entry expires, which
+    bounds how long a revoked session (see User.session_version) stays valid.
+    """
+
+    def __init__(self, ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a load that raced one isn't cached
+        self._generation = 0
+        self._installed = False
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.rejected = 0
+
+    def get_user(self, user_id):
+        """Return the User with this id, attached to the current session, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[0] > self.ttl:
+                del self._entries[user_id]
+                self.expired += 1
+                entry = None
+
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+            else:
+                self.misses += 1
+                generation = self._generation
+
+        if entry is not None:
+            return self._restore(entry[1])
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+
+        values = {attr.key: getattr(user, attr.key) for attr in db.inspect(User).column_attrs}
+        with self._lock:
+            if self._generation == generation:
+                self._entries[user_id] = (now, values)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return user
+
+    def _restore(self, values):
+        user = User(**values)
+        # Mark it as loaded from the database, then attach it without a SELECT
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def record_rejection(self):
+        """Count a session whose version no longer matches the user's"""
+        with self._lock:
+            self.rejected += 1
+
+    def invalidate(self, user_id=None):
+        """Drop one user, or every user if no id is given"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def invalidate_on_commit(self, session, user_id):
+        """Drop a user once `session` commits (for changes made with bulk UPDATE statements)"""
+        session.info.setdefault(_PENDING_KEY, set()).add(user_id)
+
+    def install(self):
+        """Listen for committed user changes on every session"""
+        if self._installed:
+            return
+        self._installed = True
+        event.listen(Session, 'after_flush', self._after_flush)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_soft_rollback', self._after_commit)
+
+    def _after_flush(self, session, flush_context):
+        for obj in list(session.dirty) + list(session.deleted):
+            if isinstance(obj, User) and obj.id is not None:
+                self.invalidate_on_commit(session, obj.id)
+
+    def _after_commit(self, session, previous_transaction=None):
+        # Also run on rollback: dropping an entry that didn't change only costs a reload
+        for user_id in session.info.pop(_PENDING_KEY, ()):
+            self.invalidate(user_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'rejected_sessions': self.rejected
+            }
+
+
+identity_cache = IdentityCache(
+    ttl=float(os.environ.get('IDENTITY_CACHE_TTL', '30')),
+    max_entries=int(os.environ.get('IDENTITY_CACHE_MAX_ENTRIES', '10000'))
+)
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import threading
+
+from app.utils.metrics import LLM_REQUEST_SECONDS
+
+
+class LLMError(Exception):
+    """Raised when the LLM call fails; `retryable` tells the job queue whether to try again"""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class OpenRouterClient:
+    """
+    Chat completion client for OpenRouter (or any OpenAI-compatible API).
+
+    Requests go through one keep-alive session per client, so consecutive
+    generations reuse pooled TLS connections instead of handshaking again.
+    `stream()` uses server-sent events and yields text as it arrives.
+    Point LLM_BASE_URL at a local fake server to run without network access.
+    """
+
+    def __init__(self, api_key, base_url='https://openrouter.ai/api/v1',
+                 model='deepseek/deepseek-r1:free', connect_timeout=5, read_timeout=60, pool_size=8):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        # For streams the read timeout applies between chunks, not to the whole completion
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled HTTP session, created on first use"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    # Imported here so that app startup doesn't pay for requests
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers.update({
+                        "Content-Type": "application/json",
+                        "Authorization": f"Bearer {self.api_key}"
+                    })
+                    self._session = session
+        return self._session
+
+    def complete(self, messages, temperature=0.7, max_tokens=2048):
+        """Return the text of the first completion choice"""
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = self._post(messages, temperature, max_tokens, stream=False)
+            try:
+                content = response.json()['choices'][0]['message']['content']
+            except (ValueError, KeyError, IndexError, TypeError):
+                raise LLMError("Unexpected response from LLM", retryable=True)
+            outcome = 'ok'
+            return content
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, call='complete', outcome=outcome)
+
+    def stream(self, messages, temperature=0.7, max_tokens=2048):
+        """
+        Yield the completion text in chunks as the server produces it.
+
+        Servers that ignore `stream` and answer with a plain JSON body are
+        handled too; the whole content is then yielded at once.
+        """
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            for chunk in self._stream(messages, temperature, max_tokens):
+                yield chunk
+            outcome = 'ok'
+        except GeneratorExit:
+            # The consumer stopped reading early
+            outcome = 'aborted'
+            raise
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, call='stream', outcome=outcome)
+
+    def _stream(self, messages, temperature, max_tokens):
+        import requests
+        response = self._post(messages, temperature, max_tokens, stream=True)
+
+        with response:
+            if 'text/event-stream' not in response.headers.get('Content-Type', ''):
+                try:
+                    yield response.json()['choices'][0]['message']['content']
+                except (ValueError, KeyError, IndexError, TypeError):
+                    raise LLMError("Unexpected response from LLM", retryable=True)
+                return
+
+            finished = False
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    # Blank lines separate events, lines starting with ':' are keep-alive comments
+                    if finished or not line or not line.startswith('data:'):
+                        continue
+                    data = line[len('data:'):].strip()
+                    if data == '[DONE]':
+                        # Keep reading to the end of the body so the connection can be reused
+                        finished = True
+                        continue
+
+                    try:
+                        event = json.loads(data)
+                    except ValueError:
+                        continue
+                    if 'error' in event:
+                        raise LLMError(f"LLM stream error: {event['error']}", retryable=True)
+
+                    choices = event.get('choices') or [{}]
+                    content = (choices[0].get('delta') or {}).get('content')
+                    if content:
+                        yield content
+            except (requests.ConnectionError, requests.Timeout) as e:
+                raise LLMError(f"LLM stream interrupted: {str(e)}", retryable=True)
+
+    def _post(self, messages, temperature, max_tokens, stream):
+        import requests
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if stream:
+            payload["stream"] = True
+
+        try:
+            response = self.session.post(
+                f"{self.base_url}/chat/completions",
+                json=payload,
+                timeout=self.timeout,
+                stream=stream
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise LLMError(f"LLM request failed: {str(e)}", retryable=True)
+
+        # Rate limited or upstream trouble - worth another try
+        if response.status_code == 429 or response.status_code >= 500:
+            response.close()
+            raise LLMError(f"LLM returned status {response.status_code}", retryable=True)
+        if response.status_code >= 400:
+            message = f"LLM returned status {response.status_code}: {response.text[:200]}"
+            response.close()
+            raise LLMError(message)
+
+        return response
+
+
+_client = None
+
+
+def get_llm_client():
+    """Return the process-wide LLM client, creating it from the environment on first use"""
+    global _client
+    if _client is None:
+        _client = OpenRouterClient(
+            api_key=os.environ.get('OPENROUTER_API_KEY', 'DEMO'),
+            base_url=os.environ.get('LLM_BASE_URL', 'https://openrouter.ai/api/v1'),
+            model=os.environ.get('LLM_MODEL', 'deepseek/deepseek-r1:free'),
+            connect_timeout=float(os.environ.get('LLM_CONNECT_TIMEOUT', '5')),
+            read_timeout=float(os.environ.get('LLM_READ_TIMEOUT', '60')),
+            pool_size=int(os.environ.get('LLM_POOL_SIZE', '8'))
+        )
+    return _client
+
+
+def set_llm_client(client):
+    """
+    Replace the LLM client (e.g. with a fake in tests).
+
+    Any object with `complete(messages)` works; implementing `stream(messages)`
+    as well enables incremental parsing.
+    """
+    global _client
+    _client = client
@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime
+
+# Fraction of DEBUG events that are logged (per-call sample rates override it)
+DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '1'))
+
+_listener = None
+_listener_pid = None
+
+
+def log_event(logger, level, event, sample_rate=None, **fields):
+    """
+    Log a structured event: `event` is a short snake_case name and `fields`
+    become keys of the JSON log line.
+
+    Only a `sample_rate` fraction of the events is kept (DEBUG events
+    default to LOG_DEBUG_SAMPLE_RATE), so hot paths can log cheaply.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if sample_rate is None:
+        sample_rate = DEBUG_SAMPLE_RATE if level <= logging.DEBUG else 1
+    if sample_rate < 1 and random.random() >= sample_rate:
+        return
+    logger.log(level, event, extra={'fields': fields})
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the event's fields"""
+
+    def format(self, record):
+        line = {
+            'time': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        line.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            line['exception'] = self.formatException(record.exc_info)
+        return json.dumps(line, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text with the event's fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            text += ' ' + ' '.join(f'{key}={json.dumps(value, default=str)}' for key, value in fields.items())
+        return text
+
+
+def configure_logging():
+    """
+    Send the root logger's records through a queue to a background thread
+    that writes them to stderr, so request threads never block on the write.
+
+    LOG_LEVEL (default INFO) and LOG_FORMAT (json or text) configure it.
+    Safe to call more than once; in a forked child (whose copy of the
+    writer thread isn't running) it starts a new one.
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JSONFormatter() if os.environ.get('LOG_FORMAT', 'json') == 'json' else TextFormatter())
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener_pid = os.getpid()
+    _listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(_listener.stop)
@@ -0,0 +1,281 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils.log import log_event
+
+logger = logging.getLogger(__name__)
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Queries per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# LLM calls take seconds to minutes
+LLM_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block took"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._values.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labels + ('le',), key + (_format_value(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels + ('le',), key + ('+Inf',))
+            lines.append(f'{self.name}_bucket{labels} {series[-1]}')
+            labels = _format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(series[-2])}')
+            lines.append(f'{self.name}_count{labels} {series[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics, rendered in the Prometheus text format by /api/metrics.
+
+    Besides counters and histograms, `register_stats` exposes the numeric
+    values of a component's stats() dict (cache hits, queue sizes, ...) as
+    gauges, read when the metrics are scraped.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._stats = {}
+        self._installed = False
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix, stats):
+        """Expose `stats()`' numeric values as gauges named <prefix>_<key>"""
+        self._stats[prefix] = stats
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats in self._stats.items():
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Could not collect {prefix} stats: {str(e)}")
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f'{prefix}_{key}'
+                lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def init_app(self, app):
+        """
+        Time every request and count the SQL queries it runs.
+
+        With METRICS_SLOW_REQUEST_MS set, requests slower than that are
+        logged with their slowest queries.
+        """
+        self.slow_request_seconds = float(os.environ.get('METRICS_SLOW_REQUEST_MS', '0')) / 1000
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        if not self._installed:
+            self._installed = True
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def _before_request(self):
+        g._request_stats = _RequestStats(track_statements=self.slow_request_seconds > 0)
+
+    def _after_request(self, response):
+        stats = g.get('_request_stats')
+        if stats is None:
+            return response
+
+        labels = {
+            'blueprint': request.blueprint or '',
+            'endpoint': request.endpoint or 'unmatched',
+            'method': request.method,
+            'status': response.status_code
+        }
+        if response.is_streamed:
+            # Streamed bodies keep querying after this point; finish once the body is sent
+            response.call_on_close(lambda: self._finish(stats, labels))
+        else:
+            self._finish(stats, labels)
+        return response
+
+    def _finish(self, stats, labels):
+        if stats.finished:
+            return
+        stats.finished = True
+        elapsed = time.perf_counter() - stats.started
+        route = {'blueprint': labels['blueprint'], 'endpoint': labels['endpoint']}
+
+        REQUEST_SECONDS.observe(elapsed, **labels)
+        REQUEST_DB_QUERIES.observe(stats.queries, **route)
+        REQUEST_DB_SECONDS.observe(stats.db_seconds, **route)
+
+        if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+            SLOW_REQUESTS.inc(**route)
+            slowest = sorted(stats.statements.items(), key=lambda item: item[1][1], reverse=True)[:5]
+            log_event(
+                logger, logging.WARNING, 'slow_request',
+                endpoint=labels['endpoint'],
+                method=labels['method'],
+                status=labels['status'],
+                duration_ms=round(elapsed * 1000, 1),
+                db_queries=stats.queries,
+                db_ms=round(stats.db_seconds * 1000, 1),
+                top_queries=[
+                    {'sql': sql, 'count': count, 'ms': round(seconds * 1000, 1)}
+                    for sql, (count, seconds) in slowest
+                ]
+            )
+
+
+class _RequestStats:
+    __slots__ = ('started', 'queries', 'db_seconds', 'statements', 'finished')
+
+    def __init__(self, track_statements):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        # Statement (truncated) -> [count, seconds]; only kept for the slow request log
+        self.statements = {} if track_statements else None
+        self.finished = False
+
+    def add(self, statement, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        if self.statements is not None:
+            entry = self.statements.setdefault(' '.join(statement.split())[:200], [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    stats = g.get('_request_stats') if has_request_context() else None
+    if stats is not None:
+        stats.add(statement, elapsed)
+    DB_QUERIES.inc(context='request' if stats is not None else 'background')
+    DB_SECONDS.inc(elapsed, context='request' if stats is not None else 'background')
+
+
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds', 'Request latency', ('blueprint', 'endpoint', 'method', 'status')
+)
+REQUEST_DB_QUERIES = metrics.histogram(
+    'http_request_db_queries', 'SQL queries run per request', ('blueprint', 'endpoint'), QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_SECONDS = metrics.histogram(
+    'http_request_db_seconds', 'Time spent in SQL queries per request', ('blueprint', 'endpoint')
+)
+SLOW_REQUESTS = metrics.counter(
+    'http_slow_requests_total', 'Requests slower than METRICS_SLOW_REQUEST_MS', ('blueprint', 'endpoint')
+)
+DB_QUERIES = metrics.counter('db_queries_total', 'SQL queries run', ('context',))
+DB_SECONDS = metrics.counter('db_query_seconds_total', 'Time spent in SQL queries', ('context',))
+RATE_LIMITED = metrics.counter(
+    'http_requests_refused_total', 'Requests refused by rate limits (429) or load shedding (503)', ('route_class', 'reason')
+)
+QUIZ_LOAD_SECONDS = metrics.histogram(
+    'quiz_load_seconds', 'Time to get a compiled quiz from the quiz storage (cache hit or load)', ('storage',)
+)
+LLM_REQUEST_SECONDS = metrics.histogram(
+    'llm_request_seconds', 'Duration of LLM calls, to the end of the response', ('call', 'outcome'), LLM_BUCKETS
+)
@@ -0,0 +1,62 @@
+import json
+import base64
+
+from flask import Response, request, stream_with_context
+
+# Compact separators match what jsonify emits outside of debug mode
+_SEPARATORS = (',', ':')
+
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row of a page as an opaque cursor"""
+    raw = json.dumps(values, separators=_SEPARATORS, default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor made by encode_cursor into its list of values; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def parse_page_args(default_limit, max_limit):
+    """
+    Read the `cursor` and `limit` query parameters of a keyset-paginated listing.
+
+    Returns (cursor_values or None, limit). Raises ValueError for malformed values.
+    """
+    limit = int(request.args.get('limit', default_limit))
+    if not 1 <= limit <= max_limit:
+        raise ValueError(f'limit must be between 1 and {max_limit}')
+
+    cursor = request.args.get('cursor')
+    return (decode_cursor(cursor) if cursor else None), limit
+
+
+def stream_page(key, rows, limit, render, cursor_of):
+    """
+    Stream a page as {"<key>": [...], "next_cursor": ...} without building it in memory.
+
+    `rows` should be fetched with limit + 1 so the extra row tells whether
+    there is a next page. `render` turns a row into a JSON-serializable
+    object and `cursor_of` returns the sort key values of a row.
+    """
+    def generate():
+        yield '{' + json.dumps(key) + ':['
+        next_cursor = None
+        last = None
+        for i, row in enumerate(rows):
+            if i == limit:
+                next_cursor = encode_cursor(*cursor_of(last))
+                break
+            yield (',' if i else '') + json.dumps(render(row), separators=_SEPARATORS)
+            last = row
+        yield '],"next_cursor":' + json.dumps(next_cursor) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,187 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ('pbkdf2', 'bcrypt')
+
+# Default cost per algorithm: PBKDF2 iterations (Werkzeug's default) / bcrypt log2 rounds
+DEFAULT_COSTS = {'pbkdf2': 600000, 'bcrypt': 12}
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash / verify jobs are already waiting"""
+
+
+def _hash_password(password, algorithm, cost):
+    if algorithm == 'bcrypt':
+        import bcrypt
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=cost)).decode('ascii')
+    return generate_password_hash(password, method=f'pbkdf2:sha256:{cost}')
+
+
+def _is_outdated(stored, algorithm, cost):
+    """Whether a stored hash was made with other parameters than the configured ones"""
+    if stored.startswith('$2'):
+        # $2b$<rounds>$<salt and hash>
+        parts = stored.split('$')
+        return algorithm != 'bcrypt' or len(parts) < 3 or parts[2] != f'{cost:02d}'
+    # <method>$<salt>$<hash>, e.g. pbkdf2:sha256:600000
+    method = stored.split('$', 1)[0].split(':')
+    return algorithm != 'pbkdf2' or method[1:] != ['sha256', str(cost)]
+
+
+def _verify_password(password, stored, algorithm, cost):
+    """
+    Check a password against its stored hash. Returns (matches, new_hash):
+    new_hash is a fresh hash with the configured parameters when the
+    password matches but the stored hash is outdated, otherwise None.
+    """
+    if stored.startswith('$2'):
+        import bcrypt
+        matches = bcrypt.checkpw(password.encode('utf-8'), stored.encode('ascii'))
+    else:
+        matches = check_password_hash(stored, password)
+
+    if matches and _is_outdated(stored, algorithm, cost):
+        return True, _hash_password(password, algorithm, cost)
+    return matches, None
+
+
+def _ping():
+    return True
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords on a small process pool, so a burst of
+    logins doesn't hold the GIL of the web worker's request threads.
+
+    At most `max_pending` jobs may be queued or running at once; past that
+    calls fail fast with PasswordHasherBusy (the auth routes answer 503),
+    as do the calls caught by a broken pool; its replacement spawns fresh
+    worker processes. With `workers` = 0 everything runs in the calling thread.
+    """
+
+    def __init__(self, algorithm='pbkdf2', cost=None, workers=2, max_pending=16, timeout=30):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f'Unknown PASSWORD_HASH_ALGORITHM: {algorithm}')
+        self.algorithm = algorithm
+        self.cost = cost or DEFAULT_COSTS[algorithm]
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self.completed = 0
+        self.rejected = 0
+
+    def start(self):
+        """
+        Start the worker processes. Called from create_app (or gunicorn's
+        post_fork) before any background thread exists, because the pool
+        forks its workers - the only place a pool is forked.
+        """
+        if self.workers <= 0:
+            return
+        with self._lock:
+            self._pool = self._new_pool('fork')
+            pool = self._pool
+        # With fork every worker is launched on the first submit
+        try:
+            pool.submit(_ping).result(timeout=self.timeout)
+        except (BrokenProcessPool, FutureTimeoutError):
+            logger.warning('Password hashing pool did not start')
+
+    def _new_pool(self, method):
+        self._pid = os.getpid()
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+
+    def _get_pool(self):
+        with self._lock:
+            # A pool that broke, or one inherited across fork without start() (it has no workers in
+            # this process), is replaced from a request thread; forking a process that runs threads
+            # isn't safe, so the replacement spawns its workers
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = self._new_pool('spawn')
+            return self._pool
+
+    def _discard(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy('Too many password checks in progress, please try again')
+
+        pool = self._get_pool()
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard(pool)
+            logger.warning('Password hashing pool broke, restarting it')
+            raise PasswordHasherBusy('Password checks are restarting, please try again')
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the job is done, even if this call gives up waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # A worker died; the pool is replaced on the next call
+            self._discard(pool)
+            logger.warning('Password hashing pool broke, restarting it')
+            raise PasswordHasherBusy('Password checks are restarting, please try again')
+        except FutureTimeoutError:
+            raise PasswordHasherBusy('Password check timed out, please try again')
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.algorithm, self.cost)
+
+    def verify(self, password, stored):
+        """Returns (matches, new_hash); see _verify_password"""
+        if not stored:
+            return False, None
+        return self._run(_verify_password, password, stored, self.algorithm, self.cost)
+
+    def stats(self):
+        return {
+            'algorithm': self.algorithm,
+            'cost': self.cost,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'completed': self.completed,
+            'rejected': self.rejected
+        }
+
+
+_workers = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+
+password_hasher = PasswordHasher(
+    algorithm=os.environ.get('PASSWORD_HASH_ALGORITHM', 'pbkdf2'),
+    cost=int(os.environ.get('PASSWORD_HASH_COST', '0')) or None,
+    workers=_workers,
+    max_pending=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', str(max(1, _workers) * 8))),
+    timeout=float(os.environ.get('PASSWORD_HASH_TIMEOUT', '30'))
+)
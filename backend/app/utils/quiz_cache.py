@@ -0,0 +1,189 @@
+import os
+import json
+import stat
+import threading
+import time
+from collections import OrderedDict
+
+from app.utils.quiz_watcher import QuizWatcher
+from app.utils.quiz_compiler import compile_quiz
+from app.utils.review_cache import review_cache
+
+# Quiz files live in backend/quizzes/<subject>/<quiz_name>.json
+QUIZ_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'quizzes')
+
+
+class _QuizEntry:
+    __slots__ = ('data', 'size', 'mtime_ns', 'checked_at')
+
+    def __init__(self, data, size, mtime_ns, checked_at):
+        self.data = data
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.checked_at = checked_at
+
+
+class QuizCache:
+    """
+    Process-wide cache of parsed (compiled) quiz files.
+
+    Entries are kept in an LRU bounded by a byte budget (measured as the size
+    of the source files). While the filesystem watcher is running, cache hits
+    never touch the disk and entries are dropped when the watcher reports a
+    change. Without a watcher the file mtime is re-checked at most once every
+    `check_interval` seconds.
+    """
+
+    def __init__(self, quiz_dir, max_bytes, check_interval=2.0, loader=None, watcher=None):
+        self.quiz_dir = os.path.abspath(quiz_dir)
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.loader = loader or json.loads
+        self.watcher = watcher
+        self._entries = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self._watcher_ready = False
+        # Bumped by every invalidation; a load that raced one is served but not cached
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def quiz_path(self, subject, quiz_name):
+        """Return the path of a quiz file, or None if it would escape the quiz directory"""
+        path = os.path.normpath(os.path.join(self.quiz_dir, subject, f'{quiz_name}.json'))
+        if os.path.dirname(os.path.dirname(path)) != self.quiz_dir:
+            return None
+        return path
+
+    def get(self, subject, quiz_name):
+        """
+        Return the parsed quiz, loading it from disk on a miss.
+
+        Returns None if the quiz does not exist. Errors raised while reading
+        or parsing the file propagate to the caller.
+        """
+        watching = self._ensure_watcher()
+        key = (subject, quiz_name)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (watching or now - entry.checked_at < self.check_interval):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.data
+
+            generation = self._generation
+
+        path = self.quiz_path(subject, quiz_name)
+        if path is None:
+            return None
+
+        try:
+            st = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            self.invalidate(subject, quiz_name)
+            return None
+
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        # File unchanged since it was cached - just refresh the check time
+        if entry is not None and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+            with self._lock:
+                entry.checked_at = now
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+            return entry.data
+
+        with open(path, 'rb') as f:
+            raw = f.read()
+        data = self.loader(raw)
+
+        with self._lock:
+            self.misses += 1
+            # The file may have changed after the stat above; then the next get loads it again
+            if self._generation == generation:
+                self._store(key, _QuizEntry(data, len(raw), st.st_mtime_ns, now))
+
+        return data
+
+    def invalidate(self, subject=None, quiz_name=None):
+        """Drop a single quiz, every quiz of a subject, or the whole cache"""
+        # Reviews graded against the old questions go with them
+        review_cache.invalidate(subject, quiz_name)
+        with self._lock:
+            self._generation += 1
+            if subject is None:
+                self._entries.clear()
+                self._current_bytes = 0
+                return
+
+            for key in list(self._entries):
+                if key[0] == subject and (quiz_name is None or key[1] == quiz_name):
+                    self._current_bytes -= self._entries.pop(key).size
+
+    def invalidate_path(self, path):
+        """Drop whatever cache entries a changed filesystem path maps to"""
+        relative = os.path.relpath(os.path.abspath(path), self.quiz_dir)
+        if relative == '.':
+            self.invalidate()
+            return
+        if relative.startswith('..'):
+            return
+
+        parts = relative.split(os.sep)
+        if len(parts) == 2 and parts[1].endswith('.json'):
+            self.invalidate(parts[0], parts[1][:-len('.json')])
+        else:
+            # A subject directory (or something inside it) changed
+            self.invalidate(parts[0])
+
+    def stats(self):
+        """Return a snapshot of cache counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'watching': self._watcher_ready and self.watcher is not None and self.watcher.active
+            }
+
+    def _store(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._current_bytes -= old.size
+
+        # Quizzes bigger than the whole budget are served but never cached
+        if entry.size > self.max_bytes:
+            return
+
+        self._entries[key] = entry
+        self._current_bytes += entry.size
+
+        while self._current_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._current_bytes -= evicted.size
+
+    def _ensure_watcher(self):
+        if self.watcher is None:
+            return False
+        if not self._watcher_ready:
+            self.watcher.add_listener(self.invalidate_path)
+            self._watcher_ready = True
+        return self.watcher.start()
+
+
+quiz_watcher = QuizWatcher(QUIZ_DIR)
+
+quiz_cache = QuizCache(
+    QUIZ_DIR,
+    max_bytes=int(os.environ.get('QUIZ_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    check_interval=float(os.environ.get('QUIZ_CACHE_CHECK_INTERVAL', '2')),
+    loader=compile_quiz,
+    watcher=quiz_watcher
+)
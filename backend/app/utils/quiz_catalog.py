@@ -0,0 +1,280 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from flask import Response, request
+
+from app.utils.quiz_cache import QUIZ_DIR, quiz_watcher
+from app.utils.compression import if_none_match
+
+# Upper bound for the `limit` query parameter of catalog listings
+MAX_LISTING_LIMIT = 500
+
+
+def _read_quiz_metadata(path):
+    """Return (question_count, difficulty) for a quiz file"""
+    try:
+        with open(path, 'rb') as f:
+            quiz_data = json.loads(f.read())
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not index quiz {path}: {str(e)}")
+        return 0, None
+
+    if not isinstance(quiz_data, list):
+        return 0, None
+
+    return len(quiz_data), quiz_difficulty(quiz_data)
+
+
+def quiz_difficulty(quiz_data):
+    """Quizzes don't carry a difficulty of their own, use the most common question difficulty"""
+    difficulties = Counter(q['difficulty'] for q in quiz_data if isinstance(q, dict) and q.get('difficulty'))
+    return difficulties.most_common(1)[0][0] if difficulties else None
+
+
+class QuizCatalog:
+    """
+    In-memory index of subjects and quizzes.
+
+    The index is built once and then refreshed one subject at a time when
+    the quiz watcher reports a change. Without a watcher, the mtime and size
+    of every quiz file (and the subject directory mtimes) are re-checked at
+    most once every `check_interval` seconds, so quizzes edited in place
+    are picked up too.
+    Rendered listings are memoized per catalog version together with a
+    content ETag, so repeated listings (and the health check) cost a dict
+    lookup.
+    """
+
+    def __init__(self, quiz_dir, check_interval=5.0, watcher=None, max_rendered=256):
+        self.quiz_dir = os.path.abspath(quiz_dir)
+        self.check_interval = check_interval
+        self.watcher = watcher
+        self.max_rendered = max_rendered
+        self.version = 0
+        self._subjects = None
+        self._signatures = {}
+        self._dirty = set()
+        self._rebuild_all = False
+        self._checked_at = 0.0
+        self._rendered = OrderedDict()
+        self._lock = threading.RLock()
+        self._watcher_ready = False
+
+    def build(self):
+        """(Re)build the whole index from the quiz directory"""
+        with self._lock:
+            subjects = {}
+            signatures = {}
+            if os.path.isdir(self.quiz_dir):
+                signatures[None] = os.stat(self.quiz_dir).st_mtime_ns
+                for subject in os.listdir(self.quiz_dir):
+                    subject_dir = os.path.join(self.quiz_dir, subject)
+                    if os.path.isdir(subject_dir):
+                        subjects[subject], signatures[subject] = self._scan_subject(subject_dir)
+
+            self._subjects = subjects
+            self._signatures = signatures
+            self._dirty.clear()
+            self._rebuild_all = False
+            self._checked_at = time.monotonic()
+            self._bump()
+
+    def refresh_subject(self, subject):
+        """Re-index a single subject (e.g. after a quiz was written to it)"""
+        with self._lock:
+            if self._subjects is None:
+                self.build()
+                return
+
+            subjects = dict(self._subjects)
+            subject_dir = os.path.join(self.quiz_dir, subject)
+            if os.path.isdir(subject_dir):
+                subjects[subject], self._signatures[subject] = self._scan_subject(subject_dir)
+            else:
+                subjects.pop(subject, None)
+                self._signatures.pop(subject, None)
+
+            if os.path.isdir(self.quiz_dir):
+                self._signatures[None] = os.stat(self.quiz_dir).st_mtime_ns
+            self._subjects = subjects
+            self._dirty.discard(subject)
+            self._bump()
+
+    def on_path_changed(self, path):
+        """Watcher callback - only marks the affected subject as dirty"""
+        relative = os.path.relpath(os.path.abspath(path), self.quiz_dir)
+        if relative.startswith('..'):
+            return
+        with self._lock:
+            if relative == '.':
+                self._rebuild_all = True
+            else:
+                self._dirty.add(relative.split(os.sep)[0])
+
+    def subjects(self):
+        """Return the sorted list of subject names"""
+        return sorted(self._snapshot())
+
+    def quizzes(self, subject):
+        """Return {quiz_name: {'question_count', 'difficulty'}} for a subject, or None if it doesn't exist"""
+        return self._snapshot().get(subject)
+
+    def has_quiz(self, subject, quiz_name):
+        quizzes = self.quizzes(subject)
+        return quizzes is not None and quiz_name in quizzes
+
+    def rendered(self, key, render):
+        """
+        Return (body, etag) for a listing, rendering it at most once per catalog version.
+
+        `render` is called with no arguments and must return a JSON-serializable
+        object. The ETag is a hash of the body so it is identical across workers.
+        """
+        self._snapshot()
+        with self._lock:
+            cached = self._rendered.get(key)
+            if cached is not None and cached[0] == self.version:
+                self._rendered.move_to_end(key)
+                return cached[1], cached[2]
+            version = self.version
+
+        body = json.dumps(render(), separators=(',', ':'))
+        etag = hashlib.sha1(body.encode('utf-8')).hexdigest()[:20]
+
+        with self._lock:
+            if version == self.version:
+                self._rendered[key] = (version, body, etag)
+                self._rendered.move_to_end(key)
+                while len(self._rendered) > self.max_rendered:
+                    self._rendered.popitem(last=False)
+        return body, etag
+
+    def _snapshot(self):
+        self._ensure_watcher()
+        if self._subjects is None:
+            self.build()
+
+        watching = self.watcher is not None and self.watcher.active
+        if not watching and time.monotonic() - self._checked_at >= self.check_interval:
+            self._check_mtimes()
+
+        if self._dirty or self._rebuild_all:
+            with self._lock:
+                if self._rebuild_all:
+                    self.build()
+                for subject in list(self._dirty):
+                    self.refresh_subject(subject)
+
+        return self._subjects
+
+    def _check_mtimes(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                if os.stat(self.quiz_dir).st_mtime_ns != self._signatures.get(None):
+                    self._rebuild_all = True
+                    return
+            except OSError:
+                self._rebuild_all = True
+                return
+
+            for subject in self._subjects:
+                try:
+                    signature = self._subject_signature(os.path.join(self.quiz_dir, subject))
+                except OSError:
+                    signature = None
+                if signature != self._signatures.get(subject):
+                    self._dirty.add(subject)
+
+    @staticmethod
+    def _subject_signature(subject_dir):
+        # Editing a quiz in place doesn't touch its directory's mtime, so the files' own stats are part of it
+        files = []
+        with os.scandir(subject_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json'):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((entry.name, st.st_mtime_ns, st.st_size))
+        return os.stat(subject_dir).st_mtime_ns, frozenset(files)
+
+    def _scan_subject(self, subject_dir):
+        # Taken before the files are read, so a change made while they are read shows up at the next check
+        signature = self._subject_signature(subject_dir)
+        quizzes = {}
+        for file_name, _, _ in signature[1]:
+            question_count, difficulty = _read_quiz_metadata(os.path.join(subject_dir, file_name))
+            quizzes[file_name[:-len('.json')]] = {
+                'question_count': question_count,
+                'difficulty': difficulty
+            }
+        return quizzes, signature
+
+    def _bump(self):
+        self.version += 1
+        self._rendered.clear()
+
+    def _ensure_watcher(self):
+        if self.watcher is None or self._watcher_ready:
+            return
+        self.watcher.add_listener(self.on_path_changed)
+        self._watcher_ready = True
+        self.watcher.start()
+
+
+def parse_listing_args():
+    """
+    Read the `prefix`, `offset` and `limit` query parameters of a listing.
+
+    Raises ValueError for malformed values. `limit` is None when the client
+    didn't ask for pagination.
+    """
+    prefix = request.args.get('prefix', '')
+    offset = int(request.args.get('offset', 0))
+    limit = request.args.get('limit')
+    limit = int(limit) if limit is not None else None
+    if offset < 0 or (limit is not None and not 1 <= limit <= MAX_LISTING_LIMIT):
+        raise ValueError(f'offset must be >= 0 and limit between 1 and {MAX_LISTING_LIMIT}')
+    return prefix, offset, limit
+
+
+def paginate(names, prefix, offset, limit):
+    """Filter sorted names by prefix and slice a page; returns (page, total, next_offset)"""
+    if prefix:
+        names = [n for n in names if n.startswith(prefix)]
+    total = len(names)
+    end = total if limit is None else offset + limit
+    next_offset = end if end < total else None
+    return names[offset:end], total, next_offset
+
+
+def catalog_response(key, render, catalog=None):
+    """
+    Serve a memoized catalog listing, answering 304 when the client's ETag matches.
+
+    `catalog` is anything with a `rendered(key, render)` method (such as the
+    configured quiz storage); it defaults to the file catalog.
+    """
+    body, etag = (catalog or quiz_catalog).rendered(key, render)
+    if if_none_match(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Clients may keep the listing but must revalidate it
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+quiz_catalog = QuizCatalog(
+    QUIZ_DIR,
+    check_interval=float(os.environ.get('QUIZ_CATALOG_CHECK_INTERVAL', '5')),
+    watcher=quiz_watcher
+)
@@ -0,0 +1,224 @@
+import json
+import logging
+import hashlib
+
+from flask import Response
+
+from app.utils.log import log_event
+from app.utils.answer_codec import options_digest
+
+logger = logging.getLogger(__name__)
+
+# Compact separators match what jsonify emits outside of debug mode
+_SEPARATORS = (',', ':')
+
+# Answer key entry of a question whose correct answer isn't one of its options: equal to no answer
+_UNANSWERABLE = object()
+
+# Fields of a client question that give its answer away, left out of `public_json`
+_ANSWER_FIELDS = ('correct_answer_index', 'explanation')
+
+
+def _dumps(value):
+    return json.dumps(value, separators=_SEPARATORS)
+
+
+class CompiledQuiz:
+    """
+    Immutable, precomputed views of a quiz file.
+
+    `client_json` is the serialized question list sent to the client (with
+    `correct_answer_index` instead of `correct_answer`), and `answer_key`
+    holds the correct option for every question so grading is a single
+    comparison per question. Questions with an invalid shape have `None`
+    in the answer key and are skipped when grading, but still count
+    towards `total_questions` as they always have. A question whose correct
+    answer isn't one of its options is graded as wrong whatever the answer. `options` holds every
+    question's option tuple (None without a valid option list); stored
+    answers are packed as indexes into it, together with `options_digest`.
+    `public_json` is `client_json` without the answers, for bodies that are
+    shared beyond one attempt.
+    """
+
+    __slots__ = ('version', 'total_questions', 'client_json', 'answer_key', 'options',
+                 'explanations', 'positions', '_client_questions', '_result_prefixes', '_options_digest',
+                 '_public_json')
+
+    def __init__(self, version, client_questions, answer_key, explanations, result_prefixes, positions=None,
+                 options=None):
+        self.version = version
+        self.total_questions = len(client_questions)
+        # Position of every question in the full quiz (differs from its index in a sampled subset)
+        self.positions = tuple(positions) if positions is not None else tuple(range(len(client_questions)))
+        self.client_json = '[' + ','.join(client_questions) + ']'
+        self.answer_key = answer_key
+        self.options = options if options is not None else (None,) * len(client_questions)
+        self.explanations = explanations
+        self._client_questions = client_questions
+        self._result_prefixes = result_prefixes
+        self._options_digest = None
+        self._public_json = None
+
+    @property
+    def options_digest(self):
+        """Digest of `options` stored with packed answers, computed once per compiled quiz"""
+        if self._options_digest is None:
+            self._options_digest = options_digest(self.options)
+        return self._options_digest
+
+    @property
+    def public_json(self):
+        """The question list without correct_answer_index and explanation, built once per compiled quiz"""
+        if self._public_json is None:
+            questions = []
+            for client_question in self._client_questions:
+                question = json.loads(client_question)
+                if isinstance(question, dict):
+                    for field in _ANSWER_FIELDS:
+                        question.pop(field, None)
+                questions.append(_dumps(question))
+            self._public_json = '[' + ','.join(questions) + ']'
+        return self._public_json
+
+    def subset(self, positions):
+        """
+        Return a quiz made of the questions at `positions` (in that order).
+
+        Positions past the end of the quiz are ignored, so an attempt that
+        sampled an older, longer version of a quiz still loads.
+        """
+        positions = [p for p in positions if 0 <= p < self.total_questions]
+        return CompiledQuiz(
+            version=self.version + ':' + ','.join(str(p) for p in positions),
+            client_questions=tuple(self._client_questions[p] for p in positions),
+            answer_key=tuple(self.answer_key[p] for p in positions),
+            options=tuple(self.options[p] for p in positions),
+            explanations=tuple(self.explanations[p] for p in positions),
+            result_prefixes=tuple(self._result_prefixes[p] for p in positions),
+            positions=tuple(self.positions[p] for p in positions)
+        )
+
+    def grade(self, user_answers):
+        """
+        Grade a list of answers.
+
+        Returns a tuple of (score, results_json) where results_json is the
+        serialized list of per-question result objects.
+        """
+        score = 0
+        fragments = []
+
+        for i, correct_answer in enumerate(self.answer_key):
+            if correct_answer is None:
+                continue
+
+            user_answer = user_answers[i] if i < len(user_answers) else ''
+            is_correct = user_answer == correct_answer
+            if is_correct:
+                score += 1
+
+            fragments.append(
+                f'{self._result_prefixes[i]},"user_answer":{_dumps(user_answer)},'
+                f'"is_correct":{"true" if is_correct else "false"}}}'
+            )
+
+        return score, '[' + ','.join(fragments) + ']'
+
+    def question_results(self, user_answers):
+        """Return [(position, is_correct)] for every gradable question, positions as in the full quiz"""
+        results = []
+        for i, correct_answer in enumerate(self.answer_key):
+            if correct_answer is None:
+                continue
+            user_answer = user_answers[i] if i < len(user_answers) else ''
+            results.append((self.positions[i], user_answer == correct_answer))
+        return results
+
+
+def compile_quiz(raw):
+    """
+    Parse raw quiz file contents and build its client view and answer key.
+
+    Raises ValueError if the file isn't a list of questions.
+    """
+    quiz_data = json.loads(raw)
+    if not isinstance(quiz_data, list):
+        raise ValueError('Quiz file must contain a list of questions')
+
+    return compile_questions(quiz_data, hashlib.sha1(raw).hexdigest()[:16])
+
+
+def compile_questions(quiz_data, version, positions=None):
+    """
+    Build a CompiledQuiz from an already parsed list of questions. `positions`
+    gives their positions in the full quiz when only a sample was loaded.
+    """
+    client_questions = []
+    answer_key = []
+    options = []
+    explanations = []
+    result_prefixes = []
+
+    for i, question in enumerate(quiz_data):
+        client_question = question
+        correct_answer_index = None
+        if isinstance(question, dict) and 'correct_answer' in question:
+            client_question = dict(question)
+            try:
+                correct_answer_index = question['options'].index(question['correct_answer'])
+            except (KeyError, AttributeError, ValueError):
+                # The rest of the quiz is still served; this question just never scores
+                log_event(logger, logging.WARNING, 'quiz_question_invalid', version=version, question=i + 1,
+                          error='correct answer is not one of the options')
+            client_question['correct_answer_index'] = correct_answer_index
+            del client_question['correct_answer']
+        client_questions.append(_dumps(client_question))
+        question_options = question.get('options') if isinstance(question, dict) else None
+        options.append(tuple(question_options) if isinstance(question_options, list) else None)
+
+        # Same shape check submit_quiz has always used for grading
+        if not isinstance(question, dict) or 'question' not in question or 'options' not in question or 'correct_answer' not in question:
+            answer_key.append(None)
+            explanations.append(None)
+            result_prefixes.append(None)
+            continue
+
+        explanation = question.get('explanation', 'No explanation provided.')
+        answer_key.append(question['correct_answer'] if correct_answer_index is not None else _UNANSWERABLE)
+        explanations.append(explanation)
+        # Static part of the result object, left open for the per-user fields
+        result_prefixes.append(_dumps({
+            'question': question['question'],
+            'options': question['options'],
+            'correct_answer': question['correct_answer'],
+            'explanation': explanation
+        })[:-1])
+
+    return CompiledQuiz(
+        version=version,
+        client_questions=tuple(client_questions),
+        answer_key=tuple(answer_key),
+        explanations=tuple(explanations),
+        result_prefixes=tuple(result_prefixes),
+        positions=positions,
+        options=tuple(options)
+    )
+
+
+def json_body(payload, raw_fields):
+    """
+    Serialize a dict plus already-serialized fields into a JSON object.
+
+    `raw_fields` maps keys to JSON strings that are spliced into the body
+    as-is, so large precompiled parts are never re-encoded.
+    """
+    body = _dumps(payload)
+    extra = ','.join(f'{_dumps(key)}:{value}' for key, value in raw_fields.items())
+    if extra:
+        body = body[:-1] + (',' if payload else '') + extra + '}'
+    return body
+
+
+def json_response(payload, raw_fields, status=200):
+    """Build a JSON response from a dict plus already-serialized fields, see json_body"""
+    return Response(json_body(payload, raw_fields), status=status, mimetype='application/json')
@@ -0,0 +1,139 @@
+import json
+
+from app.utils.quiz_storage import QuizExistsError, quiz_storage
+
+
+def sanitize_name(value):
+    """Turn a subject or topic into a safe directory / file name"""
+    return ''.join(c if c.isalnum() else '_' for c in value.lower())
+
+
+def build_messages(subject, topic, num_questions, difficulty):
+    """Return the chat messages that ask the LLM for a quiz"""
+    prompt = f"""
+        Create a quiz on the topic of "{topic}" in the subject area of "{subject}" with {num_questions} multiple-choice questions.
+        The difficulty level should be {difficulty}.
+
+        Each question should have:
+        1. A clear question
+        2. Four possible options
+        3. One correct answer
+        4. A brief explanation of why the answer is correct
+
+        Format the response as a JSON array where each question is an object with the following structure:
+        {{
+            "id": 1,
+            "question": "What is the capital of France?",
+            "options": ["Paris", "London", "Rome", "Berlin"],
+            "correct_answer": "Paris",
+            "explanation": "Paris is the capital of France."
+        }}
+
+        Only return the JSON array, nothing else.
+        """
+
+    return [
+        {"role": "system", "content": "You are a helpful assistant that generates quiz questions in JSON format."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def parse_quiz(text):
+    """Parse the LLM output into a list of questions; raises ValueError if it isn't one"""
+    # Extract JSON from the response (in case there's any extra text)
+    text = text.strip().replace("```json", "").replace("```", "").strip()
+    quiz_data = json.loads(text)
+    if not isinstance(quiz_data, list) or not quiz_data:
+        raise ValueError('LLM did not return a list of questions')
+    return quiz_data
+
+
+def validate_question(question):
+    """Return True if a generated question has the shape the quiz routes need"""
+    return (
+        isinstance(question, dict)
+        and isinstance(question.get('question'), str)
+        and isinstance(question.get('options'), list)
+        and len(question['options']) >= 2
+        and question.get('correct_answer') in question['options']
+    )
+
+
+class QuestionStreamParser:
+    """
+    Incrementally extracts question objects from a streamed JSON array.
+
+    Feed it text chunks as they arrive; every call returns the objects that
+    were completed by that chunk. Anything before the opening '[' (such as
+    a ```json fence) is ignored, and each character is scanned only once.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = None
+
+    @property
+    def done(self):
+        """True once the closing bracket of the array has been seen"""
+        return self._done
+
+    def feed(self, chunk):
+        self.text += chunk
+        text = self.text
+        questions = []
+
+        i = self._pos
+        while i < len(text) and not self._done:
+            ch = text[i]
+            if not self._started:
+                self._started = ch == '['
+            elif self._object_start is None:
+                if ch == '{':
+                    self._object_start = i
+                    self._depth = 1
+                elif ch == ']':
+                    self._done = True
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        questions.append(json.loads(text[self._object_start:i + 1]))
+                    except ValueError:
+                        pass  # Skip a malformed object, the rest of the array may be fine
+                    self._object_start = None
+            i += 1
+
+        self._pos = i
+        return questions
+
+
+def save_quiz(subject_dir_name, quiz_file_name, quiz_data, difficulty):
+    """
+    Store a generated quiz in the configured quiz storage.
+
+    Two jobs racing for the same topic can't overwrite each other; the
+    loser gets QuizExistsError.
+    """
+    # Record the requested difficulty so the quiz catalog can report it
+    for question in quiz_data:
+        if isinstance(question, dict):
+            question.setdefault('difficulty', difficulty)
+
+    quiz_storage.save(subject_dir_name, quiz_file_name, quiz_data)
@@ -0,0 +1,328 @@
+import os
+import importlib
+from collections import Counter
+from datetime import datetime
+
+from app import db
+from app.models.quiz_attempt import QuizAttempt, decode_answers, decode_question_positions
+from app.utils.answer_codec import OptionsChanged
+from app.models.quiz_stats import QuizStats, QuizScoreBucket, QuizQuestionStats, UserStats
+
+# An attempt passes when it scores at least this percentage
+PASS_PERCENTAGE = float(os.environ.get('STATS_PASS_PERCENTAGE', '60'))
+
+# Dialects with an INSERT ... ON CONFLICT / ON DUPLICATE KEY upsert (only the one in use gets imported)
+_UPSERT_DIALECTS = ('sqlite', 'postgresql', 'mysql')
+
+
+def score_bucket(score, total_questions):
+    """Histogram bucket of a score: 0 for 0-9%, 1 for 10-19%, ... 10 for full marks"""
+    if total_questions <= 0:
+        return 0
+    return min(10, max(0, score * 10 // total_questions))
+
+
+def is_pass(score, total_questions):
+    return total_questions > 0 and score * 100 >= PASS_PERCENTAGE * total_questions
+
+
+def _upsert(model, key_columns, rows, increments, replace=()):
+    """
+    Add the `increments` columns of every row to the stored counters, inserting
+    rows that don't exist yet, with a single INSERT ... ON CONFLICT DO UPDATE
+    (ON DUPLICATE KEY UPDATE on MySQL) so concurrent submits never lose an
+    update. `replace` columns are overwritten instead of added to.
+    Does not commit.
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    session = db.session()
+    dialect = session.get_bind().dialect.name
+
+    if dialect not in _UPSERT_DIALECTS:
+        # No upsert available - update the existing row, insert it if there was none
+        for row in rows:
+            keys = [table.c[col] == row[col] for col in key_columns]
+            values = {col: table.c[col] + row[col] for col in increments}
+            values.update({col: row[col] for col in replace})
+            if session.execute(db.update(table).where(*keys).values(**values)).rowcount == 0:
+                session.execute(db.insert(table).values(**row))
+        return
+
+    stmt = importlib.import_module(f'sqlalchemy.dialects.{dialect}').insert(table)
+    if dialect == 'mysql':
+        new = stmt.inserted
+        stmt = stmt.on_duplicate_key_update(
+            {col: table.c[col] + new[col] for col in increments} | {col: new[col] for col in replace}
+        )
+    else:
+        new = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={col: table.c[col] + new[col] for col in increments} | {col: new[col] for col in replace}
+        )
+    session.execute(stmt, rows)
+
+
+def _claim_submission(attempt_id):
+    """Move an attempt to SUBMITTED; returns False if another request already did"""
+    result = db.session.execute(
+        db.update(QuizAttempt)
+        .where(QuizAttempt.id == attempt_id, QuizAttempt.status != QuizAttempt.SUBMITTED)
+        .values(status=QuizAttempt.SUBMITTED)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def claim_submissions(attempt_ids):
+    """Move several attempts to SUBMITTED; returns the set of ids moved by this call"""
+    if not attempt_ids:
+        return set()
+    if not db.session.get_bind().dialect.update_returning:
+        return {attempt_id for attempt_id in attempt_ids if _claim_submission(attempt_id)}
+    return set(db.session.execute(
+        db.update(QuizAttempt)
+        .where(QuizAttempt.id.in_(attempt_ids), QuizAttempt.status != QuizAttempt.SUBMITTED)
+        .values(status=QuizAttempt.SUBMITTED)
+        .returning(QuizAttempt.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+
+
+def regrade_submission(attempt, values):
+    """
+    Overwrite the result of a submitted attempt with `values` if it is still
+    the one read with it (a compare-and-set on its score and stored answers),
+    so two concurrent regrades can't both take the same old result out of the
+    statistics. Returns whether this call replaced it.
+    """
+    unchanged = [
+        QuizAttempt.id == attempt.id,
+        QuizAttempt.status == QuizAttempt.SUBMITTED,
+        QuizAttempt.score == attempt.score,
+        QuizAttempt.total_questions == attempt.total_questions
+    ]
+    for column, value in ((QuizAttempt.answers_packed, attempt.answers_packed),
+                          (QuizAttempt.user_answers, attempt.user_answers)):
+        unchanged.append(column.is_(None) if value is None else column == value)
+    result = db.session.execute(
+        db.update(QuizAttempt).where(*unchanged).values(**values).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+class SubmissionStats:
+    """
+    Statistics changes of one or more graded attempts, written with one
+    upsert per statistics table
+    """
+
+    def __init__(self):
+        self.quizzes = {}          # (subject, quiz_name) -> Counter of totals
+        self.users = {}            # user_id -> Counter of totals
+        self.buckets = Counter()   # (subject, quiz_name, bucket) -> attempts
+        self.answered = Counter()  # (subject, quiz_name, position) -> answers
+        self.correct = Counter()   # (subject, quiz_name, position) -> correct answers
+
+    def add(self, user_id, subject, quiz_name, quiz, score, total_questions, user_answers, first=True, sign=1):
+        """
+        Count a graded attempt. `first` is False when the attempt was counted
+        before (a regrade); sign=-1 takes a previously counted result out again.
+        `user_answers` is None when they are unknown (stored for questions that
+        changed since); then only the totals are counted.
+        """
+        totals = {
+            'attempts': sign if first else 0,
+            'passes': sign * int(is_pass(score, total_questions)),
+            'score_sum': sign * score,
+            'question_sum': sign * total_questions
+        }
+        self.quizzes.setdefault((subject, quiz_name), Counter()).update(totals)
+        self.users.setdefault(user_id, Counter()).update(totals)
+        self.buckets[(subject, quiz_name, score_bucket(score, total_questions))] += sign
+        if user_answers is None:
+            return
+        for position, is_correct in quiz.question_results(user_answers):
+            self.answered[(subject, quiz_name, position)] += sign
+            self.correct[(subject, quiz_name, position)] += sign * int(is_correct)
+
+    def write(self):
+        """Apply the counted changes, in the caller's transaction (does not commit)"""
+        fields = ['attempts', 'passes', 'score_sum', 'question_sum']
+        _upsert(QuizStats, ['subject', 'quiz_name'], [
+            dict({field: totals[field] for field in fields}, subject=subject, quiz_name=quiz_name)
+            for (subject, quiz_name), totals in self.quizzes.items()
+        ], fields)
+        _upsert(QuizScoreBucket, ['subject', 'quiz_name', 'bucket'], [
+            {'subject': subject, 'quiz_name': quiz_name, 'bucket': bucket, 'count': count}
+            for (subject, quiz_name, bucket), count in self.buckets.items() if count
+        ], ['count'])
+        _upsert(QuizQuestionStats, ['subject', 'quiz_name', 'position'], [
+            {'subject': subject, 'quiz_name': quiz_name, 'position': position,
+             'answered': answered, 'correct': self.correct[(subject, quiz_name, position)]}
+            for (subject, quiz_name, position), answered in self.answered.items()
+            if answered or self.correct[(subject, quiz_name, position)]
+        ], ['answered', 'correct'])
+        now = datetime.utcnow()
+        _upsert(UserStats, ['user_id'], [
+            dict({field: totals[field] for field in fields}, user_id=user_id, last_submitted_at=now)
+            for user_id, totals in self.users.items()
+        ], fields, replace=['last_submitted_at'])
+
+
+def record_submission(attempt, quiz, score, total_questions, user_answers, previous=None):
+    """
+    Update the quiz and user statistics for a graded attempt, in the caller's
+    transaction (the caller commits together with the attempt).
+
+    `previous` is (score, total_questions, user_answers) when an already
+    submitted attempt is graded again; its old contribution is taken out.
+    For a first submission the attempt is moved to SUBMITTED here with a
+    conditional UPDATE, and a regrade replaces the stored result only if it
+    is still `previous` (see regrade_submission), so two racing submits
+    count it only once. Returns False, counting nothing, if another request
+    got there first. Call this before changing the attempt on the ORM object.
+    """
+    if previous is None:
+        if not _claim_submission(attempt.id):
+            return False
+    else:
+        answers_packed, stored_answers = QuizAttempt.encode_answers(user_answers, quiz)
+        if not regrade_submission(attempt, {
+            'score': score,
+            'total_questions': total_questions,
+            'answers_packed': answers_packed,
+            'user_answers': stored_answers
+        }):
+            return False
+
+    stats = SubmissionStats()
+    key = (attempt.user_id, attempt.subject, attempt.quiz_name, quiz)
+    stats.add(*key, score, total_questions, user_answers, first=previous is None)
+    if previous is not None:
+        stats.add(*key, *previous, first=False, sign=-1)
+    stats.write()
+    return True
+
+
+def quiz_stats(subject, quiz_name):
+    """Return the statistics of a quiz (zeros if it has no submitted attempts)"""
+    stats = QuizStats.query.filter_by(subject=subject, quiz_name=quiz_name).first()
+    if stats is None:
+        stats = QuizStats(subject=subject, quiz_name=quiz_name, attempts=0, passes=0, score_sum=0, question_sum=0)
+
+    histogram = [0] * 11
+    for bucket, count in db.session.execute(
+        db.select(QuizScoreBucket.bucket, QuizScoreBucket.count)
+        .where(QuizScoreBucket.subject == subject, QuizScoreBucket.quiz_name == quiz_name)
+    ):
+        if 0 <= bucket <= 10:
+            histogram[bucket] = count
+
+    questions = QuizQuestionStats.query.filter_by(subject=subject, quiz_name=quiz_name).order_by(QuizQuestionStats.position)
+
+    result = stats.to_dict()
+    result['pass_percentage'] = PASS_PERCENTAGE
+    result['histogram'] = histogram
+    result['questions'] = [q.to_dict() for q in questions]
+    return result
+
+
+def user_stats(user_id):
+    """Return the statistics of a user (zeros if they have no submitted attempts)"""
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        stats = UserStats(user_id=user_id, attempts=0, passes=0, score_sum=0, question_sum=0, last_submitted_at=None)
+    result = stats.to_dict()
+    result['pass_percentage'] = PASS_PERCENTAGE
+    return result
+
+
+def rebuild_stats(quiz_storage, chunk_size=1000):
+    """
+    Recompute every statistics table from the submitted attempts.
+
+    Attempts are streamed with yield_per; per-question counts are graded
+    against the current version of each quiz (attempts at quizzes that no
+    longer exist still count towards the totals). Commits once at the end.
+    Returns the number of attempts processed.
+    """
+    quiz_totals = {}
+    user_totals = {}
+    buckets = Counter()
+    answered = Counter()
+    correct = Counter()
+    quizzes = {}
+    processed = 0
+
+    query = db.select(
+        QuizAttempt.user_id, QuizAttempt.subject, QuizAttempt.quiz_name, QuizAttempt.score,
+        QuizAttempt.total_questions, QuizAttempt.attempt_date, QuizAttempt.user_answers,
+        QuizAttempt.answers_packed, QuizAttempt.question_positions
+    ).where(QuizAttempt.status == QuizAttempt.SUBMITTED).execution_options(yield_per=chunk_size)
+
+    for row in db.session.execute(query):
+        processed += 1
+        key = (row.subject, row.quiz_name)
+        passed = int(is_pass(row.score, row.total_questions))
+
+        totals = quiz_totals.setdefault(key, [0, 0, 0, 0])
+        user = user_totals.setdefault(row.user_id, [0, 0, 0, 0, None])
+        for target in (totals, user):
+            target[0] += 1
+            target[1] += passed
+            target[2] += row.score
+            target[3] += row.total_questions
+        if row.attempt_date and (user[4] is None or row.attempt_date > user[4]):
+            user[4] = row.attempt_date
+        buckets[key + (score_bucket(row.score, row.total_questions),)] += 1
+
+        if key not in quizzes:
+            try:
+                quizzes[key] = quiz_storage.get(*key)
+            except Exception:
+                quizzes[key] = None
+        quiz = quizzes[key]
+        if quiz is None:
+            continue
+
+        positions = decode_question_positions(row.question_positions)
+        graded = quiz.subset(positions) if positions is not None else quiz
+        try:
+            user_answers = decode_answers(row.user_answers, row.answers_packed, graded)
+        except OptionsChanged:
+            # Answered against options the quiz no longer has - counted in the totals only
+            continue
+        for position, is_correct in graded.question_results(user_answers):
+            answered[key + (position,)] += 1
+            correct[key + (position,)] += int(is_correct)
+
+    for model in (QuizStats, QuizScoreBucket, QuizQuestionStats, UserStats):
+        db.session.execute(db.delete(model))
+
+    def insert(model, rows):
+        rows = list(rows)
+        if rows:
+            db.session.execute(db.insert(model), rows)
+
+    insert(QuizStats, ({
+        'subject': subject, 'quiz_name': quiz_name, 'attempts': t[0], 'passes': t[1],
+        'score_sum': t[2], 'question_sum': t[3]
+    } for (subject, quiz_name), t in quiz_totals.items()))
+    insert(QuizScoreBucket, ({
+        'subject': subject, 'quiz_name': quiz_name, 'bucket': bucket, 'count': count
+    } for (subject, quiz_name, bucket), count in buckets.items()))
+    insert(QuizQuestionStats, ({
+        'subject': subject, 'quiz_name': quiz_name, 'position': position,
+        'answered': count, 'correct': correct[(subject, quiz_name, position)]
+    } for (subject, quiz_name, position), count in answered.items()))
+    insert(UserStats, ({
+        'user_id': user_id, 'attempts': t[0], 'passes': t[1], 'score_sum': t[2], 'question_sum': t[3],
+        'last_submitted_at': t[4]
+    } for user_id, t in user_totals.items()))
+
+    db.session.commit()
+    return processed
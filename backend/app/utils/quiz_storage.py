@@ -0,0 +1,291 @@
+import os
+import json
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.question_bank import BankQuiz, BankQuestion
+from app.utils.quiz_cache import quiz_cache
+from app.utils.quiz_catalog import quiz_catalog, quiz_difficulty
+from app.utils.quiz_compiler import compile_questions
+from app.utils.review_cache import review_cache
+
+
+class QuizExistsError(Exception):
+    """Raised when saving a quiz would overwrite an existing one"""
+
+
+def sample_positions(question_count, sample_size):
+    """Pick `sample_size` distinct question positions at random, in quiz order"""
+    return sorted(random.sample(range(question_count), min(sample_size, question_count)))
+
+
+class QuizStorage:
+    """
+    Where quizzes live. The quiz routes and the AI generator only talk to
+    this interface, so the backend can be switched with QUIZ_STORAGE.
+
+    `get` returns a CompiledQuiz (or None if the quiz doesn't exist); when
+    `positions` is given only those questions are included, in that order.
+    """
+
+    def get(self, subject, quiz_name, positions=None):
+        raise NotImplementedError
+
+    def question_count(self, subject, quiz_name):
+        """Number of questions in a quiz, or None if it doesn't exist"""
+        raise NotImplementedError
+
+    def exists(self, subject, quiz_name):
+        raise NotImplementedError
+
+    def load_questions(self, subject, quiz_name):
+        """The raw question dicts of a quiz, or None if it is missing or unreadable"""
+        raise NotImplementedError
+
+    def save(self, subject, quiz_name, questions):
+        """Store a new quiz; raises QuizExistsError if the name is taken"""
+        raise NotImplementedError
+
+    def subjects(self):
+        """Sorted list of subject names"""
+        raise NotImplementedError
+
+    def quizzes(self, subject):
+        """{quiz_name: {'question_count', 'difficulty'}} for a subject, or None if it doesn't exist"""
+        raise NotImplementedError
+
+    def rendered(self, key, render):
+        """(body, etag) of a listing, see QuizCatalog.rendered"""
+        raise NotImplementedError
+
+    def warm(self):
+        """Prepare in-memory indexes at startup"""
+
+    def stats(self):
+        """Counters of the storage's in-memory cache"""
+        return {}
+
+
+class FileQuizStorage(QuizStorage):
+    """One JSON file per quiz under backend/quizzes/<subject>/, served through the quiz cache and catalog"""
+
+    kind = 'file'
+
+    def __init__(self, cache, catalog):
+        self.cache = cache
+        self.catalog = catalog
+
+    def get(self, subject, quiz_name, positions=None):
+        quiz = self.cache.get(subject, quiz_name)
+        if quiz is not None and positions is not None:
+            quiz = quiz.subset(positions)
+        return quiz
+
+    def question_count(self, subject, quiz_name):
+        quiz = self.cache.get(subject, quiz_name)
+        return quiz.total_questions if quiz is not None else None
+
+    def exists(self, subject, quiz_name):
+        path = self.cache.quiz_path(subject, quiz_name)
+        return path is not None and os.path.isfile(path)
+
+    def load_questions(self, subject, quiz_name):
+        path = self.cache.quiz_path(subject, quiz_name)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, subject, quiz_name, questions):
+        path = self.cache.quiz_path(subject, quiz_name)
+        if path is None:
+            raise ValueError('Invalid quiz name')
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Created exclusively, so two writers racing for the same name can't overwrite each other
+        try:
+            with open(path, 'x') as f:
+                json.dump(questions, f, indent=2)
+        except FileExistsError:
+            raise QuizExistsError('A quiz with this topic already exists in this subject')
+
+        # Make sure no stale copy is served if the watcher hasn't caught up yet
+        self.cache.invalidate(subject, quiz_name)
+        self.catalog.refresh_subject(subject)
+
+    def subjects(self):
+        return self.catalog.subjects()
+
+    def quizzes(self, subject):
+        return self.catalog.quizzes(subject)
+
+    def rendered(self, key, render):
+        return self.catalog.rendered(key, render)
+
+    def warm(self):
+        # Index the quiz directory once so listings are served from memory
+        self.catalog.build()
+
+    def stats(self):
+        return self.cache.stats()
+
+
+class SQLQuizStorage(QuizStorage):
+    """
+    Question bank in the application database (bank_quizzes / bank_questions).
+
+    Every question is its own row addressed by (quiz_id, position), so a
+    sampled attempt reads just its questions. Fully compiled quizzes are
+    kept in a small LRU and revalidated against the quiz's content version
+    with one indexed lookup per request, which keeps workers consistent.
+    """
+
+    kind = 'sql'
+
+    def __init__(self, max_cached=256):
+        self.max_cached = max_cached
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _quiz_row(self, subject, quiz_name):
+        return db.session.execute(
+            db.select(BankQuiz.id, BankQuiz.version, BankQuiz.question_count)
+            .where(BankQuiz.subject == subject, BankQuiz.name == quiz_name)
+        ).first()
+
+    def get(self, subject, quiz_name, positions=None):
+        row = self._quiz_row(subject, quiz_name)
+        if row is None:
+            return None
+
+        key = (subject, quiz_name)
+        with self._lock:
+            quiz = self._compiled.get(key)
+            if quiz is not None and quiz.version == row.version:
+                self._compiled.move_to_end(key)
+                self.hits += 1
+                return quiz if positions is None else quiz.subset(positions)
+            self.misses += 1
+
+        if positions is not None:
+            # Only read the sampled questions
+            positions = [p for p in positions if 0 <= p < row.question_count]
+            by_position = {
+                position: json.loads(data) for position, data in db.session.execute(
+                    db.select(BankQuestion.position, BankQuestion.data)
+                    .where(BankQuestion.quiz_id == row.id, BankQuestion.position.in_(positions))
+                )
+            }
+            positions = [p for p in positions if p in by_position]
+            return compile_questions(
+                [by_position[p] for p in positions],
+                row.version + ':' + ','.join(str(p) for p in positions),
+                positions=positions
+            )
+
+        quiz = compile_questions(self._load_rows(row.id), row.version)
+        with self._lock:
+            self._compiled[key] = quiz
+            self._compiled.move_to_end(key)
+            while len(self._compiled) > self.max_cached:
+                self._compiled.popitem(last=False)
+        return quiz
+
+    def question_count(self, subject, quiz_name):
+        row = self._quiz_row(subject, quiz_name)
+        return row.question_count if row is not None else None
+
+    def exists(self, subject, quiz_name):
+        return self._quiz_row(subject, quiz_name) is not None
+
+    def load_questions(self, subject, quiz_name):
+        row = self._quiz_row(subject, quiz_name)
+        return self._load_rows(row.id) if row is not None else None
+
+    def save(self, subject, quiz_name, questions, replace=False):
+        """Store a quiz; with `replace` an existing quiz of that name is overwritten (used by the importer)"""
+        quiz = BankQuiz.query.filter_by(subject=subject, name=quiz_name).first()
+        if quiz is not None and not replace:
+            raise QuizExistsError('A quiz with this topic already exists in this subject')
+
+        try:
+            if quiz is None:
+                quiz = BankQuiz(subject=subject, name=quiz_name)
+                db.session.add(quiz)
+            else:
+                db.session.execute(db.delete(BankQuestion).where(BankQuestion.quiz_id == quiz.id))
+
+            quiz.question_count = len(questions)
+            quiz.difficulty = quiz_difficulty(questions)
+            quiz.version = hashlib.sha1(json.dumps(questions, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+            db.session.flush()
+
+            if questions:
+                db.session.execute(db.insert(BankQuestion), [{
+                    'quiz_id': quiz.id,
+                    'position': position,
+                    'difficulty': question.get('difficulty') if isinstance(question, dict) else None,
+                    'data': json.dumps(question)
+                } for position, question in enumerate(questions)])
+            db.session.commit()
+            # Reviews graded against the replaced questions (their version no longer matches anyway)
+            review_cache.invalidate(subject, quiz_name)
+        except IntegrityError:
+            # Another writer created the same quiz first
+            db.session.rollback()
+            raise QuizExistsError('A quiz with this topic already exists in this subject')
+
+    def subjects(self):
+        return list(db.session.execute(
+            db.select(BankQuiz.subject).distinct().order_by(BankQuiz.subject)
+        ).scalars())
+
+    def quizzes(self, subject):
+        rows = db.session.execute(
+            db.select(BankQuiz.name, BankQuiz.question_count, BankQuiz.difficulty)
+            .where(BankQuiz.subject == subject)
+        ).all()
+        if not rows:
+            return None
+        return {name: {'question_count': count, 'difficulty': difficulty} for name, count, difficulty in rows}
+
+    def rendered(self, key, render):
+        # Listings are indexed queries, so they are rendered on every request
+        body = json.dumps(render(), separators=(',', ':'))
+        return body, hashlib.sha1(body.encode('utf-8')).hexdigest()[:20]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._compiled),
+                'max_entries': self.max_cached,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def _load_rows(self, quiz_id):
+        return [json.loads(data) for (data,) in db.session.execute(
+            db.select(BankQuestion.data).where(BankQuestion.quiz_id == quiz_id).order_by(BankQuestion.position)
+        )]
+
+
+def create_quiz_storage(kind):
+    """Return the storage backend named by QUIZ_STORAGE ('file' or 'sql')"""
+    if kind == 'file':
+        return FileQuizStorage(quiz_cache, quiz_catalog)
+    if kind == 'sql':
+        return SQLQuizStorage(max_cached=int(os.environ.get('QUIZ_BANK_CACHE_SIZE', '256')))
+    raise ValueError(f'Unknown QUIZ_STORAGE backend: {kind}')
+
+
+quiz_storage = create_quiz_storage(os.environ.get('QUIZ_STORAGE', 'file'))
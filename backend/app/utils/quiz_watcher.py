@@ -0,0 +1,94 @@
+import os
+import logging
+import threading
+
+# watchdog is optional - without it the quiz cache falls back to mtime polling
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _QuizEventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        self.watcher.notify(event.src_path)
+        # Renames report both the old and the new location
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.watcher.notify(dest_path)
+
+
+class QuizWatcher:
+    """
+    Watches the quiz directory and notifies listeners about changed paths.
+
+    The observer thread is started lazily on first use so that importing the
+    app (or forking workers) never spawns threads.
+    """
+
+    def __init__(self, quiz_dir):
+        self.quiz_dir = quiz_dir
+        self._listeners = []
+        self._observer = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        """True while a filesystem observer is delivering change events"""
+        return self._observer is not None and self._observer.is_alive()
+
+    def add_listener(self, callback):
+        """Register a callable that receives the path of every changed file"""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def notify(self, path):
+        """Dispatch a change for the given path to all listeners"""
+        for callback in list(self._listeners):
+            try:
+                callback(path)
+            except Exception as e:
+                logging.error(f"Quiz watcher listener failed for {path}: {str(e)}")
+
+    def start(self):
+        """Start the observer if watchdog is available; returns whether it is active"""
+        if self._started:
+            return self.active
+
+        with self._lock:
+            if self._started:
+                return self.active
+            self._started = True
+
+            if Observer is None or os.environ.get('QUIZ_WATCHER', '1') == '0':
+                return False
+            if not os.path.isdir(self.quiz_dir):
+                return False
+
+            try:
+                observer = Observer()
+                observer.schedule(_QuizEventHandler(self), self.quiz_dir, recursive=True)
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+            except Exception as e:
+                logging.warning(f"Could not start quiz watcher, falling back to mtime checks: {str(e)}")
+                self._observer = None
+
+        return self.active
+
+    def stop(self):
+        """Stop the observer thread (used by tests and before forking)"""
+        with self._lock:
+            if self._observer is not None:
+                self._observer.stop()
+                self._observer.join(timeout=5)
+                self._observer = None
+            self._started = False
@@ -0,0 +1,365 @@
+import os
+import math
+import time
+import hashlib
+import logging
+import sqlite3
+import itertools
+import threading
+from collections import Counter
+
+from flask import g, request, jsonify
+from flask_login import current_user
+
+from app.utils.log import log_event
+from app.utils.metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+# Endpoint -> route class; requests to other endpoints are never limited
+ROUTE_CLASSES = {
+    'auth.login': 'login',
+    'auth.register': 'login',
+    'auth.forgot_password': 'login',
+    'auth.reset_password': 'login',
+    'ai.generate_quiz': 'generate',
+    'quiz.submit_quiz': 'submit',
+    'quiz.bulk_submit': 'submit',
+}
+
+# Token bucket per route class and scope, as '<requests>/<seconds>' (bucket size / seconds to refill it).
+# RATE_LIMIT_<CLASS>_<SCOPE> overrides one ('off' disables it). The user scope of login is the email tried.
+DEFAULT_LIMITS = {
+    'login': {'ip': '30/60', 'user': '10/60'},
+    'generate': {'ip': '20/60', 'user': '5/60'},
+    'submit': {'ip': '300/60', 'user': '60/60'},
+}
+
+# Load shedding per route class: (latency SLO in ms, requests in flight in this process). New requests
+# are refused with 503 while a class is over both. RATE_LIMIT_<CLASS>_SLO_MS / _MAX_INFLIGHT override
+# them (0 disables shedding for the class).
+DEFAULT_SHEDDING = {
+    'login': (1000, 3),
+    'generate': (2000, 2),
+    'submit': (1000, 4),
+}
+
+# Weight of the latest request in a class's moving average latency
+LATENCY_EWMA_WEIGHT = 0.2
+
+# After the bucket store fails, requests go unlimited for this many seconds before it is tried again
+STORE_RETRY_SECONDS = 5
+
+
+def parse_limit(text):
+    """(capacity, tokens refilled per second) of a '<requests>/<seconds>' limit, None if it is disabled"""
+    if text is None or text.strip().lower() in ('', '0', 'off', 'none'):
+        return None
+    try:
+        requests, seconds = (float(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f'Invalid rate limit (expected <requests>/<seconds>): {text}')
+    if requests <= 0 or seconds <= 0:
+        raise ValueError(f'Invalid rate limit (expected <requests>/<seconds>): {text}')
+    return requests, requests / seconds
+
+
+def take_token(tokens, updated, capacity, rate, now, cost=1):
+    """One token bucket step: returns (allowed, tokens left) after refilling up to `now` and taking `cost`"""
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return True, tokens - cost
+    return False, tokens
+
+
+class MemoryBucketStore:
+    """Buckets in this process - every gunicorn worker enforces the limits on its own"""
+
+    kind = 'memory'
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        # key -> (tokens, updated, time the bucket is full again)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now, cost=1):
+        """Take `cost` tokens from a bucket; returns (allowed, tokens left)"""
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            allowed, tokens = take_token(tokens, updated, capacity, rate, now, cost)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > self.max_entries:
+                self._prune(now)
+            return allowed, tokens
+
+    def _prune(self, now):
+        # A bucket that has refilled is the same as no bucket
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+        # Then the least recently created ones
+        while len(self._buckets) > self.max_entries:
+            del self._buckets[next(iter(self._buckets))]
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file, shared by the workers of one host"""
+
+    kind = 'sqlite'
+
+    # Refilled buckets are deleted every this many takes
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._takes = itertools.count(1)
+
+    def _connection(self):
+        # One connection per thread, opened again after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Bucket state is disposable, so it isn't synced to disk
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit_buckets '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL) WITHOUT ROWID'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_full_at ON rate_limit_buckets (full_at)')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def take(self, key, capacity, rate, now, cost=1):
+        """Take `cost` tokens from a bucket; returns (allowed, tokens left)"""
+        connection = self._connection()
+        # Write-locked from the read on, so concurrent workers can't both take the last token
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row is not None else (capacity, now)
+            allowed, tokens = take_token(tokens, updated, capacity, rate, now, cost)
+            connection.execute(
+                'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)',
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+            if next(self._takes) % self.PRUNE_EVERY == 0:
+                connection.execute('DELETE FROM rate_limit_buckets WHERE full_at <= ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, tokens
+
+
+class RedisBucketStore:
+    """
+    Buckets in Redis, or any server speaking its protocol with Lua scripting,
+    shared by every worker and host. A bucket is a hash updated atomically
+    by one script call, and expires once it would have refilled.
+    """
+
+    kind = 'redis'
+
+    SCRIPT = """
+        local capacity, rate, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(state[1]) or capacity
+        local updated = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+        local allowed = 0
+        if tokens >= cost then
+            tokens = tokens - cost
+            allowed = 1
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+        redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+        return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url, prefix='rl:', timeout=0.25):
+        # redis is optional - only needed for RATE_LIMIT_BACKEND=redis
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RATE_LIMIT_BACKEND=redis requires the redis package')
+        self.prefix = prefix
+        # Connects on first use; the connection pool reconnects in forked workers
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key, capacity, rate, now, cost=1):
+        """Take `cost` tokens from a bucket; returns (allowed, tokens left)"""
+        allowed, tokens = self._script(keys=[self.prefix + key], args=[capacity, rate, now, cost])
+        return bool(int(allowed)), float(tokens)
+
+
+def create_bucket_store(kind):
+    """Return the bucket store named by RATE_LIMIT_BACKEND ('memory', 'sqlite' or 'redis')"""
+    if kind == 'memory':
+        return MemoryBucketStore()
+    if kind == 'sqlite':
+        return SQLiteBucketStore(os.environ.get('RATE_LIMIT_SQLITE_PATH', os.path.join(
+            os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'instance', 'rate_limits.db'
+        )))
+    if kind == 'redis':
+        return RedisBucketStore(os.environ.get('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0'))
+    raise ValueError(f'Unknown RATE_LIMIT_BACKEND: {kind}')
+
+
+class RateLimiter:
+    """
+    Admission control for the expensive endpoints (ROUTE_CLASSES).
+
+    Requests are rate limited with token buckets per client IP and per user
+    of each route class (429), and shed while their class is over its
+    latency SLO with too many requests already in flight in this process
+    (503). Both answers come with Retry-After. If the bucket store fails,
+    requests are let through for STORE_RETRY_SECONDS.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.store = None
+        self.limits = {}
+        self.shedding = {}
+        self.proxy_count = 0
+        self._lock = threading.Lock()
+        self._inflight = Counter()
+        # Route class -> moving average latency in seconds
+        self._latency = {}
+        self._counts = Counter()
+        self._store_down_until = 0.0
+
+    def init_app(self, app):
+        self.enabled = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+        # Proxies in front of the app that append to X-Forwarded-For (e.g. 1 on Render or Heroku)
+        self.proxy_count = int(os.environ.get('RATE_LIMIT_PROXY_COUNT', '0'))
+        self.limits = {
+            route_class: {
+                scope: parse_limit(os.environ.get(f'RATE_LIMIT_{route_class.upper()}_{scope.upper()}', default))
+                for scope, default in scopes.items()
+            }
+            for route_class, scopes in DEFAULT_LIMITS.items()
+        }
+        self.shedding = {
+            route_class: (
+                float(os.environ.get(f'RATE_LIMIT_{route_class.upper()}_SLO_MS', slo_ms)) / 1000,
+                int(os.environ.get(f'RATE_LIMIT_{route_class.upper()}_MAX_INFLIGHT', max_inflight))
+            )
+            for route_class, (slo_ms, max_inflight) in DEFAULT_SHEDDING.items()
+        }
+        self.store = create_bucket_store(os.environ.get('RATE_LIMIT_BACKEND', 'memory'))
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def client_ip(self):
+        """The client's address, from X-Forwarded-For as seen by the last RATE_LIMIT_PROXY_COUNT proxies"""
+        if self.proxy_count:
+            forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+            if len(forwarded) >= self.proxy_count:
+                return forwarded[-self.proxy_count]
+        return request.remote_addr
+
+    def _user_key(self, route_class):
+        if current_user.is_authenticated:
+            return f'id:{current_user.id}'
+        if route_class == 'login':
+            # Attempts against one account, whichever addresses they come from
+            data = request.get_json(silent=True)
+            email = data.get('email') if isinstance(data, dict) else None
+            if isinstance(email, str) and email.strip():
+                return 'email:' + hashlib.sha1(email.strip().lower().encode('utf-8')).hexdigest()[:20]
+        return None
+
+    def _shed_retry_after(self, route_class):
+        """Seconds to suggest if the route class is over its SLO and in-flight limit, otherwise None"""
+        slo, max_inflight = self.shedding[route_class]
+        if not slo or not max_inflight:
+            return None
+        with self._lock:
+            latency = self._latency.get(route_class, 0.0)
+            if self._inflight[route_class] >= max_inflight and latency > slo:
+                return latency
+        return None
+
+    def _refuse(self, route_class, reason, status, retry_after, message):
+        retry_after = max(1, math.ceil(retry_after))
+        RATE_LIMITED.inc(route_class=route_class, reason=reason)
+        with self._lock:
+            self._counts['shed' if status == 503 else 'limited'] += 1
+        log_event(
+            logger, logging.INFO, 'request_refused', sample_rate=0.1,
+            route_class=route_class, reason=reason, status=status, endpoint=request.endpoint, ip=self.client_ip()
+        )
+        response = jsonify({'error': message, 'retry_after': retry_after})
+        response.status_code = status
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    def _before_request(self):
+        route_class = ROUTE_CLASSES.get(request.endpoint)
+        if not self.enabled or route_class is None or request.method == 'OPTIONS':
+            return None
+
+        # Shedding comes first, so refused requests don't use up the client's tokens
+        retry_after = self._shed_retry_after(route_class)
+        if retry_after is not None:
+            return self._refuse(route_class, 'shed', 503, retry_after, 'The server is busy, please try again shortly')
+
+        now = time.time()
+        if now < self._store_down_until:
+            identities = ()
+        else:
+            identities = (('ip', self.client_ip()), ('user', self._user_key(route_class)))
+        for scope, identity in identities:
+            limit = self.limits[route_class].get(scope)
+            if limit is None or identity is None:
+                continue
+            capacity, rate = limit
+            try:
+                allowed, tokens = self.store.take(f'{route_class}:{scope}:{identity}', capacity, rate, now)
+            except Exception as e:
+                # Better to serve without limits than not at all
+                with self._lock:
+                    self._counts['backend_errors'] += 1
+                self._store_down_until = now + STORE_RETRY_SECONDS
+                log_event(logger, logging.WARNING, 'rate_limit_backend_failed', backend=self.store.kind, error=str(e))
+                break
+            if not allowed:
+                return self._refuse(route_class, scope, 429, (1 - tokens) / rate, 'Too many requests, please try again later')
+
+        g._rate_limit = (route_class, time.perf_counter())
+        with self._lock:
+            self._inflight[route_class] += 1
+        return None
+
+    def _teardown_request(self, error=None):
+        admitted = g.pop('_rate_limit', None)
+        if admitted is None:
+            return
+        route_class, started = admitted
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._inflight[route_class] -= 1
+            average = self._latency.get(route_class)
+            self._latency[route_class] = elapsed if average is None else average + LATENCY_EWMA_WEIGHT * (elapsed - average)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'enabled': self.enabled,
+                'backend': self.store.kind if self.store is not None else None,
+                'limited': self._counts['limited'],
+                'shed': self._counts['shed'],
+                'backend_errors': self._counts['backend_errors']
+            }
+            for route_class in DEFAULT_SHEDDING:
+                stats[f'inflight_{route_class}'] = self._inflight[route_class]
+                stats[f'latency_ms_{route_class}'] = round(self._latency.get(route_class, 0.0) * 1000, 1)
+            return stats
+
+
+rate_limiter = RateLimiter()
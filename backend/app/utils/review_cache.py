@@ -0,0 +1,112 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def attempt_fingerprint(attempt):
+    """
+    Hash of everything a graded review of `attempt` depends on besides the
+    quiz: its status, score and stored answers. A resubmission changes it,
+    so a review cached by another worker is never served stale.
+    """
+    digest = hashlib.sha1(f'{attempt.status}:{attempt.score}:{attempt.total_questions}:'.encode('utf-8'))
+    if attempt.answers_packed is not None:
+        digest.update(b'packed:' + bytes(attempt.answers_packed))
+    elif attempt.user_answers:
+        digest.update(b'json:' + attempt.user_answers.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class _Review:
+    __slots__ = ('subject', 'quiz_name', 'quiz_version', 'fingerprint', 'body', 'etag', 'created_at')
+
+    def __init__(self, subject, quiz_name, quiz_version, fingerprint, body):
+        self.subject = subject
+        self.quiz_name = quiz_name
+        self.quiz_version = quiz_version
+        self.fingerprint = fingerprint
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self.created_at = time.monotonic()
+
+
+class ReviewCache:
+    """
+    In-memory LRU of graded attempt reviews (the serialized JSON body),
+    keyed by attempt id.
+
+    An entry is only served for the quiz version it was graded against and
+    the attempt state it was built from (attempt_fingerprint), so a changed
+    quiz or a resubmitted attempt reads as a miss and gets regraded. Entries
+    expire after `ttl` seconds and the least recently used are evicted
+    beyond `max_entries`.
+    """
+
+    def __init__(self, ttl=3600, max_entries=2048):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, attempt, quiz_version):
+        """Return the cached review (.body, .etag) of `attempt` graded against `quiz_version`, or None"""
+        with self._lock:
+            entry = self._entries.get(attempt.id)
+            if entry is not None and (
+                    entry.quiz_version != quiz_version
+                    or time.monotonic() - entry.created_at > self.ttl
+                    or entry.fingerprint != attempt_fingerprint(attempt)):
+                del self._entries[attempt.id]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(attempt.id)
+            self.hits += 1
+            return entry
+
+    def put(self, attempt, quiz_version, body):
+        """Cache the review body (str or bytes) of `attempt` and return the entry"""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        entry = _Review(attempt.subject, attempt.quiz_name, quiz_version, attempt_fingerprint(attempt), body)
+        with self._lock:
+            self._entries[attempt.id] = entry
+            self._entries.move_to_end(attempt.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, subject=None, quiz_name=None):
+        """Drop the reviews of a single quiz, of every quiz of a subject, or all of them"""
+        with self._lock:
+            if subject is None:
+                self._entries.clear()
+                return
+
+            for attempt_id in [
+                    attempt_id for attempt_id, entry in self._entries.items()
+                    if entry.subject == subject and (quiz_name is None or entry.quiz_name == quiz_name)]:
+                del self._entries[attempt_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+review_cache = ReviewCache(
+    ttl=float(os.environ.get('REVIEW_CACHE_TTL', '3600')),
+    max_entries=int(os.environ.get('REVIEW_CACHE_MAX_ENTRIES', '2048'))
+)
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.setting import Setting
+from app.utils.log import log_event
+
+logger = logging.getLogger(__name__)
+
+
+class SettingChanged(Exception):
+    """Raised when a setting was changed by someone else since the version a write expected"""
+
+
+class SettingsStore:
+    """
+    Application settings kept in the settings table as JSON, read through
+    an in-process cache shared by every thread of a worker.
+
+    A read is a dict lookup. At most once every `check_interval` seconds one
+    reader compares the cached versions with the table (a single query over
+    its few rows) and reloads the settings that changed, so a write made in
+    another worker is seen within that interval. The other threads keep
+    reading the cached values meanwhile. Values are shared, so callers must
+    not modify them.
+    """
+
+    def __init__(self, check_interval=2.0):
+        self.check_interval = check_interval
+        # key -> (version, value); replaced as a whole, never modified in place
+        self._values = {}
+        self._checked_at = None
+        self._check_lock = threading.Lock()
+        self.checks = 0
+        self.reloads = 0
+        self.errors = 0
+
+    def init_app(self, app):
+        self.check_interval = float(os.environ.get('SETTINGS_CHECK_INTERVAL', self.check_interval))
+
+    def get(self, key, default=None, fresh=False):
+        """
+        The value of a setting, or `default` if it was never set. With `fresh`
+        the versions are checked first (for read-modify-write updates).
+        """
+        return self.get_versioned(key, default, fresh)[1]
+
+    def get_versioned(self, key, default=None, fresh=False):
+        """(version, value) of a setting, (0, default) if it was never set; see get"""
+        if fresh:
+            self._refresh(wait=True)
+        elif self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self._refresh()
+        return self._values.get(key, (0, default))
+
+    def set(self, key, value, expected_version=None):
+        """
+        Store a setting and bump its version, in a transaction of its own.
+
+        With `expected_version` (as returned by get_versioned) the write is a
+        compare-and-set: it raises SettingChanged if the setting's version
+        isn't that one anymore, so a read-modify-write doesn't overwrite a
+        concurrent one.
+        """
+        data = json.dumps(value)
+        for attempt in range(2):
+            try:
+                with db.engine.begin() as connection:
+                    if expected_version == 0:
+                        # Never set - an insert, which fails if another request inserted it first
+                        updated = 0
+                    else:
+                        conditions = [Setting.key == key]
+                        if expected_version is not None:
+                            conditions.append(Setting.version == expected_version)
+                        updated = connection.execute(
+                            db.update(Setting.__table__)
+                            .where(*conditions)
+                            .values(value=data, version=Setting.version + 1, updated_at=datetime.utcnow())
+                        ).rowcount
+                        if not updated and expected_version is not None:
+                            raise SettingChanged(f'Setting {key} was changed by another request')
+                    if not updated:
+                        connection.execute(db.insert(Setting.__table__).values(
+                            key=key, value=data, version=1, updated_at=datetime.utcnow()
+                        ))
+                break
+            except IntegrityError:
+                if expected_version is not None:
+                    self._refresh(wait=True)
+                    raise SettingChanged(f'Setting {key} was changed by another request')
+                # Another worker inserted the setting first - update it instead
+                if attempt:
+                    raise
+            except SettingChanged:
+                self._refresh(wait=True)
+                raise
+        # This worker sees its own write right away
+        self._refresh(wait=True)
+
+    def _refresh(self, wait=False):
+        # Until the first load every reader waits for it; after that only one thread checks at a time
+        if not self._check_lock.acquire(blocking=wait or self._checked_at is None):
+            return
+        try:
+            if not wait and self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return
+
+            with db.engine.connect() as connection:
+                versions = dict(connection.execute(db.select(Setting.key, Setting.version)).all())
+                changed = [key for key, version in versions.items()
+                           if key not in self._values or self._values[key][0] != version]
+                values = {key: entry for key, entry in self._values.items() if key in versions}
+                if changed:
+                    for key, version, value in connection.execute(
+                            db.select(Setting.key, Setting.version, Setting.value).where(Setting.key.in_(changed))):
+                        values[key] = (version, json.loads(value))
+
+            self._values = values
+            self.checks += 1
+            self.reloads += len(changed)
+        except Exception as e:
+            # Keep serving the cached values (or the defaults) and try again after the interval
+            self.errors += 1
+            log_event(logger, logging.WARNING, 'settings_check_failed', error=str(e))
+        finally:
+            self._checked_at = time.monotonic()
+            self._check_lock.release()
+
+    def stats(self):
+        return {
+            'entries': len(self._values),
+            'check_interval': self.check_interval,
+            'checks': self.checks,
+            'reloads': self.reloads,
+            'errors': self.errors
+        }
+
+
+settings_store = SettingsStore()
@@ -0,0 +1,104 @@
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from app import db
+from app.models.user import User
+from app.utils.identity_cache import identity_cache
+
+# Tries of set_tokens before it gives up on a balance that keeps changing
+SET_TOKENS_ATTEMPTS = 5
+
+
+class BalanceChanged(Exception):
+    """Raised by set_tokens when concurrent debits or credits kept changing the balance"""
+
+
+def _synced(session, user_id, balance):
+    # Cached copies of the user go stale once this transaction commits
+    identity_cache.invalidate_on_commit(session, user_id)
+
+    # Keep an already loaded User (e.g. current_user) in sync without marking it dirty
+    user = session.identity_map.get(identity_key(User, user_id))
+    if user is not None:
+        set_committed_value(user, 'tokens', balance)
+
+
+def _apply(user_id, delta, minimum=None):
+    """
+    Add `delta` to a user's balance with a single conditional UPDATE.
+
+    When `minimum` is given the update only happens if the balance is at
+    least that much. Returns the new balance, or None if no row matched.
+    Does not commit - the change is part of the caller's transaction.
+    """
+    stmt = db.update(User).where(User.id == user_id)
+    if minimum is not None:
+        stmt = stmt.where(User.tokens >= minimum)
+    stmt = stmt.values(tokens=db.func.coalesce(User.tokens, 0) + delta).execution_options(synchronize_session=False)
+
+    session = db.session()
+    if session.get_bind().dialect.update_returning:
+        row = session.execute(stmt.returning(User.tokens)).first()
+        balance = row[0] if row is not None else None
+    else:
+        # No UPDATE ... RETURNING (e.g. MySQL) - read the balance back in the same transaction
+        if session.execute(stmt).rowcount != 1:
+            return None
+        balance = session.execute(db.select(User.tokens).where(User.id == user_id)).scalar()
+
+    if balance is not None:
+        _synced(session, user_id, balance)
+
+    return balance
+
+
+def debit_tokens(user_id, amount=1):
+    """
+    Take `amount` tokens from a user if their balance allows it.
+
+    Returns the new balance, or None if the user doesn't have enough tokens.
+    The caller commits, so the debit lands in the same transaction as
+    whatever it pays for (a quiz attempt, an AI generation job, ...).
+    """
+    if amount < 0:
+        raise ValueError('Debit amount cannot be negative')
+    return _apply(user_id, -amount, minimum=amount)
+
+
+def credit_tokens(user_id, amount):
+    """Give `amount` tokens to a user; returns the new balance. The caller commits."""
+    if amount < 0:
+        raise ValueError('Credit amount cannot be negative')
+    return _apply(user_id, amount)
+
+
+def set_tokens(user_id, tokens):
+    """
+    Set a user's balance to `tokens` (admin adjustments).
+
+    The UPDATE is conditional on the balance read just before it, so the
+    returned balance is the one actually replaced and a debit or credit
+    committed in between is never lost; the update is retried against the
+    new balance instead. Returns the replaced balance, or None if the user
+    doesn't exist. Raises BalanceChanged if the balance kept changing.
+    The caller commits.
+    """
+    if tokens < 0:
+        raise ValueError('Balance cannot be negative')
+
+    session = db.session()
+    balance_column = db.func.coalesce(User.tokens, 0)
+    for _ in range(SET_TOKENS_ATTEMPTS):
+        old_balance = session.execute(db.select(balance_column).where(User.id == user_id)).scalar()
+        if old_balance is None:
+            return None
+
+        stmt = (db.update(User)
+                .where(User.id == user_id, balance_column == old_balance)
+                .values(tokens=tokens)
+                .execution_options(synchronize_session=False))
+        if session.execute(stmt).rowcount == 1:
+            _synced(session, user_id, tokens)
+            return old_balance
+
+    raise BalanceChanged(f'Balance of user {user_id} changed during the update')
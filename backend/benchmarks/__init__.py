@@ -0,0 +1,11 @@
+"""
+Benchmarks for the quiz backend.
+
+    python -m benchmarks.datagen     # fill a database with a synthetic dataset
+    python -m benchmarks.loadtest    # run user journeys against the app, report latencies as JSON
+    python -m benchmarks.compare     # compare two loadtest reports
+    python -m benchmarks.startup     # time import, app creation and first request of a fresh process
+    python -m benchmarks.answers     # compare JSON and packed storage of quiz answers
+
+Run them from the backend directory; see the README for examples.
+"""
@@ -0,0 +1,127 @@
+"""
+Compare stored quiz answers as JSON text against packed option indexes:
+bytes per attempt, and encode / decode time.
+
+Runs on synthetic attempts (no database needed). With --database the
+answers columns of the configured database are measured as well.
+
+Usage:
+    python -m benchmarks.answers [--attempts N] [--questions N] [--options N] [--option-length N]
+                                 [--seed N] [--database] [--output FILE]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.answer_codec import pack_answers, unpack_answers, options_digest
+
+
+def synthetic_attempts(attempts, questions, options, option_length, seed):
+    """(option_lists, [answers]) for one quiz and `attempts` answer lists, some questions left unanswered"""
+    rng = random.Random(seed)
+    option_lists = [
+        tuple(f'{q}.{k} ' + ''.join(rng.choice('abcdefghij ') for _ in range(option_length)) for k in range(options))
+        for q in range(questions)
+    ]
+    answer_lists = [
+        [rng.choice(opts) if rng.random() < 0.95 else '' for opts in option_lists]
+        for _ in range(attempts)
+    ]
+    return option_lists, answer_lists
+
+
+def _timed(fn, items):
+    started = time.perf_counter()
+    results = [fn(item) for item in items]
+    return results, time.perf_counter() - started
+
+
+def measure_synthetic(attempts, questions, options, option_length, seed):
+    option_lists, answer_lists = synthetic_attempts(attempts, questions, options, option_length, seed)
+
+    json_rows, json_encode = _timed(json.dumps, answer_lists)
+    # Computed once per quiz, as CompiledQuiz does
+    digest = options_digest(option_lists)
+    packed_rows, packed_encode = _timed(lambda answers: pack_answers(answers, option_lists, digest), answer_lists)
+    decoded_json, json_decode = _timed(json.loads, json_rows)
+    decoded_packed, packed_decode = _timed(lambda blob: unpack_answers(blob, option_lists, digest), packed_rows)
+    if decoded_packed != decoded_json:
+        raise AssertionError('Packed answers did not decode to the original answers')
+
+    json_bytes = sum(len(row.encode('utf-8')) for row in json_rows)
+    packed_bytes = sum(len(row) for row in packed_rows)
+    per_attempt_us = lambda seconds: round(seconds / attempts * 1e6, 3)
+    return {
+        'attempts': attempts,
+        'questions': questions,
+        'options': options,
+        'option_length': option_length,
+        'json': {
+            'bytes_per_attempt': round(json_bytes / attempts, 1),
+            'encode_us': per_attempt_us(json_encode),
+            'decode_us': per_attempt_us(json_decode)
+        },
+        'packed': {
+            'bytes_per_attempt': round(packed_bytes / attempts, 1),
+            'encode_us': per_attempt_us(packed_encode),
+            'decode_us': per_attempt_us(packed_decode)
+        },
+        'size_ratio': round(packed_bytes / json_bytes, 4)
+    }
+
+
+def measure_database():
+    """Row counts and total bytes of both answer columns in the configured database"""
+    from app import create_app, db
+    from app.models.quiz_attempt import QuizAttempt
+
+    app = create_app()
+    with app.app_context():
+        result = {}
+        for name, column in (('json', QuizAttempt.user_answers), ('packed', QuizAttempt.answers_packed)):
+            rows, total = db.session.execute(
+                db.select(db.func.count(column), db.func.coalesce(db.func.sum(db.func.length(column)), 0))
+            ).one()
+            result[name] = {
+                'attempts': rows,
+                'bytes': int(total),
+                'bytes_per_attempt': round(int(total) / rows, 1) if rows else None
+            }
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON and packed storage of quiz answers')
+    parser.add_argument('--attempts', type=int, default=20000)
+    parser.add_argument('--questions', type=int, default=20, help='Questions per attempt')
+    parser.add_argument('--options', type=int, default=4, help='Options per question')
+    parser.add_argument('--option-length', type=int, default=40, help='Characters per option text')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', action='store_true', help='Also measure the configured database')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    if args.attempts < 1 or args.questions < 1 or not 1 <= args.options <= 128:
+        parser.error('--attempts and --questions must be at least 1, --options between 1 and 128')
+
+    report = {'synthetic': measure_synthetic(args.attempts, args.questions, args.options, args.option_length, args.seed)}
+    if args.database:
+        report['database'] = measure_database()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Report written to {args.output}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Compare two benchmarks.loadtest reports, e.g. from two commits.
+
+Prints the change of every step's p50 / p95 / p99 latency and of the
+throughput, and exits with status 1 if any p95 got slower by more than
+--threshold percent (or the throughput dropped by more than that).
+
+Usage:
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 10]
+"""
+import sys
+import json
+import argparse
+
+PERCENTILES = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def _format_change(change):
+    return '     n/a' if change is None else f'{change:+7.1f}%'
+
+
+def compare(baseline, candidate, threshold):
+    """Print the comparison; returns the list of regressions"""
+    regressions = []
+    print(f"baseline  {baseline.get('commit') or '?'}  {baseline['throughput_rps']} req/s")
+    print(f"candidate {candidate.get('commit') or '?'}  {candidate['throughput_rps']} req/s")
+    print()
+    print(f"{'step':<20}" + ''.join(f'{p[:3]:>24}' for p in PERCENTILES))
+
+    rows = [('overall', baseline['overall'], candidate['overall'])]
+    for step in sorted(set(baseline['steps']) | set(candidate['steps'])):
+        rows.append((step, baseline['steps'].get(step, {}), candidate['steps'].get(step, {})))
+
+    for step, old, new in rows:
+        cells = []
+        for p in PERCENTILES:
+            change = _change(old.get(p), new.get(p))
+            cells.append(f"{old.get(p)!s:>8} -> {new.get(p)!s:>8} {_format_change(change)}")
+            if p == 'p95_ms' and change is not None and change > threshold:
+                regressions.append(f'{step} p95 {change:+.1f}%')
+        print(f'{step:<20}' + ''.join(f'{cell:>24}' for cell in cells))
+
+    throughput = _change(baseline['throughput_rps'], candidate['throughput_rps'])
+    print()
+    print(f'throughput {_format_change(throughput)}')
+    if throughput is not None and throughput < -threshold:
+        regressions.append(f'throughput {throughput:+.1f}%')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two load test reports')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10, help='Allowed slowdown in percent')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    regressions = compare(baseline, candidate, args.threshold)
+    if regressions:
+        print('\nRegressions: ' + ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
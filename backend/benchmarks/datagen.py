@@ -0,0 +1,210 @@
+"""
+Fill the database with a reproducible synthetic dataset for benchmarks.
+
+Users are named bench_user_<n> (bench_user_0 is an admin) and all share
+the password given with --password. Quizzes go into the question bank, so
+run the app with QUIZ_STORAGE=sql against the generated database. Rows are
+written with bulk INSERTs in chunks, so large datasets (e.g. 1M users, 50M
+attempts) stream through without being held in memory.
+
+Usage:
+    python -m benchmarks.datagen [--users N] [--attempts N] [--quizzes N] [--subjects N]
+                                 [--questions N] [--seed N] [--chunk-size N] [--stats]
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models.user import User
+from app.models.quiz_attempt import QuizAttempt
+from app.models.question_bank import BankQuiz, BankQuestion
+from app.utils.answer_codec import pack_answers
+from app.utils.password_hasher import password_hasher
+
+USERNAME_PREFIX = 'bench_user_'
+DIFFICULTIES = ('easy', 'medium', 'hard')
+OPTIONS_PER_QUESTION = 4
+
+
+def user_email(n):
+    return f'{USERNAME_PREFIX}{n}@bench.local'
+
+
+def quiz_names(quizzes, subjects):
+    """[(subject, quiz_name)] of the generated quizzes, spread round-robin over the subjects"""
+    return [(f'subject_{i % subjects}', f'quiz_{i}') for i in range(quizzes)]
+
+
+def _questions(rng, quiz_index, count):
+    questions = []
+    for position in range(count):
+        options = [f'Option {k} of question {position}' for k in range(OPTIONS_PER_QUESTION)]
+        questions.append({
+            'question': f'Synthetic question {position} of quiz {quiz_index}?',
+            'options': options,
+            'correct_answer': rng.choice(options),
+            'explanation': f'Explanation of question {position}.',
+            'difficulty': rng.choice(DIFFICULTIES)
+        })
+    return questions
+
+
+def _insert_chunks(model, rows, chunk_size, label, total):
+    """Bulk insert an iterable of row dicts, committing every chunk_size rows"""
+    chunk = []
+    done = 0
+    started = time.monotonic()
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            db.session.execute(db.insert(model), chunk)
+            db.session.commit()
+            done += len(chunk)
+            chunk = []
+            print(f'\r{label}: {done}/{total} ({done / max(time.monotonic() - started, 1e-9):.0f} rows/s)', end='')
+    if chunk:
+        db.session.execute(db.insert(model), chunk)
+        db.session.commit()
+        done += len(chunk)
+    print(f'\r{label}: {done}/{total} in {time.monotonic() - started:.1f}s' + ' ' * 20)
+
+
+def _next_id(model):
+    return (db.session.execute(db.select(db.func.max(model.id))).scalar() or 0) + 1
+
+
+def generate(users=1000, attempts=20000, quizzes=100, subjects=10, questions=10,
+             password='benchmark', seed=42, chunk_size=10000):
+    """
+    Generate the dataset in the current app context. The same arguments
+    always produce the same rows (dates are relative to the current time).
+    Returns a summary dict.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    if User.query.filter_by(email=user_email(0)).first() is not None:
+        raise ValueError('A benchmark dataset already exists in this database')
+
+    # Quizzes (question bank)
+    names = quiz_names(quizzes, subjects)
+    answer_keys = []
+    option_lists = []
+    first_quiz_id = _next_id(BankQuiz)
+    quiz_rows = []
+    question_rows = []
+    for i, (subject, quiz_name) in enumerate(names):
+        quiz_questions = _questions(rng, i, questions)
+        answer_keys.append([q['correct_answer'] for q in quiz_questions])
+        option_lists.append([tuple(q['options']) for q in quiz_questions])
+        quiz_rows.append({
+            'id': first_quiz_id + i,
+            'subject': subject,
+            'name': quiz_name,
+            'difficulty': rng.choice(DIFFICULTIES),
+            'question_count': len(quiz_questions),
+            'version': hashlib.sha1(json.dumps(quiz_questions, sort_keys=True).encode('utf-8')).hexdigest()[:16],
+            'created_at': now,
+            'updated_at': now
+        })
+        question_rows.extend({
+            'quiz_id': first_quiz_id + i,
+            'position': position,
+            'difficulty': question['difficulty'],
+            'data': json.dumps(question)
+        } for position, question in enumerate(quiz_questions))
+    _insert_chunks(BankQuiz, quiz_rows, chunk_size, 'quizzes', len(quiz_rows))
+    _insert_chunks(BankQuestion, question_rows, chunk_size, 'questions', len(question_rows))
+
+    # Users - hashing is expensive, so every user shares one hash
+    password_hash = password_hasher.hash(password)
+    first_user_id = _next_id(User)
+
+    def user_rows():
+        for n in range(users):
+            yield {
+                'id': first_user_id + n,
+                'username': f'{USERNAME_PREFIX}{n}',
+                'email': user_email(n),
+                'password_hash': password_hash,
+                'tokens': 1000000 if n == 0 else rng.randint(50, 500),
+                'role': 'admin' if n == 0 else 'user',
+                'created_at': now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+                'session_version': 0
+            }
+
+    _insert_chunks(User, user_rows(), chunk_size, 'users', users)
+
+    # Submitted attempts, graded against the generated answer keys
+    def attempt_rows():
+        for _ in range(attempts):
+            quiz_index = rng.randrange(quizzes)
+            answer_key = answer_keys[quiz_index]
+            answers = [
+                correct if rng.random() < 0.6 else f'Option {rng.randrange(OPTIONS_PER_QUESTION)} of question {position}'
+                for position, correct in enumerate(answer_key)
+            ]
+            subject, quiz_name = names[quiz_index]
+            # Stored the way submit_quiz stores them, as packed option indexes
+            yield {
+                'user_id': first_user_id + rng.randrange(users),
+                'subject': subject,
+                'quiz_name': quiz_name,
+                'score': sum(1 for given, correct in zip(answers, answer_key) if given == correct),
+                'total_questions': len(answer_key),
+                'attempt_date': now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+                'answers_packed': pack_answers(answers, option_lists[quiz_index]),
+                'status': QuizAttempt.SUBMITTED
+            }
+
+    _insert_chunks(QuizAttempt, attempt_rows(), chunk_size, 'attempts', attempts)
+
+    return {'users': users, 'quizzes': quizzes, 'questions': len(question_rows), 'attempts': attempts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic benchmark dataset')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--attempts', type=int, default=20000)
+    parser.add_argument('--quizzes', type=int, default=100)
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--questions', type=int, default=10, help='Questions per quiz')
+    parser.add_argument('--password', default='benchmark', help='Password of every generated user')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per INSERT / commit')
+    parser.add_argument('--stats', action='store_true', help='Rebuild the quiz / user statistics afterwards')
+    args = parser.parse_args()
+
+    if args.users < 1 or args.quizzes < 1 or args.subjects < 1 or args.questions < 1:
+        parser.error('--users, --quizzes, --subjects and --questions must be at least 1')
+
+    app = create_app()
+    with app.app_context():
+        try:
+            summary = generate(
+                users=args.users, attempts=args.attempts, quizzes=args.quizzes, subjects=args.subjects,
+                questions=args.questions, password=args.password, seed=args.seed, chunk_size=args.chunk_size
+            )
+        except ValueError as e:
+            print(f'Error: {e}')
+            return 1
+
+        if args.stats:
+            from app.utils.quiz_stats import rebuild_stats
+            from app.utils.quiz_storage import SQLQuizStorage
+            print(f'Statistics rebuilt from {rebuild_stats(SQLQuizStorage())} attempts')
+
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Drive the app with concurrent scripted user journeys and report latencies as JSON.
+
+A user journey is login -> list subjects -> list quizzes -> take a quiz ->
+submit it -> attempt history; an admin journey is login -> user directory
+(two pages) -> quiz statistics -> a user's details. Every virtual user
+runs journeys, picked by --mix, until --duration runs out (or --iterations
+journeys are done). Without --url the app is created in this process and
+driven through its WSGI interface, so the numbers leave out the network
+and the web server; with --url a running server is load-tested over HTTP.
+
+Log in as the users made by benchmarks.datagen (run the app with
+QUIZ_STORAGE=sql against the same database).
+
+Usage:
+    python -m benchmarks.loadtest [--url URL] [--concurrency N] [--duration SECONDS | --iterations N]
+                                  [--mix user=9,admin=1] [--users N] [--seed N] [--output FILE]
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.datagen import user_email
+
+JOURNEYS = ('user', 'admin')
+
+
+class AppClient:
+    """Calls the app in-process through Flask's test client (one cookie jar per virtual user)"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self._client.open(path, method=method, json=body)
+        try:
+            # Read the whole body, so streamed responses are timed to the end
+            data = response.get_data()
+            return response.status_code, json.loads(data) if data else None
+        except ValueError:
+            return response.status_code, None
+        finally:
+            response.close()
+
+
+class HTTPClient:
+    """Calls a running server over HTTP (one session, so one cookie jar, per virtual user)"""
+
+    def __init__(self, base_url):
+        import requests
+        self._base_url = base_url.rstrip('/')
+        self._session = requests.Session()
+
+    def request(self, method, path, body=None):
+        response = self._session.request(method, self._base_url + path, json=body, timeout=60)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+
+class JourneyFailed(Exception):
+    """A step failed; the rest of the journey is skipped"""
+
+
+class Recorder:
+    """Thread-safe latency samples and error counts per step"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.journeys = {}
+
+    def call(self, client, step, method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, data = client.request(method, path, body)
+        except Exception:
+            status, data = None, None
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.samples.setdefault(step, []).append(elapsed)
+            if status is None or status >= 400:
+                errors = self.errors.setdefault(step, {})
+                errors[str(status)] = errors.get(str(status), 0) + 1
+        if status is None or status >= 400:
+            raise JourneyFailed(step)
+        return data
+
+    def journey_done(self, name, ok):
+        with self._lock:
+            counts = self.journeys.setdefault(name, {'completed': 0, 'failed': 0})
+            counts['completed' if ok else 'failed'] += 1
+
+
+def _login(client, recorder, email, password):
+    recorder.call(client, 'login', 'POST', '/api/auth/login', {'email': email, 'password': password})
+
+
+def user_journey(client, recorder, rng, options):
+    _login(client, recorder, user_email(rng.randrange(1, options.users)), options.password)
+
+    subjects = recorder.call(client, 'list_subjects', 'GET', '/api/quizzes/')['subjects']
+    if not subjects:
+        raise JourneyFailed('list_subjects')
+    subject = rng.choice(subjects)
+
+    quizzes = recorder.call(client, 'list_quizzes', 'GET', f'/api/quizzes/{subject}')['quizzes']
+    if not quizzes:
+        raise JourneyFailed('list_quizzes')
+    quiz_name = rng.choice(quizzes)
+
+    quiz = recorder.call(client, 'take_quiz', 'GET', f'/api/quizzes/{subject}/{quiz_name}')
+    answers = [rng.choice(question.get('options') or ['']) for question in quiz['questions']]
+    recorder.call(client, 'submit_quiz', 'POST', f'/api/quizzes/{subject}/{quiz_name}/submit', {
+        'answers': answers,
+        'attempt_id': quiz['attempt_id']
+    })
+
+    recorder.call(client, 'attempt_history', 'GET', '/api/quizzes/attempts?limit=20')
+
+
+def admin_journey(client, recorder, rng, options):
+    _login(client, recorder, user_email(0), options.password)
+
+    page = recorder.call(client, 'admin_users', 'GET', '/api/admin/users?limit=50&sort=created_at&order=desc')
+    if page.get('next_cursor'):
+        recorder.call(client, 'admin_users', 'GET',
+                      f"/api/admin/users?limit=50&sort=created_at&order=desc&cursor={page['next_cursor']}")
+
+    subjects = recorder.call(client, 'list_subjects', 'GET', '/api/quizzes/')['subjects']
+    if subjects:
+        subject = rng.choice(subjects)
+        quizzes = recorder.call(client, 'list_quizzes', 'GET', f'/api/quizzes/{subject}')['quizzes']
+        if quizzes:
+            recorder.call(client, 'admin_quiz_stats', 'GET', f'/api/admin/stats/quizzes/{subject}/{rng.choice(quizzes)}')
+
+    if page.get('users'):
+        recorder.call(client, 'admin_user', 'GET', f"/api/admin/users/{rng.choice(page['users'])['id']}")
+
+
+def _parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in JOURNEYS:
+            raise ValueError(f'Unknown journey: {name}')
+        weights[name] = float(weight or 1)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError('--mix needs at least one journey with a positive weight')
+    return weights
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values):
+    values = sorted(values)
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    return {
+        'count': len(values),
+        'mean_ms': ms(sum(values) / len(values)) if values else None,
+        'p50_ms': ms(percentile(values, 0.50)),
+        'p95_ms': ms(percentile(values, 0.95)),
+        'p99_ms': ms(percentile(values, 0.99)),
+        'max_ms': ms(values[-1]) if values else None
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(make_client, options):
+    """Run the load test and return the report dict"""
+    weights = _parse_mix(options.mix)
+    names = list(weights)
+    recorder = Recorder()
+    deadline = time.perf_counter() + options.duration if options.duration else None
+
+    def virtual_user(index):
+        rng = random.Random(options.seed * 1000003 + index)
+        client = make_client()
+        done = 0
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if options.iterations and done >= options.iterations:
+                break
+            name = rng.choices(names, weights=[weights[n] for n in names])[0]
+            journey = user_journey if name == 'user' else admin_journey
+            try:
+                journey(client, recorder, rng, options)
+                recorder.journey_done(name, True)
+            except (JourneyFailed, KeyError, TypeError):
+                recorder.journey_done(name, False)
+            done += 1
+
+    threads = [threading.Thread(target=virtual_user, args=(i,), daemon=True) for i in range(options.concurrency)]
+    started_at = datetime.utcnow().isoformat() + 'Z'
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_samples = [value for values in recorder.samples.values() for value in values]
+    total_errors = sum(count for errors in recorder.errors.values() for count in errors.values())
+    return {
+        'commit': _git_commit(),
+        'started_at': started_at,
+        'python': platform.python_version(),
+        'config': {
+            'target': options.url or 'in-process',
+            'concurrency': options.concurrency,
+            'duration': options.duration,
+            'iterations': options.iterations,
+            'mix': weights,
+            'users': options.users,
+            'seed': options.seed
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'requests': len(all_samples),
+        'errors': total_errors,
+        'throughput_rps': round(len(all_samples) / elapsed, 2) if elapsed else None,
+        'journeys': recorder.journeys,
+        'overall': summarize(all_samples),
+        'steps': {
+            step: dict(summarize(values), errors=recorder.errors.get(step, {}))
+            for step, values in sorted(recorder.samples.items())
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the quiz backend with scripted user journeys')
+    parser.add_argument('--url', help='Base URL of a running server (default: drive the app in-process)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Virtual users running in parallel')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run (0 = until --iterations)')
+    parser.add_argument('--iterations', type=int, default=0, help='Journeys per virtual user (0 = no limit)')
+    parser.add_argument('--mix', default='user=9,admin=1', help='Journey weights')
+    parser.add_argument('--users', type=int, default=1000, help='Number of users made by benchmarks.datagen')
+    parser.add_argument('--password', default='benchmark')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    options = parser.parse_args()
+
+    if options.concurrency < 1 or options.users < 2:
+        parser.error('--concurrency must be at least 1 and --users at least 2')
+    if not options.duration and not options.iterations:
+        parser.error('Set --duration or --iterations')
+    try:
+        _parse_mix(options.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if options.url:
+        make_client = lambda: HTTPClient(options.url)
+    else:
+        # Every virtual user calls from the same address, so the per-IP rate limits would throttle the run
+        os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+        from app import create_app
+        app = create_app()
+        # Logins need a session key; the app may not be configured with one
+        if not app.secret_key:
+            app.secret_key = os.environ.get('SECRET_KEY', 'benchmark')
+        make_client = lambda: AppClient(app)
+
+    report = run(make_client, options)
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Report written to {options.output}: {report['requests']} requests, "
+              f"{report['throughput_rps']} req/s, p95 {report['overall']['p95_ms']} ms, {report['errors']} errors")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
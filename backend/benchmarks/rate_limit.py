@@ -0,0 +1,101 @@
+"""
+Measure the rate limiter's bucket stores: time per token take with several
+processes taking from the same buckets at once, and whether exactly a
+bucket's capacity was admitted.
+
+Usage:
+    python -m benchmarks.rate_limit [--backends memory,sqlite,redis] [--processes N] [--takes N]
+                                    [--keys N] [--output FILE]
+
+The sqlite and redis stores are configured as the app configures them
+(RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_REDIS_URL).
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import statistics
+import multiprocessing
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.rate_limit import create_bucket_store
+
+# Bucket size; refilling is slow enough not to matter during a run
+CAPACITY = 100
+RATE = 0.001
+
+
+def worker(kind, run_id, takes, keys, results):
+    """Runs in each process: take tokens round-robin from `keys` shared buckets"""
+    store = create_bucket_store(kind)
+    admitted = 0
+    timings = []
+    for i in range(takes):
+        started = time.perf_counter()
+        allowed, _ = store.take(f'bench:{run_id}:{i % keys}', CAPACITY, RATE, time.time())
+        timings.append(time.perf_counter() - started)
+        admitted += allowed
+    results.put((admitted, timings))
+
+
+def measure(kind, processes, takes, keys):
+    run_id = uuid.uuid4().hex[:8]
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=worker, args=(kind, run_id, takes, keys, results)) for _ in range(processes)]
+    started = time.perf_counter()
+    for process in workers:
+        process.start()
+    collected = [results.get() for _ in workers]
+    elapsed = time.perf_counter() - started
+    for process in workers:
+        process.join()
+
+    timings = sorted(t for _, process_timings in collected for t in process_timings)
+    us = lambda seconds: round(seconds * 1e6, 1)
+    return {
+        'takes': len(timings),
+        'admitted': sum(admitted for admitted, _ in collected),
+        # The memory store is per process, so each process admits a full bucket
+        'expected_admitted': min(takes * processes, keys * CAPACITY * (processes if kind == 'memory' else 1)),
+        'takes_per_second': round(len(timings) / elapsed),
+        'take_us': {
+            'p50': us(statistics.median(timings)),
+            'p99': us(timings[min(len(timings) - 1, int(len(timings) * 0.99))]),
+            'max': us(timings[-1])
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the rate limiter bucket stores')
+    parser.add_argument('--backends', default='memory,sqlite', help='Comma-separated stores to measure')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--takes', type=int, default=2000, help='Takes per process')
+    parser.add_argument('--keys', type=int, default=10, help='Buckets shared by the processes')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    if args.processes < 1 or args.takes < 1 or args.keys < 1:
+        parser.error('--processes, --takes and --keys must be at least 1')
+
+    report = {
+        'processes': args.processes,
+        'capacity': CAPACITY,
+        'backends': {kind: measure(kind, args.processes, args.takes, args.keys) for kind in args.backends.split(',')}
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Report written to {args.output}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
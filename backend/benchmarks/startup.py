@@ -0,0 +1,135 @@
+"""
+Measure how long a fresh process takes to import the app, create it and
+serve its first request, and report the timings as JSON.
+
+Every run is a new Python process, so nothing is warm except the OS file
+cache. The app is configured from the environment as usual; compare e.g.
+AUTO_CREATE_SCHEMA=true and AUTO_CREATE_SCHEMA=false (after
+`flask --app run init-schema`).
+
+Usage:
+    python -m benchmarks.startup [--runs N] [--path /api/quizzes/] [--output FILE]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+STEPS = ('import_ms', 'create_app_ms', 'first_request_ms', 'second_request_ms', 'process_ms')
+
+
+def child(path):
+    """Runs in the measured process: time each startup step and print them as JSON"""
+    started = time.perf_counter()
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app import create_app
+    imported = time.perf_counter()
+
+    # SQL statements run while the app is created (not counting the requests)
+    queries = []
+    event.listen(Engine, 'before_cursor_execute', lambda *args: queries.append(1))
+    app = create_app()
+    created = time.perf_counter()
+    startup_queries = len(queries)
+
+    client = app.test_client()
+    status = client.get(path).status_code
+    first = time.perf_counter()
+    client.get(path)
+    second = time.perf_counter()
+
+    ms = lambda seconds: round(seconds * 1000, 2)
+    print(json.dumps({
+        'import_ms': ms(imported - started),
+        'create_app_ms': ms(created - imported),
+        'first_request_ms': ms(first - created),
+        'second_request_ms': ms(second - first),
+        'startup_db_queries': startup_queries,
+        'status': status
+    }))
+    sys.stdout.flush()
+
+
+def measure(runs, path):
+    """Run `runs` fresh processes; returns the list of their timings"""
+    results = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.startup', '--child', '--path', path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, cwd=BACKEND_DIR
+        )
+        line = process.stdout.readline()
+        # Up to the results, interpreter startup included, as a new worker would see it (teardown isn't)
+        elapsed = time.perf_counter() - started
+        process.communicate(timeout=60)
+        if process.returncode != 0 or not line:
+            raise RuntimeError(f'Startup run failed with exit code {process.returncode}')
+        result = json.loads(line)
+        result['process_ms'] = round(elapsed * 1000, 2)
+        results.append(result)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=BACKEND_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app import, creation and first request latency')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes to measure')
+    parser.add_argument('--path', default='/api/quizzes/', help='Path of the first request')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        child(options.path)
+        return 0
+    if options.runs < 1:
+        parser.error('--runs must be at least 1')
+
+    results = measure(options.runs, options.path)
+    report = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'runs': options.runs,
+        'path': options.path,
+        'auto_create_schema': os.environ.get('AUTO_CREATE_SCHEMA', 'true'),
+        'status': sorted({r['status'] for r in results}),
+        'startup_db_queries': max(r['startup_db_queries'] for r in results),
+        'steps': {
+            step: {
+                'median': round(statistics.median(r[step] for r in results), 2),
+                'min': min(r[step] for r in results),
+                'max': max(r[step] for r in results)
+            }
+            for step in STEPS
+        }
+    }
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Report written to {options.output}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Pack the JSON answers of existing quiz attempts as option indexes
+(the answers_packed column added by migration 0010).
+
+Attempts are converted in batches, each in its own short transaction, so
+the app can keep serving while this runs. A row is only rewritten if its
+answers didn't change since its batch was read. Answers that aren't
+options of their questions (or belong to quizzes that no longer exist)
+stay JSON. Safe to interrupt and run again.
+
+Usage:
+    python convert_answers.py [--batch-size N] [--pause SECONDS]
+"""
+import json
+import time
+import argparse
+
+from app import create_app, db
+from app.models.quiz_attempt import QuizAttempt
+from app.utils.answer_codec import pack_answers
+from app.utils.quiz_storage import quiz_storage
+
+
+def convert_answers(storage, batch_size=1000, pause=0.0):
+    """Convert every attempt still stored as JSON; returns a dict of counts"""
+    counts = {'converted': 0, 'kept_json': 0, 'missing_quiz': 0, 'changed': 0}
+    quizzes = {}
+    last_id = 0
+
+    while True:
+        rows = db.session.execute(
+            db.select(
+                QuizAttempt.id, QuizAttempt.subject, QuizAttempt.quiz_name,
+                QuizAttempt.user_answers, QuizAttempt.question_positions
+            )
+            .where(QuizAttempt.id > last_id, QuizAttempt.user_answers.isnot(None), QuizAttempt.answers_packed.is_(None))
+            .order_by(QuizAttempt.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        for row in rows:
+            key = (row.subject, row.quiz_name)
+            if key not in quizzes:
+                try:
+                    quizzes[key] = storage.get(*key)
+                except Exception:
+                    quizzes[key] = None
+            quiz = quizzes[key]
+            if quiz is None:
+                counts['missing_quiz'] += 1
+                continue
+
+            attempt = QuizAttempt(question_positions=row.question_positions)
+            positions = attempt.get_question_positions()
+            try:
+                answers = json.loads(row.user_answers)
+            except ValueError:
+                answers = None
+            packed = None
+            if isinstance(answers, list):
+                packed = pack_answers(answers, (quiz.subset(positions) if positions is not None else quiz).options)
+            if packed is None:
+                counts['kept_json'] += 1
+                continue
+
+            # Conditional on the answers read above, in case the attempt was resubmitted meanwhile
+            result = db.session.execute(
+                db.update(QuizAttempt)
+                .where(QuizAttempt.id == row.id, QuizAttempt.user_answers == row.user_answers)
+                .values(answers_packed=packed, user_answers=None)
+            )
+            counts['converted' if result.rowcount else 'changed'] += 1
+
+        db.session.commit()
+        print(f"\rUp to attempt {last_id}: {counts}", end='')
+        if pause:
+            time.sleep(pause)
+
+    print()
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pack stored quiz answers as option indexes')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Attempts per transaction')
+    parser.add_argument('--pause', type=float, default=0.0, help='Seconds to wait between batches')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        counts = convert_answers(quiz_storage, args.batch_size, args.pause)
+    print(f"Converted {counts['converted']} attempt(s); {counts['kept_json']} kept as JSON, "
+          f"{counts['missing_quiz']} of missing quizzes, {counts['changed']} changed while converting")
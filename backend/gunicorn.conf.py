@@ -0,0 +1,29 @@
+"""
+Gunicorn settings, picked up automatically when gunicorn runs in backend/.
+
+The app is loaded once in the master process (preload_app) and the workers
+are forked from it, so they start without importing anything and share the
+loaded code and the quiz indexes copy-on-write. Whatever must not cross a
+fork - threads, the password hashing pool, pooled database connections - is
+started in each worker by post_fork.
+
+Run `flask --app run init-schema` before starting the server when
+AUTO_CREATE_SCHEMA=false.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+if preload_app:
+    # create_app leaves the per-process parts to post_fork
+    os.environ['DEFER_BACKGROUND_WORKERS'] = 'true'
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import start_background_workers
+        start_background_workers(server.app.wsgi())
@@ -0,0 +1,77 @@
+"""
+Import the quiz files under backend/quizzes/<subject>/<quiz_name>.json into
+the question bank used by QUIZ_STORAGE=sql.
+
+Quizzes that are already in the bank are skipped unless --replace is given.
+Files that don't compile (not a list, or a correct answer missing from its
+options) are reported and skipped.
+
+Usage:
+    python import_quizzes.py [--replace] [--dir PATH]
+"""
+import os
+import sys
+import json
+import argparse
+
+from app import create_app, db
+from app.utils.quiz_cache import QUIZ_DIR
+from app.utils.quiz_compiler import compile_questions
+from app.utils.quiz_storage import QuizExistsError, SQLQuizStorage
+
+
+def iter_quiz_files(quiz_dir):
+    """Yield (subject, quiz_name, path) for every quiz file, in a stable order"""
+    for subject in sorted(os.listdir(quiz_dir)):
+        subject_dir = os.path.join(quiz_dir, subject)
+        if not os.path.isdir(subject_dir):
+            continue
+        for file_name in sorted(os.listdir(subject_dir)):
+            if file_name.endswith('.json'):
+                yield subject, file_name[:-len('.json')], os.path.join(subject_dir, file_name)
+
+
+def import_quizzes(quiz_dir=QUIZ_DIR, replace=False):
+    """Import every quiz file; returns (imported, skipped, failed) counts"""
+    storage = SQLQuizStorage()
+    imported = skipped = failed = 0
+
+    for subject, quiz_name, path in iter_quiz_files(quiz_dir):
+        try:
+            with open(path, 'r') as f:
+                questions = json.load(f)
+            if not isinstance(questions, list):
+                raise ValueError('Quiz file must contain a list of questions')
+            # Same checks the quiz routes apply when serving a quiz
+            compile_questions(questions, version='import')
+        except (OSError, ValueError) as e:
+            print(f"  [failed]  {subject}/{quiz_name}: {str(e)}")
+            failed += 1
+            continue
+
+        try:
+            storage.save(subject, quiz_name, questions, replace=replace)
+        except QuizExistsError:
+            print(f"  [skipped] {subject}/{quiz_name}: already imported")
+            skipped += 1
+            continue
+
+        print(f"  [ok]      {subject}/{quiz_name}: {len(questions)} questions")
+        imported += 1
+
+    return imported, skipped, failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import quiz files into the question bank')
+    parser.add_argument('--replace', action='store_true', help='overwrite quizzes that were already imported')
+    parser.add_argument('--dir', default=QUIZ_DIR, help='quiz directory to import (default: backend/quizzes)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        imported, skipped, failed = import_quizzes(args.dir, replace=args.replace)
+
+    print(f"Imported {imported} quiz(zes), skipped {skipped}, failed {failed}")
+    sys.exit(1 if failed else 0)
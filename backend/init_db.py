@@ -66,6 +66,7 @@ def init_db():
             quiz_name="quiz1",
             score=4,
             total_questions=5,
+            status=QuizAttempt.SUBMITTED,
             attempt_date=datetime.utcnow() - timedelta(days=20)
         )
         
@@ -75,6 +76,7 @@ def init_db():
             quiz_name="quiz1",
             score=3,
             total_questions=5,
+            status=QuizAttempt.SUBMITTED,
             attempt_date=datetime.utcnow() - timedelta(days=10)
         )
         
@@ -0,0 +1 @@
+"""Database schema migrations (see runner.py)"""
@@ -0,0 +1,190 @@
+"""
+Check that the hot queries use the indexes added by the migrations.
+
+Runs EXPLAIN for each query against the configured database (SQLite or
+PostgreSQL) and exits with status 1 if any plan doesn't use the expected
+index. Meant to run in CI after `python migrations/runner.py`.
+
+Usage:
+    python migrations/check_query_plans.py
+"""
+import os
+import sys
+import json
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import and_, func, or_, select, text
+
+
+def hot_queries():
+    """Return [(description, statement, expected_index)] for the queries we care about"""
+    from app.models.quiz_attempt import QuizAttempt
+    from app.models.transaction import Transaction
+    from app.models.question_bank import BankQuiz, BankQuestion
+    from app.models.user import User, USER_TOKENS_KEY, USER_CREATED_AT_KEY
+    from app.models.quiz_stats import QuizStats, QuizQuestionStats
+
+    return [
+        (
+            'get_quiz/submit_quiz: latest attempt at a quiz',
+            select(QuizAttempt)
+            .filter_by(user_id=1, subject='maths', quiz_name='algebra')
+            .order_by(QuizAttempt.attempt_date.desc())
+            .limit(1),
+            'ix_quiz_attempts_user_quiz_date'
+        ),
+        (
+            'get_quiz: latest started attempt at a quiz',
+            select(QuizAttempt)
+            .filter_by(user_id=1, subject='maths', quiz_name='algebra', status=QuizAttempt.STARTED)
+            .order_by(QuizAttempt.attempt_date.desc())
+            .limit(1),
+            'ix_quiz_attempts_user_quiz_status'
+        ),
+        (
+            'attempt sweeper: stale started attempts',
+            select(QuizAttempt.id)
+            .where(QuizAttempt.status == QuizAttempt.STARTED, QuizAttempt.attempt_date < '2000-01-01'),
+            'ix_quiz_attempts_status_date'
+        ),
+        (
+            'get_attempts: attempt history page after a cursor',
+            select(QuizAttempt.id, QuizAttempt.attempt_date)
+            .where(
+                QuizAttempt.user_id == 1,
+                or_(
+                    QuizAttempt.attempt_date < '2024-01-01',
+                    and_(QuizAttempt.attempt_date == '2024-01-01', QuizAttempt.id < 100)
+                )
+            )
+            .order_by(QuizAttempt.attempt_date.desc(), QuizAttempt.id.desc())
+            .limit(51),
+            'ix_quiz_attempts_user_date_id'
+        ),
+        (
+            'bulk_submit: attempts stored under idempotency keys',
+            select(QuizAttempt.id, QuizAttempt.idempotency_key)
+            .where(QuizAttempt.user_id == 1, QuizAttempt.idempotency_key.in_(['k1', 'k2'])),
+            'ix_quiz_attempts_user_idempotency_key'
+        ),
+        (
+            'verify_payment: transaction by order id',
+            select(Transaction).filter_by(razorpay_order_id='order_demo1'),
+            'ix_transactions_razorpay_order_id'
+        ),
+        (
+            'get_transactions: transaction history',
+            select(Transaction)
+            .filter_by(user_id=1)
+            .order_by(Transaction.transaction_date.desc()),
+            'ix_transactions_user_date'
+        ),
+        (
+            'admin users: newest users page after a cursor',
+            select(User.id, User.username)
+            .where(or_(
+                USER_CREATED_AT_KEY < '2024-01-01',
+                and_(USER_CREATED_AT_KEY == '2024-01-01', User.id < 100)
+            ))
+            .order_by(USER_CREATED_AT_KEY.desc(), User.id.desc())
+            .limit(51),
+            'ix_users_created_at_id'
+        ),
+        (
+            'admin users: richest users page after a cursor',
+            select(User.id, User.username)
+            .where(or_(USER_TOKENS_KEY < 50, and_(USER_TOKENS_KEY == 50, User.id < 100)))
+            .order_by(USER_TOKENS_KEY.desc(), User.id.desc())
+            .limit(51),
+            'ix_users_tokens_id'
+        ),
+        (
+            'admin users: username prefix search',
+            select(User.id, User.username)
+            .where(func.lower(User.username) >= 'bo', func.lower(User.username) < 'bp')
+            .order_by(User.id)
+            .limit(51),
+            'ix_users_username_lower'
+        ),
+        (
+            'admin users: users by role',
+            select(User.id, User.username)
+            .where(User.role == 'admin', User.id > 100)
+            .order_by(User.id)
+            .limit(51),
+            'ix_users_role_id'
+        ),
+        (
+            'admin stats: totals of a quiz',
+            select(QuizStats).filter_by(subject='maths', quiz_name='algebra'),
+            'ix_quiz_stats_quiz'
+        ),
+        (
+            'admin stats: per-question counts of a quiz',
+            select(QuizQuestionStats)
+            .filter_by(subject='maths', quiz_name='algebra')
+            .order_by(QuizQuestionStats.position),
+            'ix_quiz_question_stats_quiz_position'
+        ),
+        (
+            'question bank: quiz by subject and name',
+            select(BankQuiz.id, BankQuiz.version, BankQuiz.question_count)
+            .where(BankQuiz.subject == 'maths', BankQuiz.name == 'algebra'),
+            'ix_bank_quizzes_subject_name'
+        ),
+        (
+            'question bank: sampled questions of a quiz',
+            select(BankQuestion.position, BankQuestion.data)
+            .where(BankQuestion.quiz_id == 1, BankQuestion.position.in_([0, 3, 4])),
+            'ix_bank_questions_quiz_position'
+        ),
+    ]
+
+
+def explain(connection, statement):
+    """Return the query plan of a statement as text"""
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    dialect = connection.dialect.name
+
+    if dialect == 'sqlite':
+        rows = connection.execute(text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+        return '\n'.join(row[-1] for row in rows)
+
+    if dialect == 'postgresql':
+        # Tiny CI tables would otherwise always get a sequential scan
+        connection.execute(text('SET LOCAL enable_seqscan = off'))
+        plan = connection.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+        return plan if isinstance(plan, str) else json.dumps(plan, indent=2)
+
+    raise RuntimeError(f'EXPLAIN check is not supported for {dialect}')
+
+
+def check_query_plans(engine, verbose=True):
+    """Return the list of (description, plan) for queries that don't use their index"""
+    failures = []
+
+    for description, statement, expected_index in hot_queries():
+        with engine.begin() as connection:
+            plan = explain(connection, statement)
+
+        ok = expected_index in plan
+        if verbose:
+            print(f"[{'ok' if ok else 'FAIL'}] {description} -> {expected_index}")
+        if not ok:
+            failures.append((description, plan))
+
+    return failures
+
+
+if __name__ == '__main__':
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        failures = check_query_plans(db.engine)
+
+    for description, plan in failures:
+        print(f"\nPlan for '{description}':\n{plan}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,141 @@
+"""
+Versioned schema migrations.
+
+Every file in migrations/versions/ named NNNN_description.py defines an
+`upgrade(connection)` function. Applied versions are recorded in the
+schema_migrations table, so each migration runs exactly once per database
+and in order. Each migration runs in its own transaction.
+
+Usage:
+    python migrations/runner.py            # apply pending migrations
+    python migrations/runner.py --status   # list applied / pending migrations
+"""
+import os
+import sys
+import importlib.util
+from datetime import datetime
+
+# Add the parent directory to the path so we can import the app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import Table, Column, String, DateTime, MetaData, inspect, select, text
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'versions')
+
+# Kept out of the app's metadata so db.create_all() never touches it
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', String(64), primary_key=True),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+def discover_migrations():
+    """Return [(version, path)] for every migration file, in order"""
+    migrations = []
+    for file_name in sorted(os.listdir(VERSIONS_DIR)):
+        if file_name.endswith('.py') and file_name[:4].isdigit():
+            migrations.append((file_name[:-3], os.path.join(VERSIONS_DIR, file_name)))
+    return migrations
+
+
+def _load(version, path):
+    spec = importlib.util.spec_from_file_location(f'migrations.versions.m{version}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def applied_versions(engine):
+    """Return the set of versions already recorded in the database"""
+    schema_migrations.create(bind=engine, checkfirst=True)
+    with engine.connect() as connection:
+        return {row[0] for row in connection.execute(select(schema_migrations.c.version))}
+
+
+def run_migrations(engine, verbose=True):
+    """Apply all pending migrations and return the list of versions applied"""
+    done = applied_versions(engine)
+    applied = []
+
+    for version, path in discover_migrations():
+        if version in done:
+            continue
+
+        module = _load(version, path)
+        if verbose:
+            print(f"Applying {version}...")
+
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            connection.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+
+        applied.append(version)
+
+    if verbose:
+        print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
+    return applied
+
+
+def print_status(engine):
+    done = applied_versions(engine)
+    for version, _ in discover_migrations():
+        print(f"[{'x' if version in done else ' '}] {version}")
+
+
+# Helpers for migration modules - all of them are no-ops when the change
+# already exists (e.g. on a database created by db.create_all())
+
+def has_column(connection, table_name, column_name):
+    return column_name in [col['name'] for col in inspect(connection).get_columns(table_name)]
+
+
+def add_column(connection, table_name, column_name, ddl):
+    """Add a column given its DDL fragment (e.g. 'TEXT NULL') unless it already exists"""
+    if has_column(connection, table_name, column_name):
+        return False
+    connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}'))
+    return True
+
+
+def has_index(connection, table_name, index_name):
+    if connection.dialect.name == 'sqlite':
+        # SQLite's reflection skips expression indexes
+        return connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND name = :name"),
+            {'table': table_name, 'name': index_name}
+        ).first() is not None
+    return index_name in [idx['name'] for idx in inspect(connection).get_indexes(table_name)]
+
+
+def create_index(connection, table_name, index_name, columns, unique=False):
+    """Create an index on the given columns unless one with that name already exists"""
+    if has_index(connection, table_name, index_name):
+        return False
+    connection.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX {index_name} ON {table_name} ({', '.join(columns)})"
+    ))
+    return True
+
+
+def drop_index(connection, table_name, index_name):
+    """Drop an index if it exists (e.g. one superseded by a wider index)"""
+    if not has_index(connection, table_name, index_name):
+        return False
+    if connection.dialect.name == 'mysql':
+        connection.execute(text(f'DROP INDEX {index_name} ON {table_name}'))
+    else:
+        connection.execute(text(f'DROP INDEX {index_name}'))
+    return True
+
+
+if __name__ == '__main__':
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        if '--status' in sys.argv[1:]:
+            print_status(db.engine)
+        else:
+            run_migrations(db.engine)
@@ -0,0 +1,7 @@
+"""Add reset token fields to the users table"""
+from migrations.runner import add_column
+
+
+def upgrade(connection):
+    add_column(connection, 'users', 'reset_token', 'VARCHAR(100) UNIQUE NULL')
+    add_column(connection, 'users', 'reset_token_expiry', 'TIMESTAMP NULL')
@@ -0,0 +1,6 @@
+"""Add the user_answers column to the quiz_attempts table"""
+from migrations.runner import add_column
+
+
+def upgrade(connection):
+    add_column(connection, 'quiz_attempts', 'user_answers', 'TEXT NULL')
@@ -0,0 +1,14 @@
+"""Add composite indexes for quiz attempt and transaction lookups"""
+from migrations.runner import create_index
+
+
+def upgrade(connection):
+    # get_quiz / submit_quiz: one user's attempts at one quiz, most recent first
+    create_index(connection, 'quiz_attempts', 'ix_quiz_attempts_user_quiz_date',
+                 ['user_id', 'subject', 'quiz_name', 'attempt_date'])
+    # /api/quizzes/attempts: a user's attempt history by date
+    create_index(connection, 'quiz_attempts', 'ix_quiz_attempts_user_date', ['user_id', 'attempt_date'])
+    # verify_payment looks transactions up by Razorpay order id
+    create_index(connection, 'transactions', 'ix_transactions_razorpay_order_id', ['razorpay_order_id'])
+    # /api/payment/transactions: a user's transactions by date
+    create_index(connection, 'transactions', 'ix_transactions_user_date', ['user_id', 'transaction_date'])
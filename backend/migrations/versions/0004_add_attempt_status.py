@@ -0,0 +1,16 @@
+"""Add an explicit state column to quiz_attempts"""
+from sqlalchemy import text
+
+from migrations.runner import add_column, create_index
+
+
+def upgrade(connection):
+    if add_column(connection, 'quiz_attempts', 'status', "VARCHAR(20) NOT NULL DEFAULT 'submitted'"):
+        # Until now an attempt was "incomplete" while its score and total were both 0
+        connection.execute(text(
+            "UPDATE quiz_attempts SET status = 'started' WHERE score = 0 AND total_questions = 0"
+        ))
+
+    create_index(connection, 'quiz_attempts', 'ix_quiz_attempts_user_quiz_status',
+                 ['user_id', 'subject', 'quiz_name', 'status', 'attempt_date'])
+    create_index(connection, 'quiz_attempts', 'ix_quiz_attempts_status_date', ['status', 'attempt_date'])
@@ -0,0 +1,11 @@
+"""Add prompt fingerprints and reuse tracking to generation_jobs"""
+from migrations.runner import add_column, create_index
+
+
+def upgrade(connection):
+    add_column(connection, 'generation_jobs', 'fingerprint', 'VARCHAR(40)')
+    add_column(connection, 'generation_jobs', 'source_job_id', 'VARCHAR(36) REFERENCES generation_jobs (id)')
+    add_column(connection, 'generation_jobs', 'reused', 'BOOLEAN NOT NULL DEFAULT FALSE')
+
+    create_index(connection, 'generation_jobs', 'ix_generation_jobs_fingerprint_status', ['fingerprint', 'status'])
+    create_index(connection, 'generation_jobs', 'ix_generation_jobs_source_job_id', ['source_job_id'])
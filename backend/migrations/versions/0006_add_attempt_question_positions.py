@@ -0,0 +1,6 @@
+"""Record which questions were sampled for a quiz attempt"""
+from migrations.runner import add_column
+
+
+def upgrade(connection):
+    add_column(connection, 'quiz_attempts', 'question_positions', 'TEXT NULL')
@@ -0,0 +1,8 @@
+"""Widen the attempt history index with id for keyset pagination on (attempt_date, id)"""
+from migrations.runner import create_index, drop_index
+
+
+def upgrade(connection):
+    create_index(connection, 'quiz_attempts', 'ix_quiz_attempts_user_date_id', ['user_id', 'attempt_date', 'id'])
+    # Its prefix is covered by the new index
+    drop_index(connection, 'quiz_attempts', 'ix_quiz_attempts_user_date')
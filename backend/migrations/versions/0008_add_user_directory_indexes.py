@@ -0,0 +1,12 @@
+"""Add indexes for sorting, filtering and searching the admin user directory"""
+from migrations.runner import create_index
+
+
+def upgrade(connection):
+    # Nullable sort columns are indexed as the coalesced keys the directory sorts by (app/models/user.py)
+    create_index(connection, 'users', 'ix_users_created_at_id', ["(coalesce(created_at, '1970-01-01 00:00:00.000000'))", 'id'])
+    create_index(connection, 'users', 'ix_users_tokens_id', ['(coalesce(tokens, 0))', 'id'])
+    create_index(connection, 'users', 'ix_users_role_id', ['role', 'id'])
+    # Case-insensitive prefix search
+    create_index(connection, 'users', 'ix_users_username_lower', ['(lower(username))'])
+    create_index(connection, 'users', 'ix_users_email_lower', ['(lower(email))'])
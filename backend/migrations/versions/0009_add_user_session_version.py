@@ -0,0 +1,6 @@
+"""Version login sessions so they can be revoked"""
+from migrations.runner import add_column
+
+
+def upgrade(connection):
+    add_column(connection, 'users', 'session_version', 'INTEGER NOT NULL DEFAULT 0')
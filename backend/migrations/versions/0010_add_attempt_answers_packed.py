@@ -0,0 +1,12 @@
+"""
+Store quiz attempt answers as packed option indexes.
+
+Existing attempts keep their JSON answers until `python convert_answers.py`
+packs them; it runs in batches while the app is serving.
+"""
+from migrations.runner import add_column
+
+
+def upgrade(connection):
+    ddl = 'BYTEA NULL' if connection.dialect.name == 'postgresql' else 'BLOB NULL'
+    add_column(connection, 'quiz_attempts', 'answers_packed', ddl)
@@ -0,0 +1,8 @@
+"""Idempotency keys of bulk-submitted quiz attempts, unique per user"""
+from migrations.runner import add_column, create_index
+
+
+def upgrade(connection):
+    add_column(connection, 'quiz_attempts', 'idempotency_key', 'VARCHAR(64) NULL')
+    create_index(connection, 'quiz_attempts', 'ix_quiz_attempts_user_idempotency_key',
+                 ['user_id', 'idempotency_key'], unique=True)
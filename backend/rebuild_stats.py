@@ -0,0 +1,20 @@
+"""
+Recompute the quiz and user statistics tables from the attempt history.
+
+The stats are normally kept up to date by submit_quiz; run this after
+importing old data, changing STATS_PASS_PERCENTAGE or editing quizzes.
+
+Usage:
+    python rebuild_stats.py
+"""
+from app import create_app, db
+from app.utils.quiz_stats import rebuild_stats
+from app.utils.quiz_storage import quiz_storage
+
+
+if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        processed = rebuild_stats(quiz_storage)
+    print(f"Rebuilt statistics from {processed} submitted attempt(s)")
@@ -3,6 +3,16 @@ import { Container, Row, Col, Card, Table, Form, Button, Alert, Tabs, Tab, Modal
 import API_URL, { apiCall } from '../api-config';
 import { AuthContext } from '../context/AuthContext';
 
+// Users are searched, filtered and paginated on the server
+const fetchUsers = async (searchTerm, filterRole, cursor = null) => {
+  const params = new URLSearchParams();
+  if (searchTerm.trim()) params.set('q', searchTerm.trim());
+  if (filterRole !== 'all') params.set('role', filterRole);
+  if (cursor) params.set('cursor', cursor);
+  const query = params.toString();
+  return apiCall(`/api/admin/users${query ? `?${query}` : ''}`);
+};
+
 const AdminPanel = () => {
   const [users, setUsers] = useState([]);
   const [tokenPackages, setTokenPackages] = useState({});
@@ -11,6 +21,8 @@ const AdminPanel = () => {
   const [success, setSuccess] = useState('');
   const [searchTerm, setSearchTerm] = useState('');
   const [filterRole, setFilterRole] = useState('all');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [usersLoading, setUsersLoading] = useState(true);
   
   // Modal states
   const [showTokenModal, setShowTokenModal] = useState(false);
@@ -41,11 +53,7 @@ const AdminPanel = () => {
         setError('');
         console.log('Fetching admin data from:', API_URL);
         
-        // Fetch users
-        const usersData = await apiCall('/api/admin/users');
-        setUsers(usersData.users || []);
-        
-        // Fetch token packages
+        // Fetch token packages (users are fetched page by page below)
         const packagesData = await apiCall('/api/admin/token-packages');
         setTokenPackages(packagesData.packages || {});
         setPackageEdits(packagesData.packages || {});
@@ -60,15 +68,46 @@ const AdminPanel = () => {
     fetchData();
   }, []);
   
-  // Handle user search
-  const filteredUsers = users.filter(user => {
-    const matchesSearch = user.username.toLowerCase().includes(searchTerm.toLowerCase()) || 
-                         user.email.toLowerCase().includes(searchTerm.toLowerCase());
-    
-    const matchesRole = filterRole === 'all' || user.role === filterRole;
+  // First page whenever the search or role filter changes (debounced while typing)
+  useEffect(() => {
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        setUsersLoading(true);
+        const usersData = await fetchUsers(searchTerm, filterRole);
+        if (!cancelled) {
+          setUsers(usersData.users || []);
+          setNextCursor(usersData.next_cursor || null);
+          setSelectedUsers([]);
+        }
+      } catch (err) {
+        console.error('Error fetching users:', err);
+        if (!cancelled) setError('Failed to load users. Please try again later.');
+      } finally {
+        if (!cancelled) setUsersLoading(false);
+      }
+    }, 300);
     
-    return matchesSearch && matchesRole;
-  });
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm, filterRole]);
+  
+  // Append the next page of users
+  const loadMoreUsers = async () => {
+    try {
+      setUsersLoading(true);
+      const usersData = await fetchUsers(searchTerm, filterRole, nextCursor);
+      setUsers(prev => [...prev, ...(usersData.users || [])]);
+      setNextCursor(usersData.next_cursor || null);
+    } catch (err) {
+      console.error('Error fetching more users:', err);
+      setError('Failed to load more users. Please try again later.');
+    } finally {
+      setUsersLoading(false);
+    }
+  };
   
   // Handle token adjustment
   const handleTokenAdjustment = async () => {
@@ -311,10 +350,10 @@ const AdminPanel = () => {
   };
   
   const selectAllUsers = () => {
-    if (selectedUsers.length === filteredUsers.length) {
+    if (selectedUsers.length === users.length) {
       setSelectedUsers([]);
     } else {
-      setSelectedUsers(filteredUsers.map(user => user.id));
+      setSelectedUsers(users.map(user => user.id));
     }
   };
   
@@ -374,7 +413,7 @@ const AdminPanel = () => {
                       <i className="fas fa-search"></i>
                     </InputGroup.Text>
                     <Form.Control
-                      placeholder="Search users by name or email"
+                      placeholder="Search users by username or email (starts with)"
                       value={searchTerm}
                       onChange={(e) => setSearchTerm(e.target.value)}
                     />
@@ -399,7 +438,7 @@ const AdminPanel = () => {
                       <th>
                         <Form.Check
                           type="checkbox"
-                          checked={selectedUsers.length === filteredUsers.length && filteredUsers.length > 0}
+                          checked={selectedUsers.length === users.length && users.length > 0}
                           onChange={selectAllUsers}
                           label=""
                         />
@@ -414,7 +453,7 @@ const AdminPanel = () => {
                     </tr>
                   </thead>
                   <tbody>
-                    {filteredUsers.map(user => (
+                    {users.map(user => (
                       <tr key={user.id}>
                         <td>
                           <Form.Check
@@ -462,7 +501,15 @@ const AdminPanel = () => {
                 </Table>
               </div>
               
-              {filteredUsers.length === 0 && (
+              {nextCursor && (
+                <div className="text-center py-3">
+                  <Button variant="outline-primary" onClick={loadMoreUsers} disabled={usersLoading}>
+                    {usersLoading ? 'Loading...' : 'Load More Users'}
+                  </Button>
+                </div>
+              )}
+              
+              {!usersLoading && users.length === 0 && (
                 <div className="text-center py-3">
                   <p>No users found matching your search criteria.</p>
                 </div>
@@ -739,7 +786,7 @@ const AdminPanel = () => {
                   <th>
                     <Form.Check
                       type="checkbox"
-                      checked={selectedUsers.length === filteredUsers.length && filteredUsers.length > 0}
+                      checked={selectedUsers.length === users.length && users.length > 0}
                       onChange={selectAllUsers}
                       label=""
                     />
@@ -751,7 +798,7 @@ const AdminPanel = () => {
                 </tr>
               </thead>
               <tbody>
-                {filteredUsers.map(user => {
+                {users.map(user => {
                   let newTokens;
                   if (bulkTokenOperation === 'set') {
                     newTokens = parseInt(bulkTokenAmount) || 0;
@@ -7,6 +7,7 @@ import { AuthContext } from '../context/AuthContext';
 const Dashboard = () => {
   const [subjects, setSubjects] = useState([]);
   const [attempts, setAttempts] = useState([]);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   
@@ -22,10 +23,14 @@ const Dashboard = () => {
         const subjectsResponse = await axios.get('/api/quizzes');
         setSubjects(subjectsResponse.data.subjects || []);
         
-        // Fetch user's quiz attempts
-        const attemptsResponse = await axios.get('/api/quizzes/attempts');
+        // Fetch user's most recent quiz attempts
+        const attemptsResponse = await axios.get('/api/quizzes/attempts', { params: { limit: 5 } });
         setAttempts(attemptsResponse.data.attempts || []);
         
+        // Totals over all attempts (the attempt list is paginated)
+        const summaryResponse = await axios.get('/api/quizzes/attempts/summary');
+        setSummary(summaryResponse.data.stats || null);
+        
       } catch (err) {
         setError('Failed to load dashboard data');
         console.error(err);
@@ -38,9 +43,9 @@ const Dashboard = () => {
   }, []);
 
   // Calculate stats
-  const totalAttempts = attempts.length;
+  const totalAttempts = summary?.attempts || 0;
   const averageScore = totalAttempts > 0 
-    ? (attempts.reduce((sum, attempt) => sum + attempt.percentage, 0) / totalAttempts).toFixed(1) 
+    ? summary.average_percentage.toFixed(1) 
     : 0;
   
   // Get recent attempts (last 5)
@@ -6,6 +6,9 @@ import { AuthContext } from '../context/AuthContext';
 
 const Profile = () => {
   const [attempts, setAttempts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [summary, setSummary] = useState(null);
   const [transactions, setTransactions] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
@@ -19,9 +22,14 @@ const Profile = () => {
         setError('');
         console.log('Fetching profile data from:', API_URL);
         
-        // Fetch quiz attempts
+        // Fetch the first page of quiz attempts
         const attemptsData = await apiCall('/api/quizzes/attempts');
         setAttempts(attemptsData.attempts || []);
+        setNextCursor(attemptsData.next_cursor || null);
+        
+        // Totals over all attempts, not just the loaded pages
+        const summaryData = await apiCall('/api/quizzes/attempts/summary');
+        setSummary(summaryData.stats || null);
         
         // Fetch transactions
         const transactionsData = await apiCall('/api/payment/transactions');
@@ -37,10 +45,24 @@ const Profile = () => {
     fetchData();
   }, []);
   
+  const loadMoreAttempts = async () => {
+    try {
+      setLoadingMore(true);
+      const attemptsData = await apiCall(`/api/quizzes/attempts?cursor=${encodeURIComponent(nextCursor)}`);
+      setAttempts(prev => [...prev, ...(attemptsData.attempts || [])]);
+      setNextCursor(attemptsData.next_cursor || null);
+    } catch (err) {
+      console.error('Error fetching more attempts:', err);
+      setError('Failed to load more quiz history. Please try again later.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+  
   // Calculate stats
-  const totalAttempts = attempts.length;
+  const totalAttempts = summary?.attempts || 0;
   const averageScore = totalAttempts > 0 
-    ? (attempts.reduce((sum, attempt) => sum + attempt.percentage, 0) / totalAttempts).toFixed(1) 
+    ? summary.average_percentage.toFixed(1) 
     : 0;
   const totalSpent = transactions
     .filter(t => t.payment_status === 'completed')
@@ -148,6 +170,13 @@ const Profile = () => {
                   ))}
                 </tbody>
               </Table>
+              {nextCursor && (
+                <div className="text-center mb-3">
+                  <Button variant="outline-primary" onClick={loadMoreAttempts} disabled={loadingMore}>
+                    {loadingMore ? 'Loading...' : 'Load More'}
+                  </Button>
+                </div>
+              )}
             </div>
           ) : (
             <p className="py-3">You haven't taken any quizzes yet.</p>
@@ -58,6 +58,9 @@ const QuizDetail = () => {
         let endpoint = `/api/quizzes/${subject}/${quizName}`;
         const params = new URLSearchParams();
         
+        // The questions are fetched separately from questions_url, which browsers can cache
+        params.append('inline', 'false');
+        
         if (attemptId && !isNewAttempt) {
           params.append('attempt_id', attemptId);
         }
@@ -66,12 +69,12 @@ const QuizDetail = () => {
           params.append('new_attempt', 'true');
         }
         
-        if (params.toString()) {
-          endpoint += `?${params.toString()}`;
-        }
+        endpoint += `?${params.toString()}`;
         
         console.log("Fetching quiz with URL:", API_URL + endpoint);
         const quizData = await apiCall(endpoint);
+        const questionsData = await apiCall(quizData.questions_url);
+        quizData.questions = questionsData.questions;
         setQuiz(quizData);
         setQuizStarted(quizData.has_attempted);
         
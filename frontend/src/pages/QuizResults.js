@@ -116,7 +116,7 @@ const QuizResults = () => {
           <div className="text-center mb-4">
             <h2>Your Score</h2>
             <div className="display-1 fw-bold text-primary mb-2">
-              {results.score}/{results.totalQuestions}
+              {results.score}/{results.total_questions}
             </div>
             <h4>
               <Badge bg={performanceColor}>{results.percentage.toFixed(1)}% - {performanceLevel}</Badge>
@@ -136,11 +136,11 @@ const QuizResults = () => {
               <p className="text-muted">Correct</p>
             </div>
             <div className="text-center">
-              <h5>{results.totalQuestions - results.score}</h5>
+              <h5>{results.total_questions - results.score}</h5>
               <p className="text-muted">Incorrect</p>
             </div>
             <div className="text-center">
-              <h5>{results.totalQuestions}</h5>
+              <h5>{results.total_questions}</h5>
               <p className="text-muted">Total</p>
             </div>
           </div>